@@ -2,9 +2,12 @@ import os
 import re
 import time
 import functools
-import subprocess
 from logging_config import setup_logger, log_and_show_error
-import yt_dlp
+from metadata_cache import get_video_metadata
+from format_index import FormatIndex, parse_choice, load_format_index, native_audio_ext
+from ydl_pool import get_ydl_pool
+from staging import open_staging
+from cancellation import JobCancelled
 
 # ------------------------------
 # TODO: 
@@ -56,82 +59,60 @@ def _resolution_sort_key(res):
         return 0  # 若解析度格式異常，則視為最小
 
 @timeit
-def get_video_info(url, file_format="mp4", cookiefile=''):
+def get_video_info(url, file_format="mp4", cookiefile='', refresh=False):
     """取得影片資訊，包括標題、可用畫質、封面圖 URL、可用字幕"""
-    title = "Unknown Title"  # 預設值
     subtitles = ["No subtitle"]  # 預設值
     logger.info("Starting to fetch video info from URL: %s", url)
-    ydl_opts = {
-        'quiet': True,
-        'no_warnings': True,
-        'skip_download': True,
-        # 讓 yt_dlp 下載字幕資訊
-        'writesubtitles': True,
-        'writeautomaticsub': True,
-        'subtitlesformat': 'srt',
-        'noplaylist': True,
-    }
-    # 若有指定cookies檔案，則加入 cookies 選項
-    if cookiefile != '':
-        # 使用 cookies 來處理年齡限制或地區限制的影片
-        # cookiesfrombrowser無法使用, ERROR: _parse_browser_specification() takes from 1 to 4 positional arguments but 6 were given
-        # cookies會過期
-        ydl_opts['cookiefile'] = cookiefile # 只有這能用，需先匯出cookies.txt
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        info = ydl.extract_info(url, download=False)
-    title = info.get('title', 'Unknown Title')
-    thumbnail_url = info.get('thumbnail')
+    metadata = get_video_metadata(url, cookiefile, refresh)
+    title = metadata.get('title', 'Unknown Title')
+    thumbnail_url = metadata.get('thumbnail')
     if file_format == "mp4":
-        resolutions = list(set([
-            stream['resolution'] for stream in info.get('formats', []) if stream.get('resolution')
-        ]))
-        # 排序前先移除 "audio only"
-        resolutions = [res for res in resolutions if res.lower() != "audio only"]
-        resolutions.sort(key=lambda res: _resolution_sort_key(res), reverse=True)
+        resolutions = FormatIndex(metadata.get('formats')).resolutions()
+        if not resolutions:
+            # 格式表沒有寬高資訊（部分平台），退回使用 yt_dlp 的 resolution 字串
+            resolutions = list(set([
+                stream['resolution'] for stream in metadata.get('formats', []) if stream.get('resolution')
+            ]))
+            # 排序前先移除 "audio only"
+            resolutions = [res for res in resolutions if res.lower() != "audio only"]
+            resolutions.sort(key=lambda res: _resolution_sort_key(res), reverse=True)
     else:
         resolutions = ["64kbps","128kbps", "192kbps", "256kbps", "320kbps"]
         resolutions.sort(key=lambda s: int(s.replace("kbps", "")) if s and s.replace("kbps", "").isdigit() else 0, reverse=True)
 
     # 檢查影片是否有字幕資訊
-    if info.get("subtitles"):
-        available_subs = list(info["subtitles"].keys())
-        subtitles = ["No subtitle"] + available_subs
-    elif info.get("automatic_captions"):
-        available_subs = list(info["automatic_captions"].keys())
-        subtitles = ["No subtitle"] + available_subs
+    if metadata.get("subtitles"):
+        subtitles = ["No subtitle"] + metadata["subtitles"]
+    elif metadata.get("automatic_captions"):
+        subtitles = ["No subtitle"] + metadata["automatic_captions"]
 
     return title, thumbnail_url, resolutions, subtitles
 
 @timeit
-def download_video_audio(url, resolution, download_path, file_format, download_subtitles, subtitle_lang, cookiefile='', progress_callback=None):
+def download_video_audio(url, resolution, download_path, file_format, download_subtitles, subtitle_lang, cookiefile='', progress_callback=None, cancel_token=None):
+    """
+    cancel_token: 選用的 CancelToken；取消時中斷下載並拋出 JobCancelled（暫存資料夾保留，之後可接續下載）
+    """
     logger.info("Starting to download video/audio from URL: %s", url)
     final_filepath = None
     ffmpeg_path = os.path.join(os.path.dirname(__file__), 'ffmpeg', 'bin', 'ffmpeg.exe')
-    ydl_opts['ffmpeg_location'] = ffmpeg_path
+    # 由（通常已在快取中的）格式表建立索引，將使用者的選擇編譯成確定的 format ID
+    format_index = load_format_index(url, cookiefile)
     if file_format == 'mp4':
-        # 從解析度字串中取得寬高，例如 "1920x1080"
-        try:
-            width_str, height_str = resolution.split('x')
-            width = int(width_str)
-            height = int(height_str)
-            # 當高度為 720，且寬度接近 1280，則修正為 1280
-            if height == 720 and abs(width - 1280) <= 20:
-                width = 1280
-        except Exception as e:
+        # 從解析度字串中取得高度，例如 "1920x1080"
+        _, height, _ = parse_choice(resolution)
+        if height is None:
             log_and_show_error("解析解析度失敗，請檢查格式是否正確(例如 '1920x1080')", master=None)
-            raise ValueError("解析解析度失敗，請檢查格式是否正確(例如 '1920x1080')") from e
-        # 將下載檔案暫存為固定名稱，例如 temp_download.mp4
-        temp_template = os.path.join(download_path, "temp_download.%(ext)s")
+            raise ValueError("解析解析度失敗，請檢查格式是否正確(例如 '1920x1080')")
+        format_spec = format_index.compile('mp4', resolution)
         ydl_opts = {
-            # 第一段先嘗試 webm，再嘗試 mp4，最後 fallback 到 best
-            'format': f'bestvideo[height={height}]+bestaudio/best/bestvideo+bestaudio/best',
-            'outtmpl': temp_template,
+            'format': format_spec,
             'noplaylist': True,
             'merge_output_format': 'mp4',
-            'postprocessor_args': ['-c:a', 'aac'],  # 強制使用 aac 音訊編碼
+            # 編碼已符合 mp4 時直接複製串流，只重新編碼不相容的軌道
+            'postprocessor_args': format_index.merge_args(format_spec),
         }
     elif file_format == 'mp3':
-        temp_template = os.path.join(download_path, "temp_download.%(ext)s")
         # 嘗試解析用戶選擇的位元率
         selected_bitrate = None
         try:
@@ -141,15 +122,8 @@ def download_video_audio(url, resolution, download_path, file_format, download_s
 
         # 若未選擇特定位元率，則預設為 192 kbps
         preferred_quality = str(selected_bitrate) if selected_bitrate is not None else "192"
-        if selected_bitrate is not None:
-            format_str = f"bestaudio[abr={selected_bitrate}]/bestaudio/best"
-            preferred_quality = str(selected_bitrate)
-        else:
-            format_str = "bestaudio/best"
-            preferred_quality = str(selected_bitrate)
         ydl_opts = {
-            'format': format_str,
-            'outtmpl': temp_template,
+            'format': format_index.compile('mp3', resolution),
             'noplaylist': True,
             'postprocessors': [{
                 'key': 'FFmpegExtractAudio',
@@ -157,6 +131,18 @@ def download_video_audio(url, resolution, download_path, file_format, download_s
                 'preferredquality': preferred_quality,
             }],
         }
+    elif file_format == 'audio':
+        # 保留來源的音訊編碼（通常是 opus 或 aac），只放入對應的容器（opus / m4a / ogg），不重新編碼
+        format_spec = format_index.compile('audio', resolution)
+        native_codec = format_index.native_audio_codec(format_spec)
+        ydl_opts = {
+            'format': format_spec,
+            'noplaylist': True,
+            'postprocessors': [{
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': native_codec,
+            }],
+        }
     # 若勾選下載字幕且選擇了特定語言，加入 yt_dlp 下載字幕的選項
     if download_subtitles and subtitle_lang != "No subtitle":
         ydl_opts["subtitlesformat"] = 'srt'
@@ -170,9 +156,17 @@ def download_video_audio(url, resolution, download_path, file_format, download_s
         # cookiesfrombrowser無法使用, ERROR: _parse_browser_specification() takes from 1 to 4 positional arguments but 6 were given
         # cookies會過期
         ydl_opts['cookiefile'] = cookiefile # 只有這能用，需先匯出cookies.txt
+
+    # 使用隨附的 ffmpeg；若不存在（例如非 Windows 的批次機器）則交給 yt_dlp 從 PATH 尋找
+    if os.path.exists(ffmpeg_path):
+        ydl_opts['ffmpeg_location'] = ffmpeg_path
+    # 保留 .part 檔並從中斷處接續下載
+    ydl_opts['continuedl'] = True
         
     try:
         def progress_hook(d):
+            if cancel_token is not None:
+                cancel_token.check()
             if d['status'] == 'downloading':
                 current = d.get('downloaded_bytes', 0)
                 total = d.get('total_bytes_estimate') or d.get('total_bytes') or 1
@@ -182,28 +176,40 @@ def download_video_audio(url, resolution, download_path, file_format, download_s
             elif d['status'] == 'finished':
                 if progress_callback:
                     progress_callback(0.99)
-        ydl_opts['progress_hooks'] = [progress_hook]
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
-        if file_format == 'mp4':
-            output_ext = 'mp4'
-        else:
-            output_ext = 'mp3'
-        # 取得 yt_dlp 回傳的影片標題
-        raw_title = info['title']
-        # 利用自訂函式先清理標題，再產生唯一檔案名稱
-        safe_title = _sanitize_filename(raw_title)
-        filename = safe_title + f".{output_ext}"
-        unique_filename = _generate_new_filename(download_path, filename)
-        final_filepath = os.path.join(download_path, unique_filename)
-        # 取得暫存檔案的完整路徑
-        temp_filepath = os.path.join(download_path, f"temp_download.{output_ext}")
-        # 重新命名暫存檔案
-        os.rename(temp_filepath, final_filepath)
+        # 每個工作使用專屬的暫存資料夾；重試或重開程式後會回到同一資料夾，從 .part 接續下載
+        subtitle_option = subtitle_lang if download_subtitles else ""
+        with open_staging(download_path, url, file_format, ydl_opts['format'], subtitle_option) as staging:
+            temp_template = os.path.join(staging.path, "download.%(ext)s")
+            # outtmpl 與 progress hook 每次下載不同，借出實例時再設定
+            with get_ydl_pool().lease(ydl_opts, outtmpl=temp_template, progress_hook=progress_hook) as ydl:
+                info = ydl.extract_info(url, download=True)
+            if cancel_token is not None:
+                cancel_token.check()
+            if file_format == 'mp4':
+                output_ext = 'mp4'
+            elif file_format == 'mp3':
+                output_ext = 'mp3'
+            else:
+                output_ext = native_audio_ext(info, native_codec)
+            # 取得 yt_dlp 回傳的影片標題
+            raw_title = info['title']
+            # 利用自訂函式先清理標題，再產生唯一檔案名稱
+            safe_title = _sanitize_filename(raw_title)
+            filename = safe_title + f".{output_ext}"
+            unique_filename = _generate_new_filename(download_path, filename)
+            final_filepath = os.path.join(download_path, unique_filename)
+            # 取得暫存檔案的完整路徑，移到最終位置（字幕檔一併搬出）
+            temp_filepath = os.path.join(staging.path, f"download.{output_ext}")
+            staging.commit(temp_filepath, final_filepath)
     except Exception as e:
+        # yt_dlp 可能將 progress hook 拋出的例外包裝成其他錯誤，以 token 狀態為準
+        if cancel_token is not None and cancel_token.cancelled:
+            logger.info(f"Download cancelled: {url}")
+            raise JobCancelled(cancel_token.reason) from e
         log_and_show_error(f"下載失敗: {e}", master=None)
         raise e
     finally:
-        # 處理完成
-        if progress_callback: progress_callback(-1)
+        # 處理完成；取消時不送出，否則進度匯流排稍後會以「處理完成」覆蓋「已取消」的狀態
+        if progress_callback and not (cancel_token is not None and cancel_token.cancelled):
+            progress_callback(-1)
     return final_filepath
\ No newline at end of file
@@ -1,11 +1,19 @@
 import os
 import re
 import time
+import queue
 import functools
-import subprocess
+import threading
+from urllib.parse import urlparse, parse_qs
+from concurrent.futures import ThreadPoolExecutor
 from logging_config import setup_logger, log_and_show_error
-import yt_dlp
-import uuid
+from ydl_pool import get_ydl_pool
+from metadata_cache import get_video_metadata, canonical_video_id, canonical_video_url
+from format_index import parse_choice, load_format_index, native_audio_ext
+from staging import open_staging
+from download_archive import get_download_archive
+from cancellation import JobCancelled
+from retry_policy import classify_error, host_key, get_host_backoff, PERMANENT, TRANSIENT
 
 # ------------------------------
 # 初始化 Logger
@@ -45,11 +53,171 @@ def _generate_new_filename(download_path, filename):
         counter += 1
     return new_filename
 
+PLAYLIST_BATCH_SIZE = 50
+
+def _playlist_item(entry, resolution, file_format):
+    return {
+        "title": entry.get("title") or "Unknown",
+        "resolution": resolution,
+        "format": file_format,
+        "url": f"https://www.youtube.com/watch?v={entry['id']}",
+    }
+
+def iter_playlist(url, resolution, file_format="mp4", cookiefile='', batch_size=PLAYLIST_BATCH_SIZE, stop_event=None):
+    """
+    逐頁展開播放清單，每累積 batch_size 筆就 yield 一批影片資料字典（格式同 parse_playlist）。
+    只讀取清單本身（影片 ID 與標題），不解析每部影片的格式，第一批通常一兩秒內就會出現；
+    每部影片的詳細資料由 PlaylistDetailFetcher 另外在背景補上。
+    """
+    if "list=" not in url:
+        return
+    ydl_opts = {
+        'quiet': True,
+        'extract_flat': 'in_playlist',  # 只取得清單項目，不解析每部影片
+        'skip_download': True,
+        'noplaylist': False,    # 強制解析播放清單
+    }
+    # 若有指定cookies檔案，則加入 cookies 選項
+    if cookiefile != '':
+        # 使用 cookies 來處理年齡限制或地區限制的影片
+        # cookiesfrombrowser無法使用, ERROR: _parse_browser_specification() takes from 1 to 4 positional arguments but 6 were given
+        # cookies會過期
+        ydl_opts['cookiefile'] = cookiefile # 只有這能用，需先匯出cookies.txt
+
+    with get_ydl_pool().lease(ydl_opts) as ydl:
+        # process=False 時 entries 是依頁數延遲載入的 generator，讀到哪裡才抓到哪裡
+        info = ydl.extract_info(url, download=False, process=False)
+        # watch?v=...&list=... 會先被轉成指向播放清單的 url 結果
+        for _ in range(3):
+            if info.get('_type') not in ('url', 'url_transparent'):
+                break
+            info = ydl.extract_info(info['url'], download=False, process=False)
+        if info.get('entries') is None:
+            log_and_show_error("No playlist entries found!")
+            return
+        batch = []
+        for entry in info['entries']:
+            if stop_event is not None and stop_event.is_set():
+                return
+            if not entry or not entry.get('id'):
+                continue
+            batch.append(_playlist_item(entry, resolution, file_format))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+def filter_synced(items, download_path):
+    """
+    同步模式：移除下載索引中已有的影片。
+    建立索引前就下載過的影片（下載位置已有同名的 mp4 / mp3）也視為已下載，並補記到索引中。
+    """
+    archive = get_download_archive()
+    new_items = []
+    for item in archive.filter_new(items):
+        if item["format"] in ("mp4", "mp3"):
+            existing = os.path.join(download_path, _sanitize_filename(item["title"]) + f".{item['format']}")
+            if os.path.exists(existing):
+                archive.record(item["url"], item["format"], existing)
+                continue
+        new_items.append(item)
+    return new_items
+
+_URL_RE = re.compile(r'https?://\S+')
+URL_LIST_WORKERS = 4  # 同時展開的播放清單數
+
+def is_playlist_url(url):
+    """
+    /playlist?list=... 視為播放清單；watch?v=...&list=... 是從播放清單中分享的單一影片，
+    批次匯入時只下載該影片（播放清單請使用 /playlist 網址）。
+    """
+    parsed = urlparse(url)
+    query = parse_qs(parsed.query)
+    return "list" in query and "v" not in query
+
+def iter_url_file(path):
+    """逐行讀取 URL 清單檔，不必一次載入整個檔案"""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        yield from f
+
+def iter_urls(lines):
+    """從文字行中取出 URL（一行可有多個，# 開頭的行為註解）"""
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        for url in _URL_RE.findall(line):
+            yield url
+
+def expand_url_list(lines, resolution, file_format="mp4", cookiefile='', batch_size=PLAYLIST_BATCH_SIZE,
+                    stop_event=None, max_workers=URL_LIST_WORKERS):
+    """
+    批次匯入：lines 為可逐行讀取的文字（檔案或貼上的內容），混合單一影片與播放清單 URL。
+    單一影片直接轉成影片資料字典；播放清單交給背景執行緒平行展開。
+    所有來源以標準化影片 ID（加上格式）去除重複，youtu.be、watch?v= 與播放清單中的同一部影片只會出現一次。
+    逐批 yield 影片資料字典（格式同 parse_playlist），標題在詳細資料補上前暫時為 URL。
+    """
+    seen = set()
+    results = queue.Queue()
+
+    def dedupe(batch):
+        new_items = []
+        for item in batch:
+            key = (canonical_video_id(item["url"]), item["format"])
+            if key not in seen:
+                seen.add(key)
+                new_items.append(item)
+        return new_items
+
+    def expand(url):
+        try:
+            for batch in iter_playlist(url, resolution, file_format, cookiefile, batch_size, stop_event):
+                results.put(batch)
+        except Exception as e:
+            logger.error(f"Failed to expand playlist {url}: {e}")
+
+    def drain(block=False):
+        while True:
+            try:
+                batch = results.get(timeout=0.2) if block else results.get_nowait()
+            except queue.Empty:
+                return
+            batch = dedupe(batch)
+            if batch:
+                yield batch
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        playlists = []
+        videos = []
+        for url in iter_urls(lines):
+            if stop_event is not None and stop_event.is_set():
+                return
+            if is_playlist_url(url):
+                playlists.append(executor.submit(expand, url))
+            else:
+                url = canonical_video_url(url)
+                videos.append({"title": url, "resolution": resolution, "format": file_format, "url": url})
+                if len(videos) >= batch_size:
+                    batch, videos = dedupe(videos), []
+                    if batch:
+                        yield batch
+            yield from drain()
+        if videos:
+            batch = dedupe(videos)
+            if batch:
+                yield batch
+        while any(not future.done() for future in playlists) or not results.empty():
+            if stop_event is not None and stop_event.is_set():
+                return
+            yield from drain(block=True)
+
 @timeit
-def parse_playlist(url, resolution, file_format="mp4", cookiefile=''):
+def parse_playlist(url, resolution, file_format="mp4", cookiefile='', sync_path=None):
     """
     解析播放清單 URL，若不是播放清單則印出錯誤並回傳空列表；
     否則回傳列表，每筆為影片資料字典，包含 "title", "resolution", "format", "url"。
+    sync_path: 指定下載位置時為同步模式，只回傳尚未下載過的影片（見 filter_synced）。
     """
     if "list=" not in url:
         return []
@@ -58,89 +226,153 @@ def parse_playlist(url, resolution, file_format="mp4", cookiefile=''):
     
     try:
         logger.info("Parsing playlist from URL: %s", url)
-        ydl_opts = {
-            'quiet': True,
-            'extract_flat': False,  # 取得完整資訊(必須為 False)
-            'skip_download': True,
-            'noplaylist': False,    # 強制解析播放清單
-        }
-        # 若有指定cookies檔案，則加入 cookies 選項
-        if cookiefile != '':
-        # 使用 cookies 來處理年齡限制或地區限制的影片
-        # cookiesfrombrowser無法使用, ERROR: _parse_browser_specification() takes from 1 to 4 positional arguments but 6 were given
-        # cookies會過期
-            ydl_opts['cookiefile'] = cookiefile # 只有這能用，需先匯出cookies.txt
-
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-        if "entries" not in info:
-            log_and_show_error("No playlist entries found!")
-            return []
-        for entry in info['entries']:
-            video_url = f"https://www.youtube.com/watch?v={entry['id']}"
-            playlist.append({
-                "title": entry.get("title", "Unknown"),
-                "resolution": resolution,
-                "format": file_format,
-                "url": video_url
-            })
+        for batch in iter_playlist(url, resolution, file_format, cookiefile):
+            playlist.extend(filter_synced(batch, sync_path) if sync_path is not None else batch)
         return playlist
     except Exception as e:
         log_and_show_error(f"Error parsing playlist: {e}")
         return []
 
+class PlaylistDetailFetcher:
+    """
+    在背景平行解析播放清單中每部影片的完整資料。
+    結果存入 metadata_cache，之後下載時不必再解析；每完成一筆呼叫 on_detail(item, metadata)
+    （在工作執行緒中呼叫，更新 UI 前需自行切回主執行緒）。
+    """
+    def __init__(self, cookiefile='', on_detail=None, max_workers=4):
+        self.cookiefile = cookiefile
+        self.on_detail = on_detail
+        self.stop_event = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="playlist-detail")
+
+    def submit(self, items):
+        for item in items:
+            self._executor.submit(self._fetch, item)
+
+    def _fetch(self, item):
+        if self.stop_event.is_set():
+            return
+        try:
+            metadata = get_video_metadata(item["url"], self.cookiefile)
+        except Exception as e:
+            logger.warning(f"Failed to fetch details for {item['url']}: {e}")
+            return
+        if self.on_detail and not self.stop_event.is_set():
+            self.on_detail(item, metadata)
+
+    def close(self):
+        """不再加入新項目，已排入的項目仍會在背景完成"""
+        self._executor.shutdown(wait=False)
+
+    def stop(self):
+        """取消尚未開始的項目"""
+        self.stop_event.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
 @timeit
-def download_video_audio_playlist_with_retry(url, resolution, download_path, file_format, cookiefile='', max_retries=3):
+def download_video_audio_playlist_with_retry(url, resolution, download_path, file_format, cookiefile='', max_retries=3, stats=None, cancel_token=None, progress_callback=None, pipeline=None):
+    """
+    依錯誤類型決定是否重試：永久性錯誤（影片不存在、私人影片等）立即放棄；
+    暫時性錯誤與 429 依主機共用的等待時間（指數成長加隨機抖動）重試，
+    重試時從暫存資料夾中的 .part 檔接續下載。
+    """
+    host = host_key(url)
+    backoff = get_host_backoff()
     for attempt in range(max_retries):
+        # 同一主機的其他下載剛失敗時，先等待再送出請求
+        delay = backoff.delay(host)
+        if delay > 0:
+            logger.info(f"Waiting {delay:.1f}s before requesting {host}")
+            if cancel_token is not None:
+                cancel_token.sleep(delay)
+            else:
+                time.sleep(delay)
         logger.info(f"Attempt {attempt + 1} to download: {url}")
-        result = download_video_audio_playlist(url, resolution, download_path, file_format, cookiefile)
+        try:
+            result = download_video_audio_playlist(url, resolution, download_path, file_format, cookiefile, stats, cancel_token, progress_callback, pipeline)
+        except JobCancelled:
+            raise  # 取消時不再重試
+        except Exception as e:
+            kind = classify_error(e)
+            if kind == PERMANENT:
+                # 不顯示視窗：播放清單可能有大量無法下載的影片，失敗數量由下載結束時的摘要回報
+                logger.error(f"無法下載: {url} ({e})")
+                return None
+            wait = backoff.failure(host, kind)
+            logger.info(f"{kind} error on {host}, next attempt in {wait:.1f}s: {e}")
+            continue
         if result is not None and os.path.exists(result) and os.path.getsize(result) > 0:
+            backoff.success(host)
+            # 記錄到下載索引，之後同步播放清單時略過
+            try:
+                get_download_archive().record(url, file_format, result)
+            except Exception as e:
+                logger.warning(f"Failed to record {url} in download archive: {e}")
             return result
-        logger.info("Retrying in 2 seconds...")
-        time.sleep(2)  # 等待2秒再重試
+        backoff.failure(host, TRANSIENT)
     log_and_show_error(f"多次嘗試仍失敗: {url}")
     return None
 
-def download_video_audio_playlist(url, resolution, download_path, file_format, cookiefile=''):
-    temp_id = uuid.uuid4().hex
+# yt_dlp 的 postprocessor hook 以 pp_key() 回報名稱，已去掉類別名稱的 "FFmpeg" 前綴與 "PP" 後綴
+HANDOFF_POSTPROCESSORS = {"Merger", "ExtractAudio", "VideoConvertor", "VideoRemuxer"}
+
+def make_postprocess_handoff(pipeline, cancel_token):
+    """
+    回傳 (postprocessor_hook, postprocessing)。
+    HANDOFF_POSTPROCESSORS 中的後處理第一次開始時呼叫 pipeline.begin_postprocess(cancel_token)，讓出下載名額；
+    postprocessing 為 list，非空表示已交接，下載函式結束時需呼叫 pipeline.end_postprocess(cancel_token)。
+    """
+    postprocessing = []
+    def postprocessor_hook(d):
+        if pipeline is None or cancel_token is None or postprocessing:
+            return
+        if d['status'] == 'started' and d.get('postprocessor') in HANDOFF_POSTPROCESSORS:
+            postprocessing.append(True)
+            pipeline.begin_postprocess(cancel_token)
+    return postprocessor_hook, postprocessing
+
+def download_video_audio_playlist(url, resolution, download_path, file_format, cookiefile='', stats=None, cancel_token=None, progress_callback=None, pipeline=None):
+    """
+    stats: 選用，提供 add_bytes / record_success / record_error 的物件（例如 AdaptiveScheduler），
+    用來回報下載量與結果以調整並行數。
+    失敗時拋出例外（由 download_video_audio_playlist_with_retry 分類後決定是否重試）。
+    cancel_token: 選用的 CancelToken，暫停時下載在 progress hook 中等待，取消時拋出 JobCancelled
+    （暫存資料夾保留，之後可接續下載）。
+    progress_callback: 選用，以 (已下載位元組, 總位元組) 回報此影片所有串流合計的下載量，
+    總位元組未知時為 0；從 .part 檔接續時已下載位元組包含先前的部分。
+    pipeline: 選用，提供 begin_postprocess / end_postprocess 的物件（例如 AdaptiveScheduler），
+    下載完成、開始 ffmpeg 合併 / 轉檔時讓出下載名額並改用後處理名額（需同時提供 cancel_token）。
+    """
     final_filepath = None
     ffmpeg_path = os.path.join(os.path.dirname(__file__), 'ffmpeg', 'bin', 'ffmpeg.exe')
-    ydl_opts['ffmpeg_location'] = ffmpeg_path
+    # 播放清單解析時已將格式表存入快取，這裡通常不需要再連網
+    format_index = load_format_index(url, cookiefile)
     if file_format == 'mp4':
-        try:
-            # 解析如 "1080p", "720p" 這種格式，只保留數字部分作為 height
-            height_str = resolution.lower().replace('p', '').strip()
-            height = int(height_str)
-        except Exception as e:
+        # 解析如 "1080p", "720p" 這種格式，只保留數字部分作為 height
+        _, height, _ = parse_choice(resolution)
+        if height is None:
             log_and_show_error("解析解析度失敗，請檢查格式是否正確(例如 '1080p')")
-            raise ValueError("解析解析度失敗，請檢查格式是否正確(例如 '1080p')") from e
+            raise ValueError("解析解析度失敗，請檢查格式是否正確(例如 '1080p')")
         
-        temp_template = os.path.join(download_path, f"temp_download_{temp_id}.%(ext)s")
+        format_spec = format_index.compile('mp4', resolution)
         ydl_opts = {
-            # 下載時只指定 height
-            'format': f'bestvideo[height={height}]+bestaudio/best/bestvideo+bestaudio/best',
-            'outtmpl': temp_template,
+            'format': format_spec,
             'noplaylist': True,
             'merge_output_format': 'mp4',
-            'postprocessor_args': ['-c:a', 'aac'],  # 強制使用 aac 音訊編碼
+            # 編碼已符合 mp4 時直接複製串流，只重新編碼不相容的軌道
+            'postprocessor_args': format_index.merge_args(format_spec),
         }
     elif file_format == 'mp3':
-        temp_template = os.path.join(download_path, f"temp_download_{temp_id}.%(ext)s")
         # 嘗試解析用戶選擇的位元率
         selected_bitrate = None
         try:
             selected_bitrate = int(resolution.replace("kbps", "").strip())
         except Exception:
             pass
-        if selected_bitrate is not None:
-            format_str = f"bestaudio[abr={selected_bitrate}]/bestaudio/best"
-            preferred_quality = str(selected_bitrate)
-        else:
-            format_str = "bestaudio/best"
-            preferred_quality = str(selected_bitrate)
+        # 若未選擇特定位元率，則預設為 192 kbps
+        preferred_quality = str(selected_bitrate) if selected_bitrate is not None else "192"
         ydl_opts = {
-            'format': format_str,
-            'outtmpl': temp_template,
+            'format': format_index.compile('mp3', resolution),
             'noplaylist': True,
             'postprocessors': [{
                 'key': 'FFmpegExtractAudio',
@@ -148,6 +380,18 @@ def download_video_audio_playlist(url, resolution, download_path, file_format, c
                 'preferredquality': preferred_quality,
             }],
         }
+    elif file_format == 'audio':
+        # 保留來源的音訊編碼（通常是 opus 或 aac），只放入對應的容器（opus / m4a / ogg），不重新編碼
+        format_spec = format_index.compile('audio', resolution)
+        native_codec = format_index.native_audio_codec(format_spec)
+        ydl_opts = {
+            'format': format_spec,
+            'noplaylist': True,
+            'postprocessors': [{
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': native_codec,
+            }],
+        }
 
     try:
         # 若有指定cookies檔案，則加入 cookies 選項
@@ -156,27 +400,73 @@ def download_video_audio_playlist(url, resolution, download_path, file_format, c
         # cookiesfrombrowser無法使用, ERROR: _parse_browser_specification() takes from 1 to 4 positional arguments but 6 were given
         # cookies會過期
             ydl_opts['cookiefile'] = cookiefile # 只有這能用，需先匯出cookies.txt
+        # 使用隨附的 ffmpeg；若不存在（例如非 Windows 的批次機器）則交給 yt_dlp 從 PATH 尋找
+        if os.path.exists(ffmpeg_path):
+            ydl_opts['ffmpeg_location'] = ffmpeg_path
+        # 保留 .part 檔，重試時從中斷處接續下載
+        ydl_opts['continuedl'] = True
+
+        # 回報本次新增的下載量（以檔名區分影片 / 音訊串流，值為 (已下載, 總量)）
+        streams = {}
+        # 影片 + 音訊串流的合計大小；音訊串流開始下載前，總量就不會只算到影片的部分
+        expected_size = format_index.estimated_size(ydl_opts['format'])
+        def progress_hook(d):
+            if cancel_token is not None:
+                cancel_token.check()
+            if d['status'] != 'downloading':
+                return
+            current = d.get('downloaded_bytes') or 0
+            total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+            previous = streams.get(d.get('filename'), (current, 0))[0]
+            streams[d.get('filename')] = (current, total)
+            if stats is not None and current > previous:
+                stats.add_bytes(current - previous)
+            if progress_callback is not None:
+                progress_callback(sum(c for c, _ in streams.values()), max(expected_size, sum(t for _, t in streams.values())))
+
+        # 第一個 ffmpeg 後處理（合併、擷取音訊等）開始時，表示網路下載已結束，交給後處理階段
+        postprocessor_hook, postprocessing = make_postprocess_handoff(pipeline, cancel_token)
 
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
-        if file_format == 'mp4':
-            output_ext = 'mp4'
-        else:
-            output_ext = 'mp3'
-        # 取得 yt_dlp 回傳的影片標題
-        raw_title = info['title']
-        # 利用自訂函式先清理標題，再產生唯一檔案名稱
-        safe_title = _sanitize_filename(raw_title)
-        filename = safe_title + f".{output_ext}"
-        unique_filename = _generate_new_filename(download_path, filename)
-        final_filepath = os.path.join(download_path, unique_filename)
-        # 取得暫存檔案的完整路徑
-        temp_filepath = os.path.join(download_path, f"temp_download_{temp_id}.{output_ext}")
-        # 重新命名暫存檔案
-        os.rename(temp_filepath, final_filepath)
+        # 每部影片使用專屬的暫存資料夾；重試時回到同一資料夾，不必從頭下載
+        with open_staging(download_path, url, file_format, ydl_opts['format']) as staging:
+            temp_template = os.path.join(staging.path, "download.%(ext)s")
+            # 暫存檔名每部影片不同，借出實例時再設定，讓同一播放清單共用少數幾個實例
+            try:
+                with get_ydl_pool().lease(ydl_opts, outtmpl=temp_template, progress_hook=progress_hook,
+                                          postprocessor_hook=postprocessor_hook) as ydl:
+                    info = ydl.extract_info(url, download=True)
+            finally:
+                if postprocessing:
+                    pipeline.end_postprocess(cancel_token)
+            if cancel_token is not None:
+                cancel_token.check()
+            if file_format == 'mp4':
+                output_ext = 'mp4'
+            elif file_format == 'mp3':
+                output_ext = 'mp3'
+            else:
+                output_ext = native_audio_ext(info, native_codec)
+            # 取得 yt_dlp 回傳的影片標題
+            raw_title = info['title']
+            # 利用自訂函式先清理標題，再產生唯一檔案名稱
+            safe_title = _sanitize_filename(raw_title)
+            filename = safe_title + f".{output_ext}"
+            unique_filename = _generate_new_filename(download_path, filename)
+            final_filepath = os.path.join(download_path, unique_filename)
+            # 取得暫存檔案的完整路徑，移到最終位置
+            temp_filepath = os.path.join(staging.path, f"download.{output_ext}")
+            staging.commit(temp_filepath, final_filepath)
         
+        if stats is not None:
+            stats.record_success()
         return final_filepath
     except Exception as e:
+        # yt_dlp 可能將 progress hook 拋出的例外包裝成其他錯誤，以 token 狀態為準
+        if cancel_token is not None and cancel_token.cancelled:
+            logger.info(f"Download cancelled: {url} ({cancel_token.reason})")
+            raise JobCancelled(cancel_token.reason) from e
         logger.error(f"Error downloading {url}: {e}")
-        # log_and_show_error(f"Error downloading {url} : {e}") # 不需要顯示視窗
-        return None
+        if stats is not None:
+            stats.record_error(e)
+        # 交給 download_video_audio_playlist_with_retry 依錯誤類型決定是否重試，不需要顯示視窗
+        raise
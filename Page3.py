@@ -1,9 +1,16 @@
 import os
-import re
 import time
+import bisect
+import shutil
+import tempfile
 import functools
+import threading
 import subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from logging_config import setup_logger, log_and_show_error
+from cancellation import CancelToken, JobCancelled
+from media_info import probe_media, find_ffmpeg_tool
 
 # ------------------------------
 # 初始化 Logger
@@ -23,21 +30,8 @@ def timeit(func):
 
 def get_media_duration(file_path):
         try:
-            # 使用 ffprobe 取得影片長度（以秒為單位）
-            ffprobe_path = os.path.join(os.path.dirname(__file__), 'ffmpeg', 'bin', 'ffprobe.exe')
-            result = subprocess.run(
-                [ffprobe_path, "-v", "error", "-select_streams", "v:0", "-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", file_path],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                universal_newlines=True
-            )
-            duration_str = result.stdout.strip()
-            duration_float = float(duration_str)
-            # 轉換成 HH:MM:SS 格式
-            hours = int(duration_float // 3600)
-            minutes = int((duration_float % 3600) // 60)
-            seconds = int(duration_float % 60)
-            return f"{hours:02}:{minutes:02}:{seconds:02}"
+            # ffprobe 結果有快取，之後的轉檔、剪輯檢查不會再分析同一個檔案
+            return probe_media(file_path).duration_text
         except Exception as e:
             log_and_show_error(f"Failed to get media duration: {e}")
             return ""
@@ -57,6 +51,22 @@ def time_to_seconds(time_str):
     except Exception as e:
         return 0.0
 
+def conversion_range(input_path, start_time, end_time):
+    """
+    依起訖時間欄位計算 (起始秒數, 轉換長度秒數)；結束時間留空或超過檔案長度時轉到檔案結尾。
+    起始時間超出檔案長度、或結束時間不晚於起始時間時拋出 ValueError。
+    """
+    info = probe_media(input_path)
+    start = time_to_seconds(start_time) if start_time and start_time != "00:00:00" else 0.0
+    end = time_to_seconds(end_time) if end_time and end_time.strip() else info.duration
+    if info.duration:
+        if start >= info.duration:
+            raise ValueError(f"Start time {start_time} is beyond the end of the file ({info.duration_text})")
+        end = min(end, info.duration)
+    if end <= start:
+        raise ValueError(f"End time {end_time} must be later than start time {start_time}")
+    return start, end - start
+
 def _get_unique_filename(path):
     """
     若檔案存在，則自動加上 (1)、(2) … 的後綴
@@ -69,8 +79,93 @@ def _get_unique_filename(path):
         counter += 1
     return new_path
 
+def _raise_if_cancelled(cancel_token, process, output_path):
+    """ffmpeg 結束後檢查是否為取消所致；是的話刪除不完整的輸出檔並拋出 JobCancelled"""
+    if cancel_token is None:
+        return
+    cancel_token.detach_process(process)
+    if cancel_token.cancelled:
+        try:
+            os.remove(output_path)
+        except OSError:
+            pass
+        raise JobCancelled(cancel_token.reason)
+
+# ------------------------------
+# ffmpeg 進度讀取
+# ------------------------------
+STDERR_TAIL = 20  # 失敗時保留的 ffmpeg 錯誤訊息行數
+
+def _number(value, kind):
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        return None  # 欄位不存在或為 N/A
+
+def _progress_event(block, state):
+    # 舊版 ffmpeg 的 out_time_ms 實際單位也是微秒
+    out_time_us = _number(block.get(b"out_time_us") or block.get(b"out_time_ms"), int)
+    return {
+        "out_time": out_time_us / 1e6 if out_time_us is not None else None,
+        "speed": _number(block.get(b"speed", b"").rstrip(b"x"), float),
+        "fps": _number(block.get(b"fps"), float),
+        "bitrate": _number(block.get(b"bitrate", b"").replace(b"kbits/s", b""), float),
+        "total_size": _number(block.get(b"total_size"), int),
+        "frame": _number(block.get(b"frame"), int),
+        "progress": state,
+    }
+
+def read_progress(stream, on_event):
+    """
+    解析 ffmpeg -progress 的輸出（binary stream）。
+    ffmpeg 每隔約 0.5 秒輸出一個 key=value 區塊並以 progress=continue / end 結尾，每個區塊呼叫一次 on_event(event)：
+    {"out_time": 秒, "speed": 倍速, "fps", "bitrate": kbit/s, "total_size": bytes, "frame", "progress": "continue" / "end"}
+    讀取為阻塞式，等待 ffmpeg 輸出時不佔用 CPU；區塊內只保留原始 bytes，結束時才轉換需要的欄位。
+    """
+    block = {}
+    for raw in stream:
+        key, sep, value = raw.partition(b"=")
+        if not sep:
+            continue
+        key = key.strip()
+        if key == b"progress":
+            state = value.strip().decode("ascii", "replace")
+            on_event(_progress_event(block, state))
+            block = {}
+        else:
+            block[key] = value.strip()
+
+def _run_ffmpeg(command, duration, output_path, progress_callback=None, cancel_token=None, on_event=None):
+    """
+    執行 ffmpeg（命令需包含 -progress pipe:1），以 out_time / duration 回報 0~1 的進度。
+    on_event: 選用，收到每個進度區塊的完整資料（見 read_progress）。
+    取消時刪除輸出檔並拋出 JobCancelled；ffmpeg 失敗時拋出 RuntimeError。
+    """
+    # 關閉 stderr 的統計列，只保留錯誤訊息；進度完全由 -progress 提供
+    command = command[:1] + ["-nostats", "-loglevel", "error"] + command[1:]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if cancel_token is not None:
+        cancel_token.attach_process(process)
+    errors = deque(maxlen=STDERR_TAIL)
+    stderr_reader = threading.Thread(target=errors.extend, args=(process.stderr,), daemon=True)
+    stderr_reader.start()
+
+    def handle(event):
+        if on_event:
+            on_event(event)
+        if progress_callback and duration > 0 and event["out_time"] is not None:
+            progress_callback(min(max(event["out_time"], 0.0) / duration, 1.0))
+
+    read_progress(process.stdout, handle)
+    process.wait()
+    stderr_reader.join()
+    _raise_if_cancelled(cancel_token, process, output_path)
+    if process.returncode != 0:
+        message = b"".join(errors).decode("utf-8", "replace").strip()
+        raise RuntimeError(f"ffmpeg exited with code {process.returncode}: {message.splitlines()[-1] if message else ''}")
+
 @timeit
-def convert_video(input_path, resolution, target_format, start_time, duration, video_transcoder="Default", audio_transcoder="Default", progress_callback=None):
+def convert_video(input_path, resolution, target_format, start_time, duration, video_transcoder="Default", audio_transcoder="Default", progress_callback=None, cancel_token=None, threads=None, trim_mode=None, segments=None):
     """
     input_path: 輸入檔案路徑
     resolution: 若為 "Original resolution" 則不進行縮放
@@ -79,72 +174,59 @@ def convert_video(input_path, resolution, target_format, start_time, duration, v
     duration: 剪輯持續時間，單位秒（已由 main.py 計算好）
     video_transcoder / audio_transcoder: 若非 "Default" 則加入對應 ffmpeg 參數
     progress_callback: 回呼函式，傳入 0~1 之間的進度值
+    cancel_token: 選用的 CancelToken，取消時立即結束 ffmpeg 並拋出 JobCancelled
+    threads: 選用，限制編碼器的執行緒數（批次轉檔同時執行多個 ffmpeg 時使用）
+    trim_mode: 選用，TRIM_COPY / TRIM_SMART 時不重新編碼整段影片（由 select_trim_mode 決定）
+    segments: 選用，長影片在關鍵影格切段後最多同時執行幾個 ffmpeg 編碼（見 plan_segments）
     """
     base_output = os.path.splitext(input_path)[0] + f"_converted.{target_format}"
     output_path = _get_unique_filename(base_output)
 
-    ffmpeg_path = os.path.join(os.path.dirname(__file__), 'ffmpeg', 'bin', 'ffmpeg.exe')
+    ffmpeg_path = find_ffmpeg_tool("ffmpeg")
+    if trim_mode == TRIM_COPY:
+        return _stream_copy(ffmpeg_path, input_path, output_path, start_time, duration, progress_callback, cancel_token)
+    if trim_mode == TRIM_SMART:
+        return _smart_cut(ffmpeg_path, input_path, output_path, start_time, duration, progress_callback, cancel_token, threads)
+    video_args = []
+    audio_args = []
+    if video_transcoder != "Default":
+        video_args.extend(["-c:v", video_transcoder])
+    if audio_transcoder != "Default":
+        audio_args.extend(["-c:a", audio_transcoder])
+    if resolution.lower() != "original resolution":
+        video_args.extend(["-vf", f"scale={resolution}"])
+    if segments and segments > 1:
+        info = probe_media(input_path)
+        start = time_to_seconds(start_time) if start_time and start_time != "00:00:00" else 0.0
+        end = start + duration if duration > 0 else info.duration
+        plan = plan_segments(info, start, end, segments)
+        if plan:
+            return _segmented_encode(
+                ffmpeg_path, input_path, output_path, target_format, plan, video_args, audio_args,
+                segments, progress_callback, cancel_token
+            )
+
     command = [ffmpeg_path]
     if start_time and start_time != "00:00:00":
         command.extend(["-ss", start_time])
     command.extend(["-i", input_path])
     if duration > 0:
         command.extend(["-t", str(duration)])
-    if video_transcoder != "Default":
-        command.extend(["-c:v", video_transcoder])
-    if audio_transcoder != "Default":
-        command.extend(["-c:a", audio_transcoder])
-    if resolution.lower() != "original resolution":
-        command.extend(["-vf", f"scale={resolution}"])
+    command.extend(video_args + audio_args)
+    if threads:
+        command.extend(["-threads", str(threads)])
     # 加入 -progress 選項，將進度資訊輸出到 stdout
     command.extend(["-progress", "pipe:1"])
     command.append(output_path)
 
-    # 記錄 wall-clock 起始時間
-    start_clock = time.time()
-    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True, encoding="utf-8")
-    
-    conversion_speed = None  # 預設：已處理媒體時間 / wall-clock 時間
-    estimated_total_wall = None
-
-    while True:
-        line = process.stdout.readline()
-        if not line:
-            if process.poll() is not None:
-                break
-            continue
-        line = line.strip()
-        # 如果讀到已處理時間，單位是毫秒
-        if line.startswith("out_time_ms="):
-            try:
-                out_time_ms = int(line.split("=")[1])
-                processed_media_time = out_time_ms / 1e6  # 換算成秒
-                elapsed_wall = time.time() - start_clock  # 已經過的 wall-clock 時間
-
-                # 如果已處理時間大於0，估算編碼速度（媒體時間 / wall-clock）
-                if processed_media_time > 0:
-                    conversion_speed = processed_media_time / elapsed_wall
-                    # 估算總共需要多少 wall-clock 時間
-                    estimated_total_wall = elapsed_wall + (duration - processed_media_time) / conversion_speed
-
-                # 若估算出總 wall-clock 時間，則使用 wall-clock 進度
-                if estimated_total_wall and progress_callback:
-                    progress = elapsed_wall / estimated_total_wall
-                    progress_callback(min(progress, 1.0))
-            except Exception:
-                pass
-        elif line.startswith("progress="):
-            # 當 ffmpeg 輸出 progress=end 時，代表轉換完成
-            if line.split("=")[1] == "end":
-                if progress_callback:
-                    progress_callback(1.0)
-                break
-    process.wait()
+    _run_ffmpeg(command, duration or probe_media(input_path).duration, output_path, progress_callback, cancel_token)
+    if progress_callback:
+        progress_callback(1.0)
     return output_path
 
 
 @timeit
-def convert_audio(input_path, bitrate, target_format, start_time, duration, progress_callback=None):
+def convert_audio(input_path, bitrate, target_format, start_time, duration, progress_callback=None, cancel_token=None):
     """
     input_path: 輸入檔案路徑
     bitrate: 使用者指定的位元率（例如 "128kbps"）
@@ -152,12 +234,13 @@ def convert_audio(input_path, bitrate, target_format, start_time, duration, prog
     start_time: 剪輯起始時間（格式 "HH:MM:SS"）
     duration: 剪輯持續時間（以秒計），可由 main.py 計算得出
     progress_callback: 回呼函式，傳入 0~1 之間的進度數值
+    cancel_token: 選用的 CancelToken，取消時立即結束 ffmpeg 並拋出 JobCancelled
     """
     # 產生初步 output 路徑，再檢查是否衝突
     base_output = os.path.splitext(input_path)[0] + f"_converted.{target_format}"
     output_path = _get_unique_filename(base_output)
     
-    ffmpeg_path = os.path.join(os.path.dirname(__file__), 'ffmpeg', 'bin', 'ffmpeg.exe')
+    ffmpeg_path = find_ffmpeg_tool("ffmpeg")
     command = [ffmpeg_path]
     
     if start_time and start_time != "00:00:00":
@@ -191,38 +274,435 @@ def convert_audio(input_path, bitrate, target_format, start_time, duration, prog
     command.extend(["-progress", "pipe:1"])
     command.append(output_path)
     
-    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True, encoding="utf-8")
-    
-    # 解析 ffmpeg 進度資訊，更新 progress_callback
-    while True:
-        line = process.stdout.readline()
-        if not line:
-            if process.poll() is not None:
-                break
-            continue
-        line = line.strip()
-        processed_media_time = None
-        if line.startswith("out_time_ms="):
+    # 解析 ffmpeg 進度資訊，以 out_time / duration 更新 progress_callback
+    _run_ffmpeg(command, duration or probe_media(input_path).duration, output_path, progress_callback, cancel_token)
+    if progress_callback:
+        progress_callback(1.0)
+    return output_path
+
+# ------------------------------
+# 無損剪輯：stream copy 與 smart cut
+# ------------------------------
+TRIM_COPY = "copy"    # 整段 stream copy，起點對齊到前一個關鍵影格
+TRIM_SMART = "smart"  # 只重新編碼頭尾不完整的 GOP，中段 stream copy，起訖精準到影格
+# 各容器可直接放入的編碼（ffprobe 的 codec_name）；mkv 幾乎可放入任何編碼，不在此列
+CONTAINER_CODECS = {
+    "mp4": {"h264", "hevc", "av1", "mpeg4", "aac", "mp3", "ac3", "eac3", "opus", "alac"},
+    "mov": {"h264", "hevc", "mpeg4", "prores", "aac", "mp3", "ac3", "alac", "pcm_s16le", "pcm_s24le"},
+    "webm": {"vp8", "vp9", "av1", "opus", "vorbis"},
+}
+# smart cut 頭尾片段的編碼參數。輸出檔只有一份 SPS/PPS（mp4 的 avcC），
+# 頭尾片段的編碼、profile、level 與色彩資訊必須與 stream copy 的中段相同，因此只支援 h264。
+# hevc 的關鍵影格通常是 open GOP 的 CRA（x265 預設），其後的影格會參考前一個 GOP，無法在此切開，
+# 其他編碼也無法保證參數一致，都改用 TRIM_COPY
+SMART_CUT_ENCODERS = {
+    "h264": ["-c:v", "libx264", "-crf", "18"],
+}
+# ffprobe 的 profile 名稱 -> 編碼器的 -profile:v
+SMART_CUT_PROFILES = {
+    "h264": {"Constrained Baseline": "baseline", "Baseline": "baseline", "Main": "main", "High": "high",
+             "High 10": "high10", "High 4:2:2": "high422", "High 4:4:4 Predictive": "high444"},
+}
+# ffprobe 的色彩欄位 -> ffmpeg 的輸出參數
+SMART_CUT_COLOR_OPTIONS = [
+    ("color_primaries", "-color_primaries"),
+    ("color_transfer", "-color_trc"),
+    ("color_space", "-colorspace"),
+    ("color_range", "-color_range"),
+]
+STREAM_COPY_COST = 0.05   # stream copy 每秒媒體的耗時約為重新編碼的 5%，用來分配各步驟的進度比重
+KEYFRAME_EPSILON = 0.001  # 時間戳比較的容許誤差（秒）
+FRAME_RATE_TOLERANCE = 0.01  # avg_frame_rate 與 r_frame_rate 相差在此範圍內視為固定影格率
+
+def smart_cut_encoder_args(video):
+    """
+    依原始視訊串流（MediaInfo.video）產生 smart cut 頭尾片段的編碼參數，
+    沿用原始的 profile、level、像素格式與色彩資訊，讓重新編碼的片段與中段的參數一致。
+    無法保證一致（其他編碼、未知的 profile / level、交錯掃描或非固定影格率）時回傳 None。
+    """
+    codec = video["codec"]
+    profile = SMART_CUT_PROFILES.get(codec, {}).get(video.get("profile"))
+    level = video.get("level") or 0
+    if codec not in SMART_CUT_ENCODERS or profile is None or level <= 0:
+        return None
+    if video.get("field_order") not in (None, "progressive", "unknown"):
+        return None
+    # 中段以影格數截取，需要固定的影格率
+    if video["fps"] <= 0 or abs(video["fps"] - video["r_fps"]) > FRAME_RATE_TOLERANCE:
+        return None
+    # level_idc：31 -> 3.1，9 為 level 1b
+    args = SMART_CUT_ENCODERS[codec] + ["-profile:v", profile, "-level", "1b" if level == 9 else f"{level / 10:.1f}"]
+    if video["pix_fmt"]:
+        args.extend(["-pix_fmt", video["pix_fmt"]])
+    for key, option in SMART_CUT_COLOR_OPTIONS:
+        if video.get(key) and video[key] != "unknown":
+            args.extend([option, video[key]])
+    return args
+
+def select_trim_mode(input_path, resolution, target_format, video_transcoder="Default", audio_transcoder="Default", start_time="00:00:00", duration=0, precise=True):
+    """
+    沒有縮放、也沒有指定編碼器時選擇不重新編碼的模式，否則回傳 None（完整重新編碼）。
+    有剪輯起訖且 precise 為 True 時使用 TRIM_SMART（起訖精準），否則使用 TRIM_COPY；
+    頭尾片段無法沿用原始的編碼參數（見 smart_cut_encoder_args）時同樣使用 TRIM_COPY。
+    原始編碼無法放入目標容器時同樣回傳 None。
+    """
+    if resolution.lower() != "original resolution" or video_transcoder != "Default" or audio_transcoder != "Default":
+        return None
+    try:
+        info = probe_media(input_path)
+    except Exception as e:
+        logger.warning(f"Failed to probe {input_path}, falling back to re-encoding: {e}")
+        return None
+    if not info.video_codec:
+        return None
+    target_format = target_format.lower()
+    if target_format != "mkv":
+        allowed = CONTAINER_CODECS.get(target_format)
+        if allowed is None or not {info.video_codec, *info.audio_codecs} <= allowed:
+            return None
+    start = time_to_seconds(start_time) if start_time else 0
+    trimmed = start > 0 or (0 < duration and start + duration < info.duration - KEYFRAME_EPSILON)
+    mode = TRIM_SMART if trimmed and precise and smart_cut_encoder_args(info.video) is not None else TRIM_COPY
+    logger.info(f"Using {mode} trim for {input_path} ({info.video_codec} -> {target_format})")
+    return mode
+
+def _stream_copy(ffmpeg_path, input_path, output_path, start_time, duration, progress_callback=None, cancel_token=None):
+    """不重新編碼，直接複製串流；有起始時間時從前一個關鍵影格開始"""
+    command = [ffmpeg_path]
+    if start_time and start_time != "00:00:00":
+        command.extend(["-ss", start_time])
+    command.extend(["-i", input_path])
+    if duration > 0:
+        command.extend(["-t", str(duration)])
+    command.extend(["-map", "0:v:0", "-map", "0:a?", "-c", "copy", "-avoid_negative_ts", "make_zero"])
+    command.extend(["-progress", "pipe:1", output_path])
+    _run_ffmpeg(command, duration or probe_media(input_path).duration, output_path, progress_callback, cancel_token)
+    if progress_callback:
+        progress_callback(1.0)
+    return output_path
+
+def _write_concat_list(work_dir, parts, durations=None):
+    """
+    寫入 concat demuxer 的檔案清單，回傳清單路徑。
+    durations: 選用，各片段的長度（秒）；指定後 concat 以此計算下一段的起點，不使用容器記錄的長度
+    """
+    list_file = os.path.join(work_dir, "parts.txt")
+    with open(list_file, "w", encoding="utf-8") as f:
+        for index, part in enumerate(parts):
+            f.write("file '{}'\n".format(part.replace("'", "'\\''")))
+            if durations:
+                f.write(f"duration {durations[index]:.6f}\n")
+    return list_file
+
+def _smart_cut(ffmpeg_path, input_path, output_path, start_time, duration, progress_callback=None, cancel_token=None, threads=None):
+    """
+    精準剪輯：起點到第一個關鍵影格、最後一個關鍵影格到終點這兩段以原始編碼重新編碼，
+    中間完整的 GOP 直接 stream copy，三段影像以 concat 串接後再與 stream copy 的音訊合併。
+    """
+    info = probe_media(input_path)
+    start = time_to_seconds(start_time) if start_time and start_time != "00:00:00" else 0.0
+    end = start + duration if duration > 0 else info.duration
+    keyframes = info.keyframes(start - KEYFRAME_EPSILON, end + KEYFRAME_EPSILON)
+    head_end = next((t for t in keyframes if t >= start - KEYFRAME_EPSILON), None)
+    tail_start = next((t for t in reversed(keyframes) if t <= end + KEYFRAME_EPSILON), None)
+
+    # (起點, 終點, 是否重新編碼)
+    if head_end is None or tail_start is None or tail_start <= head_end:
+        # 範圍內沒有完整的 GOP，整段重新編碼（片段很短，成本低）
+        segments = [(start, end, True)]
+    else:
+        segments = []
+        if head_end - start > KEYFRAME_EPSILON:
+            segments.append((start, head_end, True))
+        segments.append((head_end, tail_start, False))
+        if end - tail_start > KEYFRAME_EPSILON:
+            segments.append((tail_start, end, True))
+
+    encoder = smart_cut_encoder_args(info.video)
+    if encoder is None:
+        raise RuntimeError(f"Smart cut cannot match the encoding parameters of {input_path}")
+    weights = [(seg_end - seg_start) * (1.0 if encode else STREAM_COPY_COST) for seg_start, seg_end, encode in segments]
+    weights.append((end - start) * STREAM_COPY_COST)  # 最後的合併步驟
+    total_weight = sum(weights) or 1.0
+
+    def step_callback(step):
+        if not progress_callback:
+            return None
+        offset = sum(weights[:step]) / total_weight
+        return lambda progress: progress_callback(offset + progress * weights[step] / total_weight)
+
+    work_dir = tempfile.mkdtemp(prefix=".smartcut_", dir=os.path.dirname(output_path) or None)
+    try:
+        parts = []
+        for index, (seg_start, seg_end, encode) in enumerate(segments):
+            part = os.path.join(work_dir, f"part{index}.mkv")
+            command = [ffmpeg_path, "-y"]
+            if encode:
+                command.extend(["-ss", f"{seg_start:.6f}", "-i", input_path, "-t", f"{seg_end - seg_start:.6f}", "-map", "0:v:0", "-an"])
+                command.extend(encoder)
+                if threads:
+                    command.extend(["-threads", str(threads)])
+            else:
+                # 從略晚於關鍵影格的位置 seek，ffmpeg 會對齊回該關鍵影格。
+                # stream copy 的 -t 依解碼順序截斷，會多帶入下一個關鍵影格與其後重新排序的影格，改以影格數截取
+                frames = round((seg_end - seg_start) * info.video["fps"])
+                command.extend(["-ss", f"{seg_start + KEYFRAME_EPSILON:.6f}", "-i", input_path, "-frames:v", str(frames),
+                                "-map", "0:v:0", "-an", "-c", "copy", "-avoid_negative_ts", "make_zero"])
+            command.extend(["-progress", "pipe:1", part])
+            _run_ffmpeg(command, seg_end - seg_start, part, step_callback(index), cancel_token)
+            parts.append(part)
+
+        durations = [seg_end - seg_start for seg_start, seg_end, _ in segments]
+        command = [ffmpeg_path, "-f", "concat", "-safe", "0", "-i", _write_concat_list(work_dir, parts, durations)]
+        command.extend(["-ss", f"{start:.6f}", "-t", f"{end - start:.6f}", "-i", input_path])
+        # 輸入 seek 會對齊到前一個視訊關鍵影格，音訊因此多出起點之前的封包；
+        # -copypriorss 0 捨棄這些封包，否則 make_zero 會讓視訊整段延後、影音不同步
+        command.extend(["-map", "0:v:0", "-map", "1:a?", "-c", "copy", "-copypriorss", "0", "-avoid_negative_ts", "make_zero"])
+        time_base = info.video.get("time_base") or ""
+        if os.path.splitext(output_path)[1].lower() in (".mp4", ".mov") and time_base.startswith("1/"):
+            # 沿用原始影片的時間基準
+            command.extend(["-video_track_timescale", time_base[2:]])
+        command.extend(["-progress", "pipe:1", output_path])
+        _run_ffmpeg(command, end - start, output_path, step_callback(len(segments)), cancel_token)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    if progress_callback:
+        progress_callback(1.0)
+    return output_path
+
+# ------------------------------
+# 長影片分段並行編碼
+# ------------------------------
+SEGMENT_MIN_SOURCE = 600   # 轉換長度超過 10 分鐘才分段，較短的影片分段與合併的成本不划算
+SEGMENT_MIN_LENGTH = 60    # 每段至少 60 秒
+SEGMENTS_PER_WORKER = 2    # 段數為並行數的兩倍，先完成的 ffmpeg 可以接手剩下的段落
+
+def plan_segments(info, start, end, workers):
+    """
+    將 [start, end] 在關鍵影格上切成約 workers * SEGMENTS_PER_WORKER 段，回傳 [(起點, 終點)]。
+    切點在關鍵影格上，各段解碼時不必讀取前一段的資料；太短或沒有視訊時回傳 None（不分段）。
+    """
+    if workers < 2 or not info.video or end - start < SEGMENT_MIN_SOURCE:
+        return None
+    count = min(workers * SEGMENTS_PER_WORKER, int((end - start) // SEGMENT_MIN_LENGTH))
+    keyframes = info.keyframes(start, end)
+    boundaries = [start]
+    for i in range(1, count):
+        index = bisect.bisect_left(keyframes, start + (end - start) * i / count)
+        if index == len(keyframes):
+            break
+        cut = keyframes[index]
+        if cut - boundaries[-1] >= SEGMENT_MIN_LENGTH and end - cut >= SEGMENT_MIN_LENGTH:
+            boundaries.append(cut)
+    boundaries.append(end)
+    if len(boundaries) < 3:
+        return None
+    return list(zip(boundaries, boundaries[1:]))
+
+def _segmented_encode(ffmpeg_path, input_path, output_path, target_format, plan, video_args, audio_args, workers, progress_callback=None, cancel_token=None):
+    """
+    以 workers 個 ffmpeg 並行編碼 plan 中的各段影像（每個 ffmpeg 分到 CPU 核心數 / workers 個執行緒），
+    再以 concat demuxer 無損串接，並與音訊（只編碼一次）合併成輸出檔。
+    各段的暫存檔與輸出檔同一容器，未指定編碼器時使用與一般轉檔相同的預設編碼器。
+    """
+    start, end = plan[0][0], plan[-1][1]
+    threads = max(1, (os.cpu_count() or 2) // workers)
+    encoded = [0.0] * len(plan)  # 各段已編碼的媒體秒數
+    lock = threading.Lock()
+    encode_share = 1.0 / (1.0 + STREAM_COPY_COST)  # 剩下的比重留給最後的合併步驟
+
+    def segment_callback(index):
+        if not progress_callback:
+            return None
+
+        def callback(progress):
+            with lock:
+                encoded[index] = progress * (plan[index][1] - plan[index][0])
+                total = sum(encoded)
+            progress_callback(total / (end - start) * encode_share)
+        return callback
+
+    # 各段共用的子 token：使用者取消時一併取消；任一段失敗時以它結束其他仍在編碼的 ffmpeg
+    segment_token = cancel_token.child() if cancel_token is not None else CancelToken()
+    work_dir = tempfile.mkdtemp(prefix=".segments_", dir=os.path.dirname(output_path) or None)
+    try:
+        parts = [os.path.join(work_dir, f"part{index}.{target_format}") for index in range(len(plan))]
+
+        def encode(index):
+            seg_start, seg_end = plan[index]
+            command = [ffmpeg_path, "-y", "-ss", f"{seg_start:.6f}", "-i", input_path, "-t", f"{seg_end - seg_start:.6f}",
+                       "-map", "0:v:0", "-an"]
+            command.extend(video_args)
+            command.extend(["-threads", str(threads), "-progress", "pipe:1", parts[index]])
+            _run_ffmpeg(command, seg_end - seg_start, parts[index], segment_callback(index), segment_token)
+
+        logger.info(f"Encoding {input_path} in {len(plan)} segments with {workers} ffmpeg process(es)")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(encode, index) for index in range(len(plan))]
             try:
-                # 注意： out_time_ms 的單位是 microseconds
-                out_time_ms = int(line.split("=")[1])
-                processed_media_time = out_time_ms / 1000000.0
-            except Exception:
-                pass
-        elif line.startswith("out_time="):
+                for future in as_completed(futures):
+                    future.result()
+            except BaseException:
+                # 一段失敗或取消時立即結束其他段的 ffmpeg（未完成的輸出檔由 _run_ffmpeg 刪除），尚未開始的段落不再執行
+                segment_token.cancel("segment failed")
+                for future in futures:
+                    future.cancel()
+                raise
+
+        command = [ffmpeg_path, "-f", "concat", "-safe", "0", "-i", _write_concat_list(work_dir, parts)]
+        command.extend(["-ss", f"{start:.6f}", "-t", f"{end - start:.6f}", "-i", input_path])
+        command.extend(["-map", "0:v:0", "-map", "1:a?", "-c:v", "copy"])
+        command.extend(audio_args)
+        command.extend(["-progress", "pipe:1", output_path])
+        final_callback = None
+        if progress_callback:
+            final_callback = lambda progress: progress_callback(encode_share + progress * (1.0 - encode_share))
+        _run_ffmpeg(command, end - start, output_path, final_callback, cancel_token)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    if progress_callback:
+        progress_callback(1.0)
+    return output_path
+
+MEDIA_EXTENSIONS = (".mp4", ".webm", ".mkv", ".mov", ".mp3", ".wav", ".flac", ".ogg", ".m4a", ".opus")
+VIDEO_ENCODER_THREADS = 4   # 一個 x264 / x265 編碼程序大約能有效利用的核心數
+QUEUE_PUBLISH_INTERVAL = 0.5
+
+def collect_media_files(folder):
+    """列出資料夾（含子資料夾）中的影音檔，依路徑排序"""
+    files = []
+    for root, _, names in os.walk(folder):
+        for name in names:
+            if name.lower().endswith(MEDIA_EXTENSIONS) and "_converted" not in name:
+                files.append(os.path.join(root, name))
+    return sorted(files)
+
+def conversion_workers(conv_type, cpu_count=None):
+    """
+    批次轉檔的並行數，回傳 (同時執行的 ffmpeg 數, 每個 ffmpeg 的 -threads)。
+    影片編碼器本身是多執行緒，依 VIDEO_ENCODER_THREADS 分配核心，避免彼此搶 CPU；
+    音訊編碼器幾乎都是單執行緒，每個核心一個 ffmpeg（-threads 為 None，使用 ffmpeg 預設）。
+    """
+    cores = cpu_count or os.cpu_count() or 2
+    if conv_type == "video":
+        workers = max(1, cores // VIDEO_ENCODER_THREADS)
+        return workers, max(1, cores // workers)
+    return cores, None
+
+class ConversionQueue:
+    """
+    批次轉檔佇列，同時執行 max_workers 個 ffmpeg。
+    jobs: 每個檔案一個資料字典（至少包含 "path"），佇列會在其中更新
+          state（pending / running / done / failed / cancelled）、progress、speed（媒體秒數 / 實際秒數）與 output。
+    convert(job, progress_callback, cancel_token): 轉換單一檔案並回傳輸出路徑；需在 job["duration"] 填入媒體長度（秒）。
+    on_update(snapshot): 在工作執行緒中呼叫，最多每 QUEUE_PUBLISH_INTERVAL 秒一次（檔案開始或結束時一定呼叫）。
+    measure(job): 選用，開始前取得每個檔案的媒體長度（秒），用來排定轉檔順序並讓整體進度從一開始就正確加權。
+    """
+    def __init__(self, jobs, convert, max_workers, on_update=None, measure=None):
+        self.jobs = jobs
+        self.convert = convert
+        self.max_workers = max(1, int(max_workers))
+        self.on_update = on_update
+        self.measure = measure
+        self._tokens = [CancelToken() for _ in jobs]
+        self._lock = threading.Lock()
+        self._last_publish = 0.0
+        self._start = None
+        for job in jobs:
+            job.update(state="pending", progress=0.0, speed=0.0, output=None)
+
+    def run(self):
+        """轉換所有檔案，全部結束後回傳；個別檔案失敗不影響其他檔案"""
+        self._start = time.monotonic()
+        logger.info(f"Converting {len(self.jobs)} file(s) with {self.max_workers} ffmpeg process(es)")
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for index in self._plan(executor):
+                executor.submit(self._run_job, self.jobs[index], self._tokens[index])
+        self._publish(force=True)
+        return self.jobs
+
+    def _plan(self, executor):
+        """
+        回傳送出工作的順序（jobs 的索引）。
+        有 measure 時先並行取得各檔案的長度，再由長到短送出：最長的檔案最先開始，所有 ffmpeg 較可能同時結束。
+        """
+        if self.measure is None:
+            return range(len(self.jobs))
+
+        def measure(job):
             try:
-                out_time_str = line.split("=")[1].strip()
-                processed_media_time = time_to_seconds(out_time_str)
-            except Exception:
-                pass
-        
-        if processed_media_time is not None and duration > 0 and progress_callback:
-            progress = processed_media_time / duration
-            progress_callback(min(progress, 1.0))
-        
-        if line.startswith("progress=") and line.split("=")[1] == "end":
-            if progress_callback:
-                progress_callback(1.0)
-            break
-    process.wait()
-    return output_path
\ No newline at end of file
+                job["duration"] = self.measure(job)
+            except Exception as e:
+                # 轉換該檔案時會再遇到同樣的錯誤並標記為失敗
+                logger.warning(f"Failed to measure {job['path']}: {e}")
+
+        list(executor.map(measure, self.jobs))
+        return sorted(range(len(self.jobs)), key=lambda index: -(self.jobs[index].get("duration") or 0))
+
+    def cancel(self):
+        for token in self._tokens:
+            token.cancel()
+
+    def _run_job(self, job, token):
+        if token.cancelled:
+            job["state"] = "cancelled"
+            return
+        job["state"] = "running"
+        job_start = time.monotonic()
+        self._publish(force=True)
+
+        def progress_callback(progress):
+            job["progress"] = progress
+            elapsed = time.monotonic() - job_start
+            if elapsed > 0:
+                job["speed"] = progress * (job.get("duration") or 0) / elapsed
+            self._publish()
+
+        try:
+            job["output"] = self.convert(job, progress_callback, token)
+            job["state"] = "done"
+            job["progress"] = 1.0
+        except JobCancelled:
+            job["state"] = "cancelled"
+        except Exception as e:
+            logger.error(f"Conversion failed for {job['path']}: {e}")
+            job["state"] = "failed"
+            job["error"] = str(e)
+        finally:
+            job["speed"] = 0.0
+            self._publish(force=True)
+
+    def snapshot(self):
+        """
+        回傳 {"progress": 0~1, "throughput": 每實際秒處理的媒體秒數, "finished": 已結束的檔案數, "total": 檔案數}。
+        整體進度以媒體長度加權；長度未知的檔案以已知檔案的平均長度估算。
+        """
+        durations = [job["duration"] for job in self.jobs if job.get("duration")]
+        average = sum(durations) / len(durations) if durations else 1.0
+        processed = total = 0.0
+        finished = 0
+        for job in self.jobs:
+            duration = job.get("duration") or average
+            if job["state"] in ("done", "failed", "cancelled"):
+                finished += 1
+            if job["state"] in ("failed", "cancelled"):
+                continue
+            processed += job["progress"] * duration
+            total += duration
+        elapsed = time.monotonic() - self._start if self._start else 0
+        return {
+            "progress": processed / total if total else 1.0,
+            "throughput": processed / elapsed if elapsed > 0 else 0.0,
+            "finished": finished,
+            "total": len(self.jobs),
+        }
+
+    def _publish(self, force=False):
+        if self.on_update is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_publish < QUEUE_PUBLISH_INTERVAL:
+                return
+            self._last_publish = now
+        self.on_update(self.snapshot())
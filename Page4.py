@@ -4,7 +4,7 @@ Because ssml is not supported in the edge-tts, so the paragraphs cannot be separ
 from edge_tts import Communicate, list_voices
 import functools
 import time
-from logging_config import setup_logger, log_and_show_error
+from logging_config import setup_logger
 import os
 
 # 初始化 Logger
@@ -21,10 +21,18 @@ def timeit(func):
         return result
     return wrapper
 
-async def fetch_voice_names(proxy: str = None):
+# 語音清單幾乎不會變動，依 proxy 快取，切換語言時不必再次連線
+_voice_names_cache = {}
+
+async def fetch_voice_names(proxy: str = None, refresh: bool = False):
     # 回傳所有 ShortName 的字串清單
+    if not refresh and proxy in _voice_names_cache:
+        return _voice_names_cache[proxy]
+    # edge-tts 會在請求結束時關閉傳入的 connector，無法與其他請求共用連線池
     voices = await list_voices(connector=None, proxy=proxy)
-    return [v["ShortName"] for v in voices]
+    names = [v["ShortName"] for v in voices]
+    _voice_names_cache[proxy] = names
+    return names
 
 async def convert_text_to_speech(
     text: str,
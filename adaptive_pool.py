@@ -0,0 +1,360 @@
+'''
+播放清單下載的工作佇列與自適應並行數控制。
+AdaptiveScheduler 依優先順序取出工作，同一時間最多執行 limit 個，並支援暫停 / 恢復 / 取消；
+控制執行緒每隔 interval 秒依據這段期間的總下載速度、錯誤率 / HTTP 429 次數與 CPU 使用率
+在 [min_workers, max_workers] 範圍內調整 limit，每次調整的原因都會寫入 log 並以 on_change 回報。
+超過 stall_timeout 沒有進展的工作會被取消並讓出位置，不會佔住整個批次的一個名額。
+工作分為兩個階段：網路下載（受 limit 限制）與 ffmpeg 合併 / 轉檔（最多 cpu_workers 個，預設為 CPU 核心數）。
+工作進入後處理時呼叫 begin_postprocess() 讓出下載名額，下一個下載立即開始；
+等待後處理的工作最多 handoff_size 個，超過時暫停開始新的下載（backpressure）。
+'''
+import os
+import time
+import heapq
+import itertools
+import threading
+from concurrent.futures import Future, InvalidStateError
+from cancellation import CancelToken, JobCancelled
+from retry_policy import classify_error, RATE_LIMITED
+from logging_config import setup_logger
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# ------------------------------
+# 初始化 Logger
+# ------------------------------
+logger = setup_logger(__name__)
+
+ERROR_RATE_LIMIT = 0.3   # 錯誤率超過 30% 時減少並行數
+CPU_LIMIT = 90.0         # 沒有後處理在執行、CPU 使用率仍超過 90% 時減少並行數
+MIN_GAIN = 1.05          # 增加並行數後，速度至少要提升 5% 才保留
+COOLDOWN_TICKS = 3       # 增加並行數無效後，暫停嘗試增加的次數
+STALL_TIMEOUT = 600      # 工作超過 10 分鐘沒有任何進度回報，視為卡住
+
+def _cpu_percent():
+    """整機 CPU 使用率（%）；沒有 psutil 時以 load average 估算，都無法取得時回傳 None"""
+    if psutil is not None:
+        return psutil.cpu_percent(interval=None)
+    if hasattr(os, "getloadavg"):
+        return os.getloadavg()[0] / (os.cpu_count() or 1) * 100
+    return None
+
+class QueuedJob:
+    """佇列中的一筆工作；future 取得結果，token 用來暫停 / 取消該工作"""
+    def __init__(self, fn, args, kwargs, priority, token):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.token = token
+        self.future = Future()
+
+class AdaptiveScheduler:
+    """
+    使用方式：
+        with AdaptiveScheduler(1, 8, initial=4, on_change=callback) as scheduler:
+            token = CancelToken()
+            job = scheduler.submit(fn, item, token, stats=scheduler, token=token, priority=0)
+            ... job.future.result() ...
+    priority 較大的工作先執行，同優先順序依加入順序。
+    工作函式透過 add_bytes / record_success / record_error 回報下載量與結果，
+    並在檢查點呼叫 token.check()（暫停時等待、取消時中斷）；
+    下載完成、開始 ffmpeg 處理前後分別呼叫 begin_postprocess(token) / end_postprocess(token)。
+    on_change(limit, reason) 在控制執行緒中呼叫。
+    """
+    def __init__(self, min_workers=1, max_workers=8, initial=None, interval=5.0, on_change=None, stall_timeout=STALL_TIMEOUT,
+                 cpu_workers=None, handoff_size=None):
+        self.min_workers = max(1, int(min_workers))
+        self.max_workers = max(self.min_workers, int(max_workers))
+        initial = initial if initial is not None else self.min_workers
+        self.limit = min(max(int(initial), self.min_workers), self.max_workers)
+        self.interval = interval
+        self.on_change = on_change
+        self.stall_timeout = stall_timeout
+        self._cond = threading.Condition()
+        self._queue = []            # heap: (-priority, 序號, QueuedJob)
+        self._seq = itertools.count()
+        self.cpu_workers = max(1, int(cpu_workers or os.cpu_count() or 2))
+        self.handoff_size = max(1, int(handoff_size or self.cpu_workers))
+        self._active = set()          # 已開始、尚未結束的工作
+        self._running = set()         # 其中處於下載階段的工作（佔用 limit）
+        self._handoff = set()         # 等待後處理名額的 token
+        self._postprocessing = set()  # 正在後處理的 token
+        self._waiting = 0
+        self._paused = False
+        self._closed = False
+        self._stats_lock = threading.Lock()
+        self._reset_window()
+        self._last_grow = None      # (增加前的速度, 增加後的 limit)
+        self._cooldown = 0
+        self._stop = threading.Event()
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True)
+        self._controller = threading.Thread(target=self._control_loop, daemon=True)
+        _cpu_percent()  # psutil 第一次呼叫只是建立基準值
+        self._dispatcher.start()
+        self._controller.start()
+        self._notify(self.limit, "initial")
+
+    # ------------------------------
+    # 佇列操作
+    # ------------------------------
+    def submit(self, fn, *args, priority=0, token=None, **kwargs):
+        job = QueuedJob(fn, args, kwargs, priority, token or CancelToken())
+        with self._cond:
+            heapq.heappush(self._queue, (-priority, next(self._seq), job))
+            self._waiting = len(self._queue)
+            self._cond.notify_all()
+        return job
+
+    def set_priority(self, job, priority):
+        """調整尚未開始的工作的優先順序"""
+        with self._cond:
+            job.priority = priority
+            self._queue = [(-j.priority, seq, j) for _, seq, j in self._queue]
+            heapq.heapify(self._queue)
+            self._cond.notify_all()
+
+    def pause(self):
+        """暫停：不再開始新工作，執行中的工作在下一個檢查點等待"""
+        with self._cond:
+            self._paused = True
+            running = list(self._active)
+        for job in running:
+            job.token.pause()
+        logger.info("Playlist queue paused")
+
+    def resume(self):
+        with self._cond:
+            self._paused = False
+            running = list(self._active)
+            self._cond.notify_all()
+        for job in running:
+            job.token.resume()
+        logger.info("Playlist queue resumed")
+
+    @property
+    def paused(self):
+        return self._paused
+
+    def cancel(self, job, reason="cancelled"):
+        """取消單一工作：尚未開始者直接移出佇列，執行中者中斷下載並結束子程序"""
+        with self._cond:
+            queued = [entry for entry in self._queue if entry[2] is job]
+            if queued:
+                self._queue.remove(queued[0])
+                heapq.heapify(self._queue)
+                self._waiting = len(self._queue)
+                self._cond.notify_all()
+        job.token.cancel(reason)
+        if queued:
+            job.future.cancel()
+            job.future.set_running_or_notify_cancel()
+
+    def cancel_all(self, reason="cancelled"):
+        with self._cond:
+            jobs = [job for _, _, job in self._queue] + list(self._active)
+        for job in jobs:
+            self.cancel(job, reason)
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                while not self._stop.is_set() and (
+                    self._paused or not self._queue or len(self._running) >= self.limit
+                    or len(self._handoff) >= self.handoff_size
+                ):
+                    self._cond.wait()
+                if self._stop.is_set():
+                    return
+                _, _, job = heapq.heappop(self._queue)
+                self._waiting = len(self._queue)
+                self._running.add(job)
+                self._active.add(job)
+            if not job.future.set_running_or_notify_cancel():
+                self._release(job)
+                continue
+            job.token.touch()
+            threading.Thread(target=self._run, args=(job,), daemon=True).start()
+
+    def _run(self, job):
+        try:
+            result = job.fn(*job.args, **job.kwargs)
+        except BaseException as e:
+            self._finish(job, error=e)
+        else:
+            self._finish(job, result=result)
+        finally:
+            self._release(job)
+
+    @staticmethod
+    def _finish(job, result=None, error=None):
+        # 卡住而被放棄的工作已先設定結果，之後執行緒結束時忽略
+        try:
+            if error is not None:
+                job.future.set_exception(error)
+            else:
+                job.future.set_result(result)
+        except InvalidStateError:
+            pass
+
+    def _release(self, job):
+        with self._cond:
+            if job in self._active:
+                self._active.discard(job)
+                self._running.discard(job)
+                self._handoff.discard(job.token)
+                self._postprocessing.discard(job.token)
+                self._cond.notify_all()
+
+    # ------------------------------
+    # 下載 -> 後處理的交接
+    # ------------------------------
+    def begin_postprocess(self, token):
+        """
+        工作的下載階段結束、即將執行 ffmpeg 時呼叫（工作執行緒）：
+        讓出下載名額，並等待後處理名額；等待期間被取消則拋出 JobCancelled。
+        """
+        with self._cond:
+            for job in self._running:
+                if job.token is token:
+                    self._running.discard(job)
+                    break
+            self._handoff.add(token)
+            self._cond.notify_all()
+            while len(self._postprocessing) >= self.cpu_workers and not token.cancelled:
+                token.touch()
+                self._cond.wait(1.0)
+            self._handoff.discard(token)
+            self._postprocessing.add(token)
+            self._cond.notify_all()
+        token.check()
+
+    def end_postprocess(self, token):
+        with self._cond:
+            self._postprocessing.discard(token)
+            self._cond.notify_all()
+
+    def _check_stalled(self):
+        """
+        卡住的下載：取消並立即讓出位置（執行緒結束前不再計入 limit）。
+        後處理階段沒有進度回報，不列入檢查。
+        """
+        now = time.monotonic()
+        with self._cond:
+            stalled = [job for job in self._running
+                       if not job.token.paused and now - job.token.last_activity > self.stall_timeout]
+        for job in stalled:
+            logger.warning(f"Job stalled for {self.stall_timeout}s, cancelling and freeing its slot")
+            job.token.cancel("stalled")
+            self._finish(job, error=JobCancelled("stalled"))
+            self._release(job)
+
+    def shutdown(self, wait=True):
+        """等待佇列與執行中的工作結束（wait=False 時不等待），再停止排程執行緒"""
+        if wait:
+            with self._cond:
+                while self._queue or self._active:
+                    self._cond.wait()
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
+        return False
+
+    # ------------------------------
+    # 工作回報
+    # ------------------------------
+    def add_bytes(self, count):
+        with self._stats_lock:
+            self._bytes += count
+
+    def record_success(self):
+        with self._stats_lock:
+            self._successes += 1
+
+    def record_error(self, error):
+        with self._stats_lock:
+            self._errors += 1
+            if classify_error(error) == RATE_LIMITED:
+                self._throttled += 1
+
+    def _reset_window(self):
+        self._bytes = 0
+        self._successes = 0
+        self._errors = 0
+        self._throttled = 0
+        self._window_start = time.monotonic()
+
+    # ------------------------------
+    # 並行數的調整
+    # ------------------------------
+    def _control_loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self._check_stalled()
+                self._adjust()
+            except Exception as e:
+                logger.error(f"Adaptive scheduler adjustment failed: {e}")
+
+    def _adjust(self):
+        with self._stats_lock:
+            elapsed = max(time.monotonic() - self._window_start, 1e-6)
+            throughput = self._bytes / elapsed
+            finished = self._successes + self._errors
+            errors, throttled = self._errors, self._throttled
+            self._reset_window()
+        with self._cond:
+            busy = (len(self._running) >= self.limit and self._waiting > 0 and not self._paused
+                    and len(self._handoff) < self.handoff_size)
+            postprocessing = len(self._postprocessing)
+        cpu = _cpu_percent()
+        speed = f"{throughput / 1024 / 1024:.1f} MB/s"
+
+        new_limit, reason = self.limit, None
+        if throttled:
+            new_limit = max(self.min_workers, self.limit // 2)
+            reason = f"{throttled} HTTP 429 response(s), backing off ({speed})"
+            self._cooldown = COOLDOWN_TICKS
+        elif finished >= 2 and errors / finished > ERROR_RATE_LIMIT:
+            new_limit = self.limit - 1
+            reason = f"error rate {errors / finished:.0%} ({speed})"
+        elif cpu is not None and cpu > CPU_LIMIT and not postprocessing:
+            # 後處理已由 cpu_workers 限制，此時 CPU 滿載是預期的，不減少下載數
+            new_limit = self.limit - 1
+            reason = f"CPU {cpu:.0f}% ({speed})"
+        elif self._last_grow is not None and self._last_grow[1] == self.limit:
+            # 上一次增加並行數後，檢查速度是否真的提升
+            before = self._last_grow[0]
+            self._last_grow = None
+            if throughput < before * MIN_GAIN:
+                new_limit = self.limit - 1
+                reason = f"no throughput gain from the last worker ({speed})"
+                self._cooldown = COOLDOWN_TICKS
+        elif self._cooldown > 0:
+            self._cooldown -= 1
+        elif busy and throughput > 0 and self.limit < self.max_workers:
+            new_limit = self.limit + 1
+            reason = f"all workers busy at {speed}, trying one more"
+            self._last_grow = (throughput, new_limit)
+
+        new_limit = min(max(new_limit, self.min_workers), self.max_workers)
+        if reason is not None and new_limit != self.limit:
+            if new_limit < self.limit:
+                self._last_grow = None
+            with self._cond:
+                self.limit = new_limit
+                self._cond.notify_all()
+            self._notify(new_limit, reason)
+
+    def _notify(self, limit, reason):
+        logger.info(f"Playlist workers -> {limit} ({reason})")
+        if self.on_change:
+            self.on_change(limit, reason)
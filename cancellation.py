@@ -0,0 +1,111 @@
+'''
+工作的暫停與取消。
+CancelToken 由呼叫端建立並傳入下載 / 轉檔函式：
+- yt_dlp 的 progress hook 每次回報進度時呼叫 check()，暫停時在此等待，取消時拋出 JobCancelled 中斷下載
+- ffmpeg 子程序以 attach_process() 登記，取消時立即結束，不必等到轉檔完成
+'''
+import time
+import threading
+from logging_config import setup_logger
+
+# ------------------------------
+# 初始化 Logger
+# ------------------------------
+logger = setup_logger(__name__)
+
+class JobCancelled(Exception):
+    """工作已被使用者取消（或因卡住而被排程器放棄）"""
+
+class CancelToken:
+    def __init__(self):
+        self._cancelled = threading.Event()
+        self._running = threading.Event()   # 未暫停時為 set
+        self._running.set()
+        self._lock = threading.Lock()
+        self._processes = []
+        self._children = []
+        self.reason = None
+        self.last_activity = time.monotonic()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def cancel(self, reason="cancelled"):
+        with self._lock:
+            if self._cancelled.is_set():
+                return
+            self.reason = reason
+            self._cancelled.set()
+            processes = list(self._processes)
+            children = list(self._children)
+        self._running.set()  # 讓暫停中的工作醒來並結束
+        for process in processes:
+            self._kill(process)
+        for child in children:
+            child.cancel(reason)
+
+    def child(self):
+        """建立子 token：本 token 取消時一併取消；子 token 自行取消（例如結束同一工作的其他子程序）不影響本 token"""
+        child = CancelToken()
+        with self._lock:
+            self._children.append(child)
+            cancelled = self._cancelled.is_set()
+        if cancelled:
+            child.cancel(self.reason)
+        return child
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self.touch()  # 暫停的時間不算在卡住的時間內
+        self._running.set()
+
+    def touch(self):
+        """記錄工作仍有進展（排程器據此判斷工作是否卡住）"""
+        self.last_activity = time.monotonic()
+
+    def check(self, *args):
+        """
+        在工作的檢查點呼叫：暫停時等待恢復，已取消則拋出 JobCancelled。
+        可直接當作 yt_dlp 的 progress hook（會收到進度 dict，忽略即可）。
+        """
+        self.touch()
+        while not self._running.wait(0.5):
+            self.touch()
+        if self._cancelled.is_set():
+            raise JobCancelled(self.reason)
+
+    def sleep(self, seconds):
+        """等待指定秒數（例如重試前的等待）；期間被取消則立即拋出 JobCancelled"""
+        self.touch()
+        if self._cancelled.wait(seconds):
+            raise JobCancelled(self.reason)
+        self.touch()
+
+    def attach_process(self, process):
+        """登記子程序（例如 ffmpeg），取消時一併結束；若已取消則立即結束"""
+        with self._lock:
+            self._processes.append(process)
+            cancelled = self._cancelled.is_set()
+        if cancelled:
+            self._kill(process)
+
+    def detach_process(self, process):
+        with self._lock:
+            if process in self._processes:
+                self._processes.remove(process)
+
+    @staticmethod
+    def _kill(process):
+        if process.poll() is None:
+            logger.info(f"Killing child process {process.pid}")
+            try:
+                process.kill()
+            except OSError:
+                pass
@@ -2,6 +2,8 @@ import os
 import json
 
 CONFIG_FILE = "config.json"
+# 快取資料夾（影片資訊、封面圖等），與 config.json 同樣位於工作目錄
+CACHE_DIR = "cache"
 DEFAULT_THEME_COLOR = os.path.join(os.path.dirname(__file__), "assets/themes/SakuraPink.json")
 DEFAULT_BG_IMAGE = os.path.join(os.path.dirname(__file__), "assets/background/sakura_background.png")
 DEFAULT_CONFIG = {
@@ -13,7 +15,12 @@ DEFAULT_CONFIG = {
     "ad_image": "",
     "bg_image": DEFAULT_BG_IMAGE,
     "transparency": "1",
-    "cookies": ""
+    "cookies": "",
+    "metadata_cache_ttl": 86400,
+    "playlist_min_workers": 1,
+    "playlist_max_workers": 8,
+    "playlist_sync": False,
+    "smart_cut": True
 }
 
 def load_config():
@@ -0,0 +1,78 @@
+'''
+已下載影片的索引（SQLite），供播放清單的同步模式使用。
+每部成功下載的影片以「標準化影片 ID + 格式」記錄輸出檔路徑；同步時先以此索引過濾播放清單，
+只有新加入的影片才會解析詳細資料與下載，也不會再產生 "標題 (1).mp4" 這類重複檔案。
+與 yt_dlp 的 --download-archive 相同，輸出檔被移走或刪除後仍視為已下載。
+'''
+import os
+import time
+import sqlite3
+import threading
+from contextlib import closing
+from config_manager import CACHE_DIR
+from metadata_cache import canonical_video_id
+from logging_config import setup_logger
+
+# ------------------------------
+# 初始化 Logger
+# ------------------------------
+logger = setup_logger(__name__)
+
+DB_FILE = os.path.join(CACHE_DIR, "download_archive.db")
+_QUERY_CHUNK = 500  # 單一查詢最多帶入的 ID 數（SQLite 參數數量有上限）
+
+class DownloadArchive:
+    """
+    每次操作都開新的連線，因此可以同時被多個下載執行緒使用。
+    """
+    def __init__(self, db_file=DB_FILE):
+        self.db_file = db_file
+        os.makedirs(os.path.dirname(db_file) or ".", exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS archive ("
+                " video_key TEXT NOT NULL,"
+                " file_format TEXT NOT NULL,"
+                " output_path TEXT,"
+                " downloaded_at REAL NOT NULL,"
+                " PRIMARY KEY (video_key, file_format))"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.db_file, timeout=10)
+
+    def record(self, url, file_format, output_path):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO archive (video_key, file_format, output_path, downloaded_at) VALUES (?, ?, ?, ?)",
+                (canonical_video_id(url), file_format, output_path, time.time())
+            )
+
+    def filter_new(self, items):
+        """從影片資料字典中移除已下載過（同一格式）的項目，保留原本的順序"""
+        keys = {(canonical_video_id(item["url"]), item["format"]) for item in items}
+        archived = set()
+        by_format = {}
+        for video_key, file_format in keys:
+            by_format.setdefault(file_format, []).append(video_key)
+        with closing(self._connect()) as conn:
+            for file_format, video_keys in by_format.items():
+                for start in range(0, len(video_keys), _QUERY_CHUNK):
+                    chunk = video_keys[start:start + _QUERY_CHUNK]
+                    rows = conn.execute(
+                        f"SELECT video_key FROM archive WHERE file_format = ? AND video_key IN ({','.join('?' * len(chunk))})",
+                        [file_format] + chunk
+                    ).fetchall()
+                    archived.update((row[0], file_format) for row in rows)
+        return [item for item in items if (canonical_video_id(item["url"]), item["format"]) not in archived]
+
+_archive = None
+_archive_lock = threading.Lock()
+
+def get_download_archive():
+    """取得全域共用的下載索引"""
+    global _archive
+    with _archive_lock:
+        if _archive is None:
+            _archive = DownloadArchive()
+        return _archive
@@ -0,0 +1,147 @@
+'''
+播放清單下載佇列的持久化儲存（SQLite）。
+每部影片一列，記錄下載選項與狀態（pending / running / done / failed）、已下載位元組數與輸出路徑，
+每次狀態變更都在獨立的交易中寫入，程式當掉或重開機後重新載入即可接續：
+已完成的項目直接略過，未完成的項目由 staging 暫存資料夾中的 .part 檔接續下載。
+'''
+import os
+import time
+import sqlite3
+import threading
+from contextlib import closing
+from config_manager import CACHE_DIR
+from logging_config import setup_logger
+
+# ------------------------------
+# 初始化 Logger
+# ------------------------------
+logger = setup_logger(__name__)
+
+DB_FILE = os.path.join(CACHE_DIR, "download_queue.db")
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+BYTES_WRITE_INTERVAL = 2.0  # 同一項目的下載量最多每 2 秒寫入一次
+DONE_RETENTION = 7 * 24 * 3600  # 已完成的項目保留 7 天後刪除（同步模式由下載索引判斷，不需要這些列）
+
+class DownloadQueue:
+    """
+    以 SQLite 儲存的下載佇列。
+    項目為 Page2 的影片資料字典，加入佇列後會帶有 "queue_id" 與 "state"。
+    每次操作都開新的連線，因此可以同時被多個下載執行緒使用。
+    """
+    def __init__(self, db_file=DB_FILE):
+        self.db_file = db_file
+        self._last_bytes_write = {}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_file) or ".", exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            # WAL：寫入時不阻擋讀取，程式異常結束也不會留下寫到一半的資料
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS queue_items ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " url TEXT NOT NULL,"
+                " title TEXT,"
+                " resolution TEXT,"
+                " format TEXT,"
+                " state TEXT NOT NULL,"
+                " bytes_done INTEGER NOT NULL DEFAULT 0,"
+                " total_bytes INTEGER NOT NULL DEFAULT 0,"
+                " output_path TEXT,"
+                " error TEXT,"
+                " updated_at REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.db_file, timeout=10)
+
+    def add(self, items):
+        """將一批項目加入佇列（單一交易），並在各項目上記錄 queue_id 與 state"""
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            for item in items:
+                cursor = conn.execute(
+                    "INSERT INTO queue_items (url, title, resolution, format, state, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (item["url"], item.get("title"), item.get("resolution"), item.get("format"), PENDING, now)
+                )
+                item["queue_id"] = cursor.lastrowid
+                item["state"] = PENDING
+
+    def load(self):
+        """
+        啟動時載入佇列，依加入順序回傳項目字典。
+        上次執行中的項目視為中斷，改回 pending；已完成但輸出檔已不存在的項目也改回 pending。
+        完成超過 DONE_RETENTION 的項目直接刪除，避免每天同步播放清單時資料表無限增長。
+        """
+        with closing(self._connect()) as conn, conn:
+            pruned = conn.execute(
+                "DELETE FROM queue_items WHERE state = ? AND updated_at < ?",
+                (DONE, time.time() - DONE_RETENTION)
+            ).rowcount
+            recovered = conn.execute(
+                "UPDATE queue_items SET state = ?, updated_at = ? WHERE state = ?",
+                (PENDING, time.time(), RUNNING)
+            ).rowcount
+            rows = conn.execute(
+                "SELECT id, url, title, resolution, format, state, bytes_done, total_bytes, output_path"
+                " FROM queue_items ORDER BY id"
+            ).fetchall()
+        items = []
+        for row in rows:
+            item = dict(zip(
+                ("queue_id", "url", "title", "resolution", "format", "state", "bytes_done", "total_bytes", "output_path"),
+                row
+            ))
+            if item["state"] == DONE and not (item["output_path"] and os.path.exists(item["output_path"])):
+                item["state"] = PENDING
+            items.append(item)
+        if pruned:
+            logger.info(f"Removed {pruned} completed item(s) older than {DONE_RETENTION // 86400} days from the queue")
+        if items:
+            logger.info(f"Loaded {len(items)} queued item(s), {recovered} interrupted download(s) will resume")
+        return items
+
+    def set_state(self, queue_id, state, output_path=None, error=None):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE queue_items SET state = ?, output_path = COALESCE(?, output_path), error = ?, updated_at = ?"
+                " WHERE id = ?",
+                (state, output_path, error, time.time(), queue_id)
+            )
+        with self._lock:
+            self._last_bytes_write.pop(queue_id, None)
+
+    def update_bytes(self, queue_id, bytes_done, total_bytes):
+        """記錄下載量；由 progress hook 頻繁呼叫，因此每個項目最多每 BYTES_WRITE_INTERVAL 秒寫入一次"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_bytes_write.get(queue_id, 0) < BYTES_WRITE_INTERVAL:
+                return
+            self._last_bytes_write[queue_id] = now
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE queue_items SET bytes_done = ?, total_bytes = ?, updated_at = ? WHERE id = ?",
+                (bytes_done, total_bytes, time.time(), queue_id)
+            )
+
+    def update_title(self, queue_id, title):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("UPDATE queue_items SET title = ? WHERE id = ?", (title, queue_id))
+
+    def remove(self, queue_ids):
+        with closing(self._connect()) as conn, conn:
+            conn.executemany("DELETE FROM queue_items WHERE id = ?", [(queue_id,) for queue_id in queue_ids])
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_download_queue():
+    """取得全域共用的下載佇列"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = DownloadQueue()
+        return _queue
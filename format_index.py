@@ -0,0 +1,230 @@
+'''
+影片格式索引與格式字串編譯器。
+每部影片只建立一次索引（來源為 metadata_cache 中的精簡格式表），依高度、編碼、位元率與容器分類，
+並將使用者的選擇（"1920x1080"、"1080p"、"192kbps"）編譯成確定的 format ID，
+例如 "137+140"，取代 bestvideo[height=X]+bestaudio/best 這類會觸發額外探測的 fallback 鏈。
+'''
+import os
+import re
+from collections import defaultdict
+from logging_config import setup_logger
+
+# ------------------------------
+# 初始化 Logger
+# ------------------------------
+logger = setup_logger(__name__)
+
+# 索引資料不足時（例如解析失敗），沿用舊的 yt_dlp fallback 寫法
+LEGACY_VIDEO_SPEC = 'bestvideo[height={height}]+bestaudio/best/bestvideo+bestaudio/best'
+LEGACY_AUDIO_SPEC = 'bestaudio/best'
+
+# 可直接放入 mp4 容器（不需重新編碼）的編碼
+MP4_VIDEO_CODECS = {'avc1', 'avc3', 'h264', 'hev1', 'hvc1', 'h265', 'av01', 'vp09', 'vp9'}
+MP4_AUDIO_CODECS = {'mp4a', 'aac', 'mp3', 'ac-3', 'ec-3'}
+# 不知道實際會選到哪些串流時（fallback 寫法），沿用原本強制轉成 aac 的做法
+LEGACY_MERGE_ARGS = ['-c:a', 'aac']
+# 原始音訊模式：音訊編碼 -> FFmpegExtractAudio 的 preferredcodec（與來源相同時 yt_dlp 只做封裝，不重新編碼）
+NATIVE_AUDIO_CODECS = {'mp4a': 'm4a', 'aac': 'm4a', 'opus': 'opus', 'vorbis': 'vorbis', 'mp3': 'mp3', 'flac': 'flac'}
+NATIVE_AUDIO_EXT = {'m4a': 'm4a', 'opus': 'opus', 'vorbis': 'ogg', 'mp3': 'mp3', 'flac': 'flac'}
+
+_RESOLUTION_RE = re.compile(r'^\s*(\d+)\s*x\s*(\d+)\s*$')
+_HEIGHT_RE = re.compile(r'^\s*(\d+)\s*p\s*$', re.IGNORECASE)
+_BITRATE_RE = re.compile(r'^\s*(\d+)\s*kbps\s*$', re.IGNORECASE)
+
+def parse_choice(choice):
+    """
+    解析使用者選擇的畫質 / 位元率，回傳 (width, height, abr)，無法解析的欄位為 None。
+    "1920x1080" -> (1920, 1080, None)；"1080p" -> (None, 1080, None)；"192kbps" -> (None, None, 192)
+    """
+    choice = str(choice or "")
+    match = _RESOLUTION_RE.match(choice)
+    if match:
+        return int(match.group(1)), int(match.group(2)), None
+    match = _HEIGHT_RE.match(choice)
+    if match:
+        return None, int(match.group(1)), None
+    match = _BITRATE_RE.match(choice)
+    if match:
+        return None, None, int(match.group(1))
+    return None, None, None
+
+def codec_family(codec):
+    """'avc1.640028' -> 'avc1'；'none' 或 None -> None"""
+    if not codec or codec == 'none':
+        return None
+    return codec.split('.')[0].lower()
+
+class FormatIndex:
+    """
+    formats: metadata_cache 中的精簡格式表（format_id、ext、width、height、fps、vcodec、acodec、abr、tbr、filesize）
+    """
+    def __init__(self, formats):
+        self.video_only = []
+        self.audio_only = []
+        self.muxed = []
+        self.kind = {}  # format_id -> "video" / "audio" / "muxed"
+        self.by_id = {}
+        self.by_height = defaultdict(list)
+        for f in formats or []:
+            if not f.get('format_id') or f.get('ext') == 'mhtml':
+                continue  # 略過 storyboard 等非影音格式
+            vcodec = codec_family(f.get('vcodec'))
+            has_video = vcodec is not None or bool(f.get('height'))
+            has_audio = f.get('acodec') != 'none' and (f.get('acodec') is not None or not has_video)
+            if has_video and has_audio:
+                self.muxed.append(f)
+                self.kind[f['format_id']] = "muxed"
+            elif has_video:
+                self.video_only.append(f)
+                self.kind[f['format_id']] = "video"
+            elif has_audio:
+                self.audio_only.append(f)
+                self.kind[f['format_id']] = "audio"
+            else:
+                continue
+            self.by_id[f['format_id']] = f
+            if has_video and f.get('height'):
+                self.by_height[f['height']].append(f)
+
+    def __bool__(self):
+        return bool(self.video_only or self.audio_only or self.muxed)
+
+    def heights(self):
+        """可用的影片高度，由高到低"""
+        return sorted(self.by_height, reverse=True)
+
+    def resolutions(self):
+        """Page1 顯示用的 "寬x高" 清單，由大到小"""
+        sizes = {
+            (f.get('width') or 0, f['height'])
+            for height in self.by_height for f in self.by_height[height]
+            if f.get('width')
+        }
+        return [f"{w}x{h}" for w, h in sorted(sizes, key=lambda s: (s[0] * s[1], s[1]), reverse=True)]
+
+    def _pick_height(self, height):
+        """完全相符則使用該高度，否則取不超過目標的最高畫質，再否則取最低畫質"""
+        heights = self.heights()
+        if not heights:
+            return None
+        if height is None or height in self.by_height:
+            return height if height is not None else heights[0]
+        lower = [h for h in heights if h < height]
+        return lower[0] if lower else heights[-1]
+
+    @staticmethod
+    def _video_rank(container, width):
+        def rank(f):
+            return (
+                width is not None and f.get('width') == width,
+                f.get('ext') == container,
+                f.get('fps') or 0,
+                f.get('tbr') or 0,
+                f['format_id'],
+            )
+        return rank
+
+    def best_audio(self, container='mp4', target_abr=None):
+        """
+        挑選音訊串流。
+        指定 target_abr 時取不低於目標的最小位元率（之後會轉成該位元率，不需要更高的來源）；
+        否則優先選擇適合容器的格式（mp4 -> m4a），再比較位元率。
+        """
+        if not self.audio_only:
+            return None
+        if target_abr is not None:
+            enough = [f for f in self.audio_only if (f.get('abr') or f.get('tbr') or 0) >= target_abr]
+            if enough:
+                return min(enough, key=lambda f: (f.get('abr') or f.get('tbr') or 0, f['format_id']))
+        preferred_ext = 'm4a' if container == 'mp4' else container
+        return max(self.audio_only, key=lambda f: (f.get('ext') == preferred_ext, f.get('abr') or f.get('tbr') or 0, f['format_id']))
+
+    def select_video(self, height, width=None, container='mp4'):
+        """回傳 (video, audio)；僅有影音合一格式時 audio 為 None"""
+        target = self._pick_height(height)
+        if target is None:
+            return None, None
+        rank = self._video_rank(container, width)
+        video_only = [f for f in self.by_height[target] if self.kind[f['format_id']] == "video"]
+        audio = self.best_audio(container)
+        if video_only and audio:
+            return max(video_only, key=rank), audio
+        muxed = [f for f in self.by_height[target] if self.kind[f['format_id']] == "muxed"]
+        if muxed:
+            return max(muxed, key=rank), None
+        if video_only:
+            return max(video_only, key=rank), None
+        return None, None
+
+    def compile(self, file_format, choice, container='mp4'):
+        """
+        將使用者選擇編譯成 yt_dlp 的 format 字串。
+        索引有資料時以確定的 format ID 開頭（例如 "137+140/..."、"251/..."）；
+        沒有資料時只回傳舊的 fallback 寫法。
+        """
+        width, height, abr = parse_choice(choice)
+        if file_format in ('mp3', 'audio'):
+            # 音訊只需比較位元率（mp3 之後會轉檔；原始音訊模式則依來源編碼選擇容器）
+            audio = self.best_audio(None, abr)
+            if audio:
+                return f"{audio['format_id']}/{LEGACY_AUDIO_SPEC}"
+            if self.muxed:
+                muxed = min(self.muxed, key=lambda f: (f.get('height') or 0, f['format_id']))
+                return f"{muxed['format_id']}/{LEGACY_AUDIO_SPEC}"
+            return LEGACY_AUDIO_SPEC
+        legacy = LEGACY_VIDEO_SPEC.format(height=height) if height else 'bestvideo+bestaudio/best'
+        video, audio = self.select_video(height, width, container)
+        if video is None:
+            return legacy
+        # 確定的 ID 放在最前面；快取的格式表過期（ID 已不存在）時才會用到後面的 fallback
+        if audio is None:
+            return f"{video['format_id']}/{legacy}"
+        return f"{video['format_id']}+{audio['format_id']}/{legacy}"
+
+    def merge_args(self, spec, container='mp4'):
+        """
+        依 compile() 選出的串流決定合併時的 ffmpeg 參數（postprocessor_args）。
+        yt_dlp 合併時預設為 -c copy，這裡只對不適合容器的軌道指定重新編碼：
+        例如 avc1 + m4a 直接複製（回傳 []），avc1 + opus 只將音訊轉成 aac。
+        """
+        ids = spec.split('/')[0].split('+')
+        formats = [self.by_id.get(format_id) for format_id in ids]
+        if container != 'mp4' or not formats or None in formats:
+            return list(LEGACY_MERGE_ARGS)
+        vcodecs = {codec_family(f.get('vcodec')) for f in formats} - {None}
+        acodecs = {codec_family(f.get('acodec')) for f in formats} - {None}
+        args = []
+        if not vcodecs <= MP4_VIDEO_CODECS:
+            args += ['-c:v', 'libx264']
+        if not acodecs <= MP4_AUDIO_CODECS:
+            args += ['-c:a', 'aac']
+        logger.info("Merge plan for %s: video=%s audio=%s args=%s", spec.split('/')[0], sorted(vcodecs), sorted(acodecs), args or "stream copy")
+        return args
+
+    def estimated_size(self, spec):
+        """compile() 選出的串流合計大小（位元組），用來預估下載進度；任何一個串流大小未知時回傳 0"""
+        sizes = [(self.by_id.get(format_id) or {}).get('filesize') for format_id in spec.split('/')[0].split('+')]
+        return sum(sizes) if all(sizes) else 0
+
+    def native_audio_codec(self, spec):
+        """原始音訊模式使用的 preferredcodec；不知道選到哪個串流時交給 yt_dlp 判斷（'best'）"""
+        f = self.by_id.get(spec.split('/')[0].split('+')[0])
+        if f is None:
+            return 'best'
+        return NATIVE_AUDIO_CODECS.get(codec_family(f.get('acodec')), 'best')
+
+def native_audio_ext(info, codec):
+    """原始音訊模式輸出的副檔名：優先使用 yt_dlp 實際輸出的檔案，否則依編碼推算"""
+    downloads = info.get('requested_downloads') or []
+    if downloads and downloads[-1].get('filepath'):
+        return os.path.splitext(downloads[-1]['filepath'])[1].lstrip('.')
+    return NATIVE_AUDIO_EXT.get(codec, 'm4a')
+
+def load_format_index(url, cookiefile=''):
+    """取得影片的格式索引；格式表取得失敗時回傳空索引（compile 會退回舊的 fallback 寫法）"""
+    from metadata_cache import get_video_metadata
+    try:
+        return FormatIndex(get_video_metadata(url, cookiefile).get('formats'))
+    except Exception as e:
+        logger.warning("Failed to load format table for %s: %s", url, e)
+        return FormatIndex([])
@@ -0,0 +1,55 @@
+'''
+全程式共用的 HTTP 連線（yt_dlp 以外的所有網路請求）。
+使用單一 requests.Session，保持 keep-alive 連線池並限制每個主機的連線數，
+同時統一設定逾時與重試，避免每次請求都重新建立 TCP + TLS 連線。
+'''
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_TIMEOUT = (5, 15)   # (連線, 讀取) 秒
+MAX_CONNECTIONS_PER_HOST = 8
+MAX_HOSTS = 16
+
+class _TimeoutHTTPAdapter(HTTPAdapter):
+    """未指定 timeout 的請求一律套用預設逾時，避免卡死工作執行緒"""
+    def __init__(self, *args, timeout=DEFAULT_TIMEOUT, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+def _build_session():
+    retry = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET", "HEAD"),
+        respect_retry_after_header=True,
+    )
+    # pool_block=True：同一主機的連線數達上限時等待空出的連線，而不是另開新連線
+    adapter = _TimeoutHTTPAdapter(
+        pool_connections=MAX_HOSTS,
+        pool_maxsize=MAX_CONNECTIONS_PER_HOST,
+        pool_block=True,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """取得全域共用的 requests.Session（urllib3 連線池本身可跨執行緒使用）"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _build_session()
+        return _session
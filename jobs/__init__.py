@@ -0,0 +1,4 @@
+'''
+無介面的工作引擎與 CLI（python -m jobs），不依賴 tkinter。
+'''
+from jobs.engine import Job, JobEngine, run_job, JOB_HANDLERS, PENDING, RUNNING, DONE, FAILED
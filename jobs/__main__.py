@@ -0,0 +1,125 @@
+'''
+命令列入口：python -m jobs <command> ...
+
+範例：
+    python -m jobs video "https://www.youtube.com/watch?v=..." -r 1920x1080 -o D:/Videos
+    python -m jobs playlist "https://www.youtube.com/playlist?list=..." -r 1080p -f mp3
+    python -m jobs convert-video input.mkv -f mp4 --start 00:01:00 --end 00:03:00
+    python -m jobs convert-audio input.wav -f mp3 -b 192kbps
+    python -m jobs tts --text-file speech.txt --voice zh-TW-HsiaoChenNeural
+'''
+import argparse
+import sys
+from logging_config import set_error_dialogs
+from config_manager import load_config
+from staging import cleanup_staging
+from jobs.engine import JobEngine, FAILED
+
+def build_parser(config):
+    download_path = config.get("download_path")
+    cookies = config.get("cookies", "")
+
+    parser = argparse.ArgumentParser(prog="python -m jobs", description="Video DownloadErm headless job runner")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("video", help="download a single video / audio (Page1)")
+    p.add_argument("urls", nargs="+")
+    p.add_argument("-r", "--resolution", default="1280x720", help='e.g. "1920x1080" or "192kbps"')
+    p.add_argument("-f", "--format", dest="file_format", choices=["mp4", "mp3", "audio"], default="mp4")
+    p.add_argument("-o", "--output", dest="download_path", default=download_path)
+    p.add_argument("--subtitle", dest="subtitle_lang", default="No subtitle")
+    p.add_argument("--cookies", dest="cookiefile", default=cookies)
+
+    p = sub.add_parser("playlist", help="download a YouTube playlist (Page2)")
+    p.add_argument("urls", nargs="*")
+    p.add_argument("-i", "--input-file", help="text file with video and playlist URLs, downloaded as one deduplicated queue")
+    p.add_argument("-r", "--resolution", default="1080p", help='e.g. "1080p" or "320kbps"')
+    p.add_argument("-f", "--format", dest="file_format", choices=["mp4", "mp3", "audio"], default="mp4")
+    p.add_argument("-o", "--output", dest="download_path", default=download_path)
+    p.add_argument("--cookies", dest="cookiefile", default=cookies)
+    p.add_argument("--workers", dest="max_workers", type=int, default=config.get("playlist_max_workers", 8),
+                   help="upper bound for parallel downloads (adjusted automatically)")
+    p.add_argument("--min-workers", dest="min_workers", type=int, default=config.get("playlist_min_workers", 1))
+    p.add_argument("--sync", action="store_true", help="only download videos not downloaded before")
+
+    p = sub.add_parser("convert-video", help="convert video files (Page3)")
+    p.add_argument("inputs", nargs="+")
+    p.add_argument("-r", "--resolution", default="Original resolution")
+    p.add_argument("-f", "--format", dest="target_format", default="mp4")
+    p.add_argument("--start", dest="start_time", default="00:00:00")
+    p.add_argument("--end", dest="end_time", default="")
+    p.add_argument("--vcodec", dest="video_transcoder", default="Default")
+    p.add_argument("--acodec", dest="audio_transcoder", default="Default")
+    p.add_argument("--cut", choices=["auto", "keyframe", "encode"], default="auto",
+                   help="without scaling or codec changes: frame-accurate smart cut (auto), lossless keyframe cut, or full re-encode")
+    p.add_argument("--segments", type=int, default=None,
+                   help="parallel ffmpeg encoders for long videos split at keyframes (default: based on CPU cores, 1 disables)")
+
+    p = sub.add_parser("convert-audio", help="convert audio files (Page3)")
+    p.add_argument("inputs", nargs="+")
+    p.add_argument("-b", "--bitrate", default="128kbps", help='e.g. "128kbps" or "44.1kHz" for wav')
+    p.add_argument("-f", "--format", dest="target_format", default="mp3")
+    p.add_argument("--start", dest="start_time", default="00:00:00")
+    p.add_argument("--end", dest="end_time", default="")
+
+    p = sub.add_parser("tts", help="text to speech (Page4)")
+    group = p.add_mutually_exclusive_group(required=True)
+    group.add_argument("--text")
+    group.add_argument("--text-file")
+    p.add_argument("--voice", required=True)
+    p.add_argument("-f", "--format", default="mp3")
+    p.add_argument("-o", "--output", dest="download_path", default=download_path)
+    p.add_argument("--speed", default="+0%")
+    p.add_argument("--volume", default="+0%")
+    p.add_argument("--pitch", default="+0Hz")
+
+    for p in sub.choices.values():
+        p.add_argument("-j", "--jobs", dest="parallel", type=int, default=1, help="number of jobs to run at once")
+    return parser
+
+def build_jobs(engine, args):
+    params = {k: v for k, v in vars(args).items() if k not in ("command", "urls", "inputs", "parallel", "text_file")}
+    if args.command in ("video", "playlist"):
+        for url in args.urls:
+            engine.submit(args.command, dict(params, url=url, input_file=None))
+        if getattr(args, "input_file", None):
+            engine.submit("playlist", params)
+    elif args.command in ("convert-video", "convert-audio"):
+        kind = args.command.replace("-", "_")
+        if kind == "convert_video" and params["segments"] is None and args.parallel > 1:
+            # 多個檔案同時轉換時已佔滿核心，不再分段
+            params["segments"] = 1
+        for input_path in args.inputs:
+            engine.submit(kind, dict(params, input_path=input_path))
+    elif args.command == "tts":
+        if args.text_file:
+            with open(args.text_file, "r", encoding="utf-8") as f:
+                params["text"] = f.read()
+        engine.submit("tts", params)
+
+def print_progress(job, progress):
+    sys.stderr.write(f"\r[{job.id[:8]}] {job.kind}: {int(progress * 100):3d}%")
+    sys.stderr.flush()
+
+def main(argv=None):
+    # 無介面模式：錯誤只寫入 log，不彈出 tkinter 視窗
+    set_error_dialogs(False)
+    parser = build_parser(load_config())
+    args = parser.parse_args(argv)
+    if args.command == "playlist" and not args.urls and not args.input_file:
+        parser.error("playlist: give at least one URL or --input-file")
+    if getattr(args, "download_path", None) and args.command in ("video", "playlist"):
+        cleanup_staging(args.download_path)
+    engine = JobEngine(max_workers=args.parallel, progress_callback=print_progress)
+    build_jobs(engine, args)
+    jobs = engine.run()
+    sys.stderr.write("\n")
+    for job in jobs:
+        if job.status == FAILED:
+            print(f"FAILED\t{job.kind}\t{job.error}")
+        else:
+            print(f"DONE\t{job.kind}\t{job.result}")
+    return 1 if any(job.status == FAILED for job in jobs) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
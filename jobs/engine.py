@@ -0,0 +1,232 @@
+'''
+無介面的工作引擎。
+將 Page1 ~ Page4 的下載、播放清單、轉檔與 TTS 函式包裝成 Job，
+不載入 customtkinter / pywinstyles / PIL，可在沒有顯示器的機器上執行。
+各 Page 模組（yt_dlp、edge_tts）只在工作真正執行時才載入，以縮短啟動時間。
+'''
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from logging_config import setup_logger
+from adaptive_pool import AdaptiveScheduler
+from cancellation import CancelToken
+
+# ------------------------------
+# 初始化 Logger
+# ------------------------------
+logger = setup_logger(__name__)
+
+# 工作狀態
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+class Job:
+    """
+    一筆工作。
+    kind: 工作種類，需為 JOB_HANDLERS 中的 key
+    params: 傳給對應處理函式的參數 dict
+    """
+    def __init__(self, kind, params, job_id=None):
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        self.id = job_id or uuid.uuid4().hex
+        self.kind = kind
+        self.params = dict(params)
+        self.status = PENDING
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+
+    def __repr__(self):
+        return f"Job(id={self.id[:8]}, kind={self.kind}, status={self.status})"
+
+def _conversion_duration(input_path, start_time, end_time):
+    """與 Page3 介面相同的規則：有結束時間則以起訖計算，否則轉到檔案結尾；範圍不合理時拋出 ValueError"""
+    from Page3 import conversion_range
+    return conversion_range(input_path, start_time, end_time)[1]
+
+def _run_video(params, progress_callback):
+    from Page1 import download_video_audio
+    subtitle_lang = params.get("subtitle_lang", "No subtitle")
+    return download_video_audio(
+        params["url"],
+        params.get("resolution", "1280x720"),
+        params.get("download_path") or os.getcwd(),
+        params.get("file_format", "mp4"),
+        # CLI 只指定 --subtitle，選了語言即表示要下載字幕
+        params.get("download_subtitles", subtitle_lang != "No subtitle"),
+        subtitle_lang,
+        params.get("cookiefile", ""),
+        progress_callback,
+    )
+
+def _run_playlist(params, progress_callback):
+    """解析播放清單後以多執行緒下載，回傳每部影片的輸出路徑（失敗者為 None）"""
+    from Page2 import parse_playlist, iter_url_file, expand_url_list, filter_synced, download_video_audio_playlist_with_retry
+    resolution = params.get("resolution", "1080p")
+    file_format = params.get("file_format", "mp4")
+    cookiefile = params.get("cookiefile", "")
+    download_path = params.get("download_path") or os.getcwd()
+    sync = params.get("sync", False)
+    if params.get("input_file"):
+        # 批次匯入：URL 清單檔中的影片與播放清單合併成一個佇列，同一部影片只下載一次
+        items = [item for batch in expand_url_list(iter_url_file(params["input_file"]), resolution, file_format, cookiefile)
+                 for item in batch]
+        if sync:
+            items = filter_synced(items, download_path)
+    else:
+        items = parse_playlist(params["url"], resolution, file_format, cookiefile, sync_path=download_path if sync else None)
+    if not items:
+        if sync:
+            logger.info(f"Playlist is up to date: {params.get('url') or params.get('input_file')}")
+            return []
+        raise RuntimeError("Failed to parse playlist or no videos found")
+
+    results = [None] * len(items)
+    completed = 0
+    # 同時下載數在 [min_workers, max_workers] 內依速度、錯誤率與 CPU 負載自動調整
+    max_workers = params.get("max_workers", 8)
+    scheduler = AdaptiveScheduler(
+        params.get("min_workers", 1), max_workers, initial=min(4, max_workers)
+    )
+    with scheduler:
+        futures = {}
+        for idx, item in enumerate(items):
+            token = CancelToken()
+            job = scheduler.submit(
+                download_video_audio_playlist_with_retry,
+                item["url"], item["resolution"], download_path, item["format"], cookiefile,
+                stats=scheduler, cancel_token=token, pipeline=scheduler, token=token
+            )
+            futures[job.future] = idx
+        for future in as_completed(futures):
+            idx = futures[future]
+            try:
+                results[idx] = future.result()
+            except Exception as e:
+                logger.error(f"Playlist item {idx} failed: {e}")
+            completed += 1
+            if progress_callback:
+                progress_callback(completed / len(items))
+    return results
+
+def _run_convert_video(params, progress_callback):
+    from Page3 import convert_video, select_trim_mode, conversion_workers
+    input_path = params["input_path"]
+    start_time = params.get("start_time", "00:00:00")
+    duration = _conversion_duration(input_path, start_time, params.get("end_time", ""))
+    resolution = params.get("resolution", "Original resolution")
+    target_format = params.get("target_format", "mp4")
+    video_transcoder = params.get("video_transcoder", "Default")
+    audio_transcoder = params.get("audio_transcoder", "Default")
+    # cut: "auto"（smart cut / stream copy）、"keyframe"（只用 stream copy）、"encode"（一律重新編碼）
+    cut = params.get("cut", "auto")
+    trim_mode = None
+    if cut != "encode":
+        trim_mode = select_trim_mode(
+            input_path, resolution, target_format, video_transcoder, audio_transcoder, start_time, duration,
+            precise=cut == "auto"
+        )
+    return convert_video(
+        input_path,
+        resolution,
+        target_format,
+        start_time,
+        duration,
+        video_transcoder,
+        audio_transcoder,
+        progress_callback,
+        trim_mode=trim_mode,
+        # 長影片分段並行編碼的 ffmpeg 數，預設依 CPU 核心數決定；1 表示不分段
+        segments=params.get("segments") or conversion_workers("video")[0],
+    )
+
+def _run_convert_audio(params, progress_callback):
+    from Page3 import convert_audio
+    input_path = params["input_path"]
+    start_time = params.get("start_time", "00:00:00")
+    duration = _conversion_duration(input_path, start_time, params.get("end_time", ""))
+    return convert_audio(
+        input_path,
+        params.get("bitrate", "128kbps"),
+        params.get("target_format", "mp3"),
+        start_time,
+        duration,
+        progress_callback,
+    )
+
+def _run_tts(params, progress_callback):
+    import asyncio
+    from Page4 import convert_text_to_speech
+    result = asyncio.run(convert_text_to_speech(
+        text=params["text"],
+        voice=params["voice"],
+        format=params.get("format", "mp3"),
+        download_path=params.get("download_path") or os.getcwd(),
+        speed=params.get("speed", "+0%"),
+        volume=params.get("volume", "+0%"),
+        pitch=params.get("pitch", "+0Hz"),
+    ))
+    if result is None:
+        raise RuntimeError("Text to speech failed")
+    return result
+
+# 工作種類 -> 處理函式 (params, progress_callback) -> result
+JOB_HANDLERS = {
+    "video": _run_video,
+    "playlist": _run_playlist,
+    "convert_video": _run_convert_video,
+    "convert_audio": _run_convert_audio,
+    "tts": _run_tts,
+}
+
+def run_job(job, progress_callback=None):
+    """
+    同步執行單一工作，並更新其 status / progress / result / error。
+    progress_callback(job, progress) 會收到 0~1 的進度值；
+    Page 模組以 -1 表示「處理完成」，此處統一換成 1.0。
+    """
+    def on_progress(progress):
+        job.progress = 1.0 if progress == -1 else progress
+        if progress_callback:
+            progress_callback(job, job.progress)
+
+    job.status = RUNNING
+    logger.info(f"Job started: {job}")
+    try:
+        job.result = JOB_HANDLERS[job.kind](job.params, on_progress)
+        job.status = DONE
+        job.progress = 1.0
+        logger.info(f"Job finished: {job} -> {job.result}")
+    except Exception as e:
+        job.error = str(e)
+        job.status = FAILED
+        logger.error(f"Job failed: {job}: {e}")
+    return job
+
+class JobEngine:
+    """
+    簡單的工作佇列：submit() 加入工作，run() 以 max_workers 個執行緒執行所有待處理工作。
+    """
+    def __init__(self, max_workers=1, progress_callback=None):
+        self.max_workers = max_workers
+        self.progress_callback = progress_callback
+        self.jobs = []
+
+    def submit(self, kind, params):
+        job = Job(kind, params)
+        self.jobs.append(job)
+        return job
+
+    def run(self):
+        pending = [job for job in self.jobs if job.status == PENDING]
+        if self.max_workers <= 1:
+            for job in pending:
+                run_job(job, self.progress_callback)
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                for future in as_completed([executor.submit(run_job, job, self.progress_callback) for job in pending]):
+                    future.result()
+        return self.jobs
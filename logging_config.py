@@ -1,8 +1,10 @@
 # logging_config.py
 import logging
-from tkinter import messagebox
 import inspect
 
+# 是否以錯誤視窗顯示訊息；無介面（CLI / 批次工作）模式下關閉，避免載入 tkinter
+_show_error_dialogs = True
+
 def setup_logger(name: str, log_file: str = "app.log", level: int = logging.DEBUG) -> logging.Logger:
     """
     初始化 logger。
@@ -27,6 +29,14 @@ def setup_logger(name: str, log_file: str = "app.log", level: int = logging.DEBU
 # 全域 logger 供 logging_config.py 內部使用（若需要）
 logger = setup_logger(__name__)
 
+def set_error_dialogs(enabled: bool):
+    """
+    開啟或關閉錯誤視窗。
+    無介面模式（例如 python -m jobs）下應關閉，錯誤只寫入 log。
+    """
+    global _show_error_dialogs
+    _show_error_dialogs = enabled
+
 def log_and_show_error(message: str, master=None):
     """
     記錄錯誤訊息並顯示錯誤視窗。
@@ -46,7 +56,11 @@ def log_and_show_error(message: str, master=None):
     caller_logger = logging.getLogger(caller_name)
     # 使用 stacklevel=2 可讓 log 記錄正確的呼叫資訊（Python 3.8 以上支援）
     caller_logger.error(message, stacklevel=2)
-    
+
+    if not _show_error_dialogs:
+        return
+    # 延遲載入 tkinter，讓無介面環境也能使用本模組
+    from tkinter import messagebox
     if master:
         master.after(0, lambda: messagebox.showerror("Error", message))
     else:
@@ -7,20 +7,24 @@ import customtkinter as ctk
 from customtkinter import CTkImage
 from tkinter import filedialog, messagebox
 from PIL import Image, ImageOps
-import requests
 import threading
-import io
 import os
-from CTkTable import CTkTable
 import pywinstyles
 from logging_config import setup_logger, log_and_show_error
 from Page1 import get_video_info, download_video_audio
-from Page2 import parse_playlist, download_video_audio_playlist_with_retry
-from Page3 import convert_video, convert_audio, get_media_duration, time_to_seconds
+from Page2 import iter_playlist, iter_url_file, expand_url_list, filter_synced, PlaylistDetailFetcher, download_video_audio_playlist_with_retry
+from Page3 import convert_video, convert_audio, get_media_duration, conversion_range, collect_media_files, conversion_workers, select_trim_mode, ConversionQueue
 from Page4 import fetch_voice_names, convert_text_to_speech
 from config_manager import load_config, save_config
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import subprocess
+from staging import cleanup_staging
+from progress_bus import ProgressBus
+from thumbnail_cache import get_thumbnail_cache
+from playlist_view import PlaylistModel, VirtualTable
+from adaptive_pool import AdaptiveScheduler
+from cancellation import CancelToken, JobCancelled
+from download_queue import get_download_queue, PENDING, RUNNING, DONE, FAILED
+from transfer_stats import TransferTracker, format_bytes, format_eta
+from concurrent.futures import as_completed, CancelledError
 import json
 import asyncio
 
@@ -58,6 +62,15 @@ LANGUAGE_OPTIONS = {
 # 字體設定資料
 # ------------------------------
 
+def parse_worker_range(config):
+    """從設定檔取得播放清單同時下載數的範圍 (min, max)"""
+    try:
+        min_workers = max(1, int(config.get("playlist_min_workers", 1)))
+        max_workers = max(min_workers, int(config.get("playlist_max_workers", 8)))
+    except (TypeError, ValueError):
+        return 1, 8
+    return min_workers, max_workers
+
 def get_font(lang, key):
     font_info = LANGUAGES[lang]["font"][key]
     family = font_info.get("family", "Arial")
@@ -187,6 +200,13 @@ class Setting(ctk.CTkToplevel):
         self.cookies_button = ctk.CTkButton(self.frames["others"], width=80, command=self.import_cookies)
         self.cookies_button.grid(row=1, column=3, padx=5, pady=10, sticky="w")
 
+        # 播放清單同時下載數的範圍（例如 1-8），實際數量會在範圍內自動調整
+        self.workers_label = ctk.CTkLabel(self.frames["others"])
+        self.workers_label.grid(row=2, column=0, padx=5, pady=10, sticky="ew")
+        self.workers_entry = ctk.CTkEntry(self.frames["others"])
+        self.workers_entry.insert(0, "{}-{}".format(*parse_worker_range(self.master.config)))
+        self.workers_entry.grid(row=2, column=3, padx=5, pady=10, sticky="ew")
+
         # ====== 頁面下方 ======
         self.frame_bottom = ctk.CTkFrame(
             self,
@@ -306,6 +326,12 @@ class Setting(ctk.CTkToplevel):
         self.change_language(self.language_combobox.get())
         self.master.config["resolution"] = self.resolution_combobox.get()
         self.master.config["transparency"] = self.transparency_entry.get()
+        try:
+            min_workers, max_workers = (int(v) for v in self.workers_entry.get().split("-"))
+            self.master.config["playlist_min_workers"] = max(1, min_workers)
+            self.master.config["playlist_max_workers"] = max(1, min_workers, max_workers)
+        except ValueError:
+            logger.warning(f"Invalid playlist worker range: {self.workers_entry.get()}")
         save_config(self.master.config)
         self.update_all_objects()
         self.master.update_all_pages_objects()
@@ -358,6 +384,8 @@ class Setting(ctk.CTkToplevel):
         self.cookies_label.configure(text=LANGUAGES[lang]["setting"]["cookies_label"], font=self.master.FONT_BODY)
         self.cookies_reset_button.configure(text=LANGUAGES[lang]["setting"]["reset"], font=self.master.FONT_BUTTON)
         self.cookies_button.configure(text=LANGUAGES[lang]["setting"]["import_cookies"], font=self.master.FONT_BUTTON)
+        self.workers_label.configure(text=LANGUAGES[lang]["setting"]["playlist_workers_label"], font=self.master.FONT_BODY)
+        self.workers_entry.configure(font=self.master.FONT_BODY)
         self.save_button.configure(text=LANGUAGES[lang]["setting"]["save_button"], font=self.master.FONT_BUTTON)
 
     def update_frame_tranparency(self):
@@ -394,6 +422,9 @@ class MainApp(ctk.CTk):
         self.bg_image_path = self.config.get("bg_image", "")
         self.transparency = float(self.config.get("transparency", "1"))
         self.cookies_path = self.config.get("cookies", "")
+        self.playlist_workers = parse_worker_range(self.config)
+        # 在背景清除已無人使用的下載暫存資料夾
+        threading.Thread(target=cleanup_staging, args=(self.download_path,), daemon=True).start()
 
         # 根據語言載入字體
         self.FONT_LOGO = get_font(self.current_language, "logo")
@@ -411,11 +442,15 @@ class MainApp(ctk.CTk):
         self.grid_columnconfigure(0, weight=1)
         self.grid_rowconfigure(0, weight=1)
 
+        # 各頁面的進度更新經由 progress_bus 合併，以 20 Hz 分派到主執行緒
+        self.progress_bus = ProgressBus(self, fps=20)
+
         self.frames = {}
         for Page in (HomePage, Page1, Page2, Page3, Page4):
             page = Page(self)
             self.frames[Page] = page
             page.grid(row=0, column=0, sticky="nsew")
+        self.progress_bus.start()
 
         self.show_frame(HomePage)
         self.setting_window = None
@@ -446,6 +481,7 @@ class MainApp(ctk.CTk):
         #self.fg_color = self.config.get("fg_color", "#000000")
         self.transparency = float(self.config.get("transparency", "0.85"))
         self.cookies_path = self.config.get("cookies", "")
+        self.playlist_workers = parse_worker_range(self.config)
 
         # 根據語言再次載入字體
         self.FONT_LOGO = get_font(self.current_language, "logo")
@@ -697,7 +733,12 @@ class Page1(ctk.CTkFrame):
         self.radio_mp3 = ctk.CTkRadioButton(self.frame_left, text="MP3", variable=self.format_var, value="mp3")
         self.radio_mp4.grid(row=2, column=2, padx=30, pady=5, sticky="w")
         self.radio_mp3.grid(row=3, column=2, padx=30, pady=5, sticky="w")
-        
+        # 原始音訊：不轉成 mp3，保留來源編碼
+        self.radio_audio = ctk.CTkRadioButton(self.frame_left, variable=self.format_var, value="audio")
+        self.radio_audio.grid(row=4, column=2, padx=30, pady=5, sticky="w")
+        # 切換 mp4 / mp3 / 原始音訊時，從快取重新產生畫質選項（不重新解析影片）
+        self.format_var.trace_add('write', lambda *args: self.refresh_resolution_options())
+
         self.subtitle_combobox = ctk.CTkComboBox(self.frame_left, values=["No subtitle"])
         self.subtitle_combobox.grid(row=3, column=1, padx=5, pady=5, sticky="ew")
         self.subtitle_combobox.grid_remove()  # 隱藏字幕選項
@@ -773,7 +814,13 @@ class Page1(ctk.CTkFrame):
 
         self.download_button = ctk.CTkButton(self.frame_bottom, command=self.download_video)
         self.download_button.grid(row=1, column=1, pady=5)
+
+        # 取消下載：中斷 yt_dlp 的下載並保留暫存檔，下次可接續
+        self.download_token = None
+        self.cancel_button = ctk.CTkButton(self.frame_bottom, command=self.cancel_download, state="disabled")
+        self.cancel_button.grid(row=0, column=1, pady=5)
         
+        self.master.progress_bus.subscribe("page1", self.apply_progress)
         self.update_all_objects()
 
     def toggle_subtitle_combobox(self):
@@ -820,14 +867,12 @@ class Page1(ctk.CTkFrame):
                         self.resolution_combobox.set("No resolutions")
                     self.subtitle_combobox.configure(values=subtitles)
                     self.subtitle_combobox.set(subtitles[0])
-                    # 更新封面圖
-                    response = requests.get(thumbnail_url)
-                    img_data = Image.open(io.BytesIO(response.content))
-                    self.thumbnail_image = CTkImage(light_image=img_data, dark_image=img_data, size=(400, 300))
-                    self.thumbnail_label.configure(image=self.thumbnail_image, text="")
                     # 啟用提交按鈕
                     self.submit_button.configure(state="normal")
                 self.master.after(0, update_ui)
+                # 封面圖在背景下載與縮圖，完成後才回到主執行緒顯示
+                if thumbnail_url:
+                    self.load_thumbnail(url, thumbnail_url)
             except Exception as e:
                 if not self.info_stop_event.is_set():
                     log_and_show_error(f"Failed to fetch video info: {e}", self.master)
@@ -848,15 +893,55 @@ class Page1(ctk.CTkFrame):
         # 10秒後詢問是否終止
         self.master.after(10000, ask_cancel)
 
+    def load_thumbnail(self, video_url, thumbnail_url):
+        """非同步載入封面圖（有快取時幾乎立即完成），若使用者已改看其他影片則不更新"""
+        def on_loaded(img_data):
+            def update_ui():
+                if video_url != self.video_url:
+                    return
+                if img_data is None:
+                    self.thumbnail_label.configure(image=None, text="")
+                    return
+                self.thumbnail_image = CTkImage(light_image=img_data, dark_image=img_data, size=(400, 300))
+                self.thumbnail_label.configure(image=self.thumbnail_image, text="")
+            self.master.after(0, update_ui)
+
+        get_thumbnail_cache().fetch_async(thumbnail_url, on_loaded)
+
+    def refresh_resolution_options(self):
+        """依目前的格式重新產生畫質選項；影片資訊已在快取中，因此不會重新解析"""
+        if not self.video_url:
+            return
+        url = self.video_url
+        file_format = self.format_var.get()
+
+        def task():
+            try:
+                _, _, resolutions, _ = get_video_info(url, file_format, self.master.cookies_path)
+            except Exception as e:
+                logger.error(f"Failed to refresh resolutions: {e}")
+                return
+            def update_ui():
+                if url != self.video_url:
+                    return
+                self.resolution_combobox.configure(values=resolutions)
+                self.resolution_combobox.set(resolutions[0] if resolutions else "No resolutions")
+            self.master.after(0, update_ui)
+
+        threading.Thread(target=task, daemon=True).start()
+
     def update_progress(self, progress):
+        """可在下載執行緒中呼叫；只發佈到 progress_bus，實際 UI 更新由 apply_progress 處理"""
+        self.master.progress_bus.publish("page1", progress=progress)
+
+    def apply_progress(self, fields):
+        """由 progress_bus 在主執行緒呼叫，fields 為合併後的最新進度"""
+        progress = fields["progress"]
+        self.progress_bar.set(progress)
         if progress != -1:
-            percent = int(progress * 100)
-            # 使用 after 確保 GUI 更新在主執行緒中執行
-            self.master.after(0, lambda: self.progress_bar.set(progress))
-            self.master.after(0, lambda: self.progress_bar_label.configure(text=f"{LANGUAGES[self.master.current_language]['page1']['Processing']} {percent}%", font=self.master.FONT_BODY))
+            self.progress_bar_label.configure(text=f"{self.processing_text} {int(progress * 100)}%")
         else:
-            self.master.after(100, lambda: self.progress_bar.set(progress))
-            self.master.after(0, lambda: self.progress_bar_label.configure(text=LANGUAGES[self.master.current_language]['page1']['Processing_completed'], font=self.master.FONT_BODY))
+            self.progress_bar_label.configure(text=self.processing_completed_text)
 
     def download_video(self):
         """開始下載影片，使用 threading 執行下載任務"""
@@ -865,6 +950,8 @@ class Page1(ctk.CTkFrame):
         file_format = self.format_var.get()
         download_subtitles = self.download_sub_var.get()
         subtitle_lang = self.subtitle_combobox.get()
+        token = self.download_token = CancelToken()
+        self.cancel_button.configure(state="normal")
 
         def download_task():
             try:
@@ -872,23 +959,32 @@ class Page1(ctk.CTkFrame):
                 output_file = download_video_audio(
                     self.video_url, resolution, self.download_path,
                     file_format, download_subtitles,
-                    subtitle_lang, self.master.cookies_path, self.update_progress
+                    subtitle_lang, self.master.cookies_path, self.update_progress,
+                    cancel_token=token
                 )
                 logger.info(f"Download Completed: {output_file}")
                 self.master.after(0, lambda: messagebox.showinfo(
                     LANGUAGES[self.master.current_language]['page1']["download_complete_title"],
                     LANGUAGES[self.master.current_language]['page1']["download_complete_message"].format(output_file)
                 ))
+            except JobCancelled:
+                logger.info("Download cancelled by user")
+                self.master.after(0, lambda: self.progress_bar_label.configure(text=self.cancelled_text))
             except Exception as e:
                 log_and_show_error(f"Download failed: {e}", self.master)
             finally:
                 # 回到主執行緒後重新啟用下載按鈕
                 self.master.after(0, lambda: self.download_button.configure(state="normal"))
+                self.master.after(0, lambda: self.cancel_button.configure(state="disabled"))
 
         # 建立並啟動下載執行緒
         download_thread = threading.Thread(target=download_task)
         download_thread.start()
 
+    def cancel_download(self):
+        if self.download_token is not None:
+            self.download_token.cancel()
+
     def change_download_path(self):
         """變更下載位置"""
         lang = self.master.current_language
@@ -945,12 +1041,18 @@ class Page1(ctk.CTkFrame):
         self.download_path_textbox.configure(state="disabled")
         self.change_path_button.configure(text=LANGUAGES[lang]["page1"]["browse_button"], font=self.master.FONT_BUTTON)
         self.download_sub_checkbox.configure(text=LANGUAGES[lang]["page1"]["download_sub_checkbox"], font=self.master.FONT_BODY)
+        self.radio_audio.configure(text=LANGUAGES[lang]["page1"]["native_audio_radio"], font=self.master.FONT_BODY)
 
         self.resolution_combobox.configure(font=self.master.FONT_BODY)
         self.subtitle_combobox.configure(font=self.master.FONT_BODY)
 
         self.progress_bar_label.configure(text=LANGUAGES[lang]["page1"]["progress_ready"], font=self.master.FONT_BODY)
         self.download_button.configure(text=LANGUAGES[lang]["page1"]["download_button"], font=self.master.FONT_BUTTON)
+        # 進度文字只在語言變更時查詢一次
+        self.processing_text = LANGUAGES[lang]["page1"]["Processing"]
+        self.processing_completed_text = LANGUAGES[lang]["page1"]["Processing_completed"]
+        self.cancelled_text = LANGUAGES[lang]["page1"]["cancelled"]
+        self.cancel_button.configure(text=LANGUAGES[lang]["page1"]["cancel_button"], font=self.master.FONT_BUTTON)
 
     def update_frame_tranparency(self):
         # 根據主題設定物件透明度
@@ -975,8 +1077,14 @@ class Page2(ctk.CTkFrame):
         self.download_path = self.master.config.get("download_path") or os.getcwd()
         self.video_url = ""
         
-        # 播放清單資料，內部儲存，每筆為 dict
-        self.playlist_items = []
+        # 播放清單資料，內部儲存，每筆為 dict（選取狀態也記錄在 model 中）
+        self.playlist_items = PlaylistModel()
+        # 佇列與每部影片的下載狀態同步寫入磁碟，程式重開後載入上次未完成的清單
+        self.download_queue = get_download_queue()
+        try:
+            self.playlist_items.extend(self.download_queue.load())
+        except Exception as e:
+            logger.error(f"Failed to load download queue: {e}")
 
         # 設定 Grid 權重
         self.grid_columnconfigure(0, weight=7)
@@ -1043,26 +1151,19 @@ class Page2(ctk.CTkFrame):
         self.frame_left_first.grid_rowconfigure(1, weight=1)
         self.frame_left_first.grid_columnconfigure((0,1,2,3,4,5), weight=1)
 
-        self.table_scroll = ctk.CTkScrollableFrame(
+        # 只為可見的列建立元件，上千筆的播放清單也不會拖慢介面
+        self.table = VirtualTable(
             self.frame_left_first,
-            bg_color=("#FFFFFF", "#000001"), 
-            fg_color=("#FFFFFF", "#000001"),
-
-        )
-        self.table_scroll.grid(row=0, column=0, columnspan=6, sticky="nsew")
-
-        initial_data = [["Video Title", "Resolution", "Format", "URL"]]
-        self.table = CTkTable(
-            master=self.table_scroll,
-            row=len(initial_data),
-            column=len(initial_data[0]),
-            values=initial_data,
+            model=self.playlist_items,
+            columns=["title", "resolution", "format", "status", "url"],
+            widths=[360, 120, 80, 160, 100],
             hover_color="skyblue",
-            corner_radius=0,
             font=self.master.FONT_BODY,
-            command=self.on_cell_click
+            formatters={"status": self.status_text},
+            bg_color=("#FFFFFF", "#000001"),
+            fg_color=("#FFFFFF", "#000001"),
         )
-        self.table.pack(padx=10, pady=10, fill="both", expand=True)
+        self.table.grid(row=0, column=0, columnspan=6, sticky="nsew", padx=10, pady=10)
 
 
         self.select_all_btn = ctk.CTkButton(self.frame_left_first, command=self.select_all_rows)
@@ -1070,6 +1171,17 @@ class Page2(ctk.CTkFrame):
 
         self.delete_btn = ctk.CTkButton(self.frame_left_first, command=self.delete_selected_rows)
         self.delete_btn.grid(row=1, column=1, sticky="w", padx=5, pady=1)
+
+        # 下載佇列的控制：選取的影片優先下載、暫停 / 恢復、取消
+        self.playlist_scheduler = None
+        self.playlist_jobs = {}       # id(item) -> QueuedJob
+        self.next_priority = 0
+        self.prioritize_btn = ctk.CTkButton(self.frame_left_first, command=self.prioritize_selected_rows)
+        self.prioritize_btn.grid(row=1, column=2, sticky="w", padx=5, pady=1)
+        self.pause_btn = ctk.CTkButton(self.frame_left_first, command=self.toggle_pause, state="disabled")
+        self.pause_btn.grid(row=1, column=3, sticky="w", padx=5, pady=1)
+        self.cancel_btn = ctk.CTkButton(self.frame_left_first, command=self.cancel_playlist_download, state="disabled")
+        self.cancel_btn.grid(row=1, column=4, sticky="w", padx=5, pady=1)
         
         self.total_label = ctk.CTkLabel(self.frame_left_first)
         self.total_label.grid(row=1, column=5, sticky="e", padx=5, pady=1)
@@ -1081,7 +1193,7 @@ class Page2(ctk.CTkFrame):
             fg_color=("#FFFFFF", "#000001"),
         )
         self.frame_first_right.grid(row=1, column=1, sticky="nsew", padx=5, pady=5)
-        self.frame_first_right.grid_rowconfigure((0,1,2,3), weight=1)
+        self.frame_first_right.grid_rowconfigure((0,1,2,3,4), weight=1)
         self.frame_first_right.grid_columnconfigure(0, weight=8)
         self.frame_first_right.grid_columnconfigure(1, weight=2)
 
@@ -1109,6 +1221,22 @@ class Page2(ctk.CTkFrame):
         self.mp3_radio = ctk.CTkRadioButton(self.frame_first_right, text="MP3", variable=self.format_var, value="mp3")
         self.mp4_radio.grid(row=2, column=1, padx=10, pady=2)
         self.mp3_radio.grid(row=3, column=1, padx=10, pady=2)
+        # 原始音訊：不轉成 mp3，保留來源編碼
+        self.audio_radio = ctk.CTkRadioButton(self.frame_first_right, variable=self.format_var, value="audio")
+        self.audio_radio.grid(row=4, column=1, padx=10, pady=2)
+
+        # 同步模式：只加入下載索引中沒有的影片（每天重跑同一播放清單時只下載新影片）
+        self.sync_var = ctk.BooleanVar(value=self.master.config.get("playlist_sync", False))
+        self.sync_checkbox = ctk.CTkCheckBox(
+            self.frame_first_right,
+            variable=self.sync_var,
+            command=self.toggle_sync
+        )
+        self.sync_checkbox.grid(row=3, column=0, padx=10, pady=2, sticky="w")
+
+        # 批次匯入：文字檔中的影片與播放清單 URL（也可直接在網址欄貼上多個 URL）
+        self.import_btn = ctk.CTkButton(self.frame_first_right, command=self.import_url_list)
+        self.import_btn.grid(row=4, column=0, padx=10, pady=2, sticky="w")
 
         # 監聽 self.format_var 的變化，當格式改變時自動更新 resolution_combobox 的選項
         self.format_var.trace_add('write', lambda *args: self.update_resolution_options())
@@ -1149,20 +1277,13 @@ class Page2(ctk.CTkFrame):
         self.download_button = ctk.CTkButton(self.frame_bottom, command=self.download_playlist)
         self.download_button.grid(row=1, column=1, pady=5)
 
+        # 目前的並行下載數與最近一次調整的原因
+        self.workers_label = ctk.CTkLabel(self.frame_bottom, text="")
+        self.workers_label.grid(row=0, column=1, sticky="ew")
+
+        self.master.progress_bus.subscribe("page2", self.apply_progress)
         self.update_all_objects()  # 初始化所有物件的文字與樣式
         
-    def set_fixed_column_widths(self, widths):
-        """
-        設定表格每一欄的寬度。
-        widths: 一個列表，每個元素代表對應欄的固定寬度（像素）。
-        例如: [300, 100, 80, 400]
-        (但沒啥用)
-        """
-        for (row, col), cell in self.table.frame.items():
-            if col in widths:
-                # 設定固定寬度，同時設定 wraplength 避免文字溢出
-                cell.configure(width=widths[col])
-
     def update_table_header(self):
         lang = self.master.current_language
         # 根據語系設定表頭
@@ -1170,15 +1291,26 @@ class Page2(ctk.CTkFrame):
             LANGUAGES[lang]["page2"]["video_title"],
             LANGUAGES[lang]["page2"]["resolution"],
             LANGUAGES[lang]["page2"]["format"],
+            LANGUAGES[lang]["page2"]["status"],
             LANGUAGES[lang]["page2"]["url"]
         ]
         # 根據主題決定表頭背景色，這裡以 Light 主題用淺灰、Dark 主題用深灰為例
         header_color = "gray90" if self.master.config.get("theme", "Dark") == "Light" else "gray25"
         # 更新表頭每個 cell 的文字與背景色
-        for col in range(len(header)):
-            if (0, col) in self.table.frame:
-                self.table.frame[(0, col)].configure(text=header[col], fg_color=header_color)
-        self.set_fixed_column_widths([400, 200, 100, 100])
+        self.table.set_header(header, header_color)
+
+    def status_text(self, item):
+        """表格「狀態」欄的文字：下載中顯示百分比與速度，其他狀態顯示狀態名稱（未完成的顯示已下載的比例）"""
+        page = LANGUAGES[self.master.current_language]["page2"]
+        state = item.get("state", PENDING)
+        done = item.get("bytes_done") or 0
+        total = item.get("total_bytes") or 0
+        percent = f"{min(100, int(done * 100 / total))}%" if total else format_bytes(done)
+        if state == RUNNING:
+            return f"{percent}  {format_bytes(item.get('speed'))}/s" if done else page["state_running"]
+        if state == PENDING and done:
+            return f"{page['state_pending']} {percent}"
+        return page[f"state_{state}"]
 
     def update_total_label(self):
         total = len(self.playlist_items)
@@ -1194,8 +1326,8 @@ class Page2(ctk.CTkFrame):
             log_and_show_error(f"Failed to paste URL from clipboard: {e}", self.master)
 
     def update_resolution_options(self):
-        if self.format_var.get() == "mp3":
-            # 當選擇 mp3 時，提供預設的音訊品質選項
+        if self.format_var.get() in ("mp3", "audio"):
+            # 當選擇 mp3 / 原始音訊時，提供預設的音訊品質選項（原始音訊會選擇最接近的來源位元率）
             new_options = ["320kbps", "256kbps", "192kbps", "128kbps", "64kbps"]
             self.resolution_combobox.configure(values=new_options)
             # 例如預設使用最高品質
@@ -1206,52 +1338,109 @@ class Page2(ctk.CTkFrame):
             self.resolution_combobox.configure(values=new_options)
             self.resolution_combobox.set("1080p")
 
+    def toggle_sync(self):
+        self.master.config["playlist_sync"] = self.sync_var.get()
+        save_config(self.master.config)
+
     def add_playlist_item(self):
         """解析播放清單 URL，並將解析到的影片資料插入表格與內部清單中，使用線程執行並禁用提交按鈕"""
-        self.submit_btn.configure(state="disabled")
-        url = self.url_entry.get().strip()
-        if not url:
-            self.submit_btn.configure(state="normal")
+        text = self.url_entry.get().strip()
+        if not text:
+            return
+        urls = text.split()
+        if len(urls) > 1:
+            # 貼上多個 URL 時視為批次匯入
+            self.expand_into_table(
+                lambda resolution, file_format, cookies_path, stop_event:
+                    expand_url_list(urls, resolution, file_format, cookies_path, stop_event=stop_event),
+                skip_existing=True
+            )
             return
+        url = urls[0]
         # 檢查是否為播放清單 URL
         if "list=" not in url:
             log_and_show_error("Invalid playlist URL", self.master)
-            self.submit_btn.configure(state="normal")
             return
+        self.expand_into_table(
+            lambda resolution, file_format, cookies_path, stop_event:
+                iter_playlist(url, resolution, file_format, cookies_path, stop_event=stop_event)
+        )
+
+    def import_url_list(self):
+        """從文字檔批次匯入影片與播放清單 URL（每行一個或多個，# 開頭為註解）"""
+        path = filedialog.askopenfilename(filetypes=[("Text files", "*.txt"), ("All files", "*.*")])
+        if not path:
+            return
+        self.expand_into_table(
+            lambda resolution, file_format, cookies_path, stop_event:
+                expand_url_list(iter_url_file(path), resolution, file_format, cookies_path, stop_event=stop_event),
+            skip_existing=True
+        )
 
+    def expand_into_table(self, make_batches, skip_existing=False):
+        """
+        在背景執行緒展開影片清單並逐批加入表格，展開期間禁用提交與匯入按鈕。
+        make_batches(resolution, file_format, cookies_path, stop_event) 回傳逐批 yield 影片資料字典的 generator。
+        skip_existing: 略過表格中已有的影片（批次匯入與同步模式）
+        """
+        self.submit_btn.configure(state="disabled")
+        self.import_btn.configure(state="disabled")
         self.playlist_stop_event = threading.Event()
         self.playlist_thread = None
+        stop_event = self.playlist_stop_event
+        resolution = self.resolution_combobox.get()
+        file_format = self.format_var.get()
+        cookies_path = self.master.cookies_path
+        sync = self.sync_var.get()
+        skip_existing = skip_existing or sync
+        download_path = self.master.download_path
+        first_batch = threading.Event()
+        # 每部影片的完整標題與格式表在背景平行補上，同時預先寫入快取，下載時不必再解析
+        fetcher = PlaylistDetailFetcher(cookies_path, on_detail=self.on_playlist_detail)
 
         def task():
+            received = 0
+            skipped = 0
             try:
-                items = parse_playlist(url, self.resolution_combobox.get(), self.format_var.get(), self.master.cookies_path)
-                if self.playlist_stop_event.is_set():
-                    # 被用戶終止，不更新 UI
-                    return
-                if not items:
+                # 清單逐批送到主執行緒加入表格，不必等整個播放清單解析完
+                for batch in make_batches(resolution, file_format, cookies_path, stop_event):
+                    if stop_event.is_set():
+                        # 被用戶終止，不再更新 UI
+                        break
+                    if sync:
+                        # 已下載過的影片不加入表格，也不解析詳細資料
+                        new_batch = filter_synced(batch, download_path)
+                        skipped += len(batch) - len(new_batch)
+                        batch = new_batch
+                        if not batch:
+                            continue
+                    received += len(batch)
+                    first_batch.set()
+                    self.master.after(0, lambda batch=batch: self.append_playlist_items(batch, skip_existing=skip_existing))
+                    fetcher.submit(batch)
+                if received == 0 and skipped and not stop_event.is_set():
+                    self.master.after(0, lambda: messagebox.showinfo(
+                        LANGUAGES[self.master.current_language]["page2"]["sync_checkbox"],
+                        LANGUAGES[self.master.current_language]["page2"]["sync_up_to_date"].format(skipped)
+                    ))
+                elif received == 0 and not stop_event.is_set():
                     log_and_show_error("Failed to parse playlist or no videos found!", self.master)
-                    # 回到主執行緒重新啟用提交按鈕
-                    self.master.after(0, lambda: self.submit_btn.configure(state="normal"))
-                    return
-                # 將解析到的資料加入內部清單
-                for item in items:
-                    self.playlist_items.append(item)
-                # 在主執行緒中更新 UI（因為 Tkinter 介面更新必須在主執行緒中進行）
-                def update_ui():
-                    for item in items:
-                        self.table.add_row([item["title"], item["resolution"], item["format"], item["url"]])
-                    self.update_total_label()
-                    self.update_table_header()
-                    self.submit_btn.configure(state="normal")
-                self.master.after(0, update_ui)
+                logger.info(f"Playlist expanded: {received} new items, {skipped} already downloaded")
             except Exception as e:
-                if not self.playlist_stop_event.is_set():
+                if not stop_event.is_set():
                     log_and_show_error(f"Failed to parse playlist: {e}", self.master)
+            finally:
+                if stop_event.is_set():
+                    fetcher.stop()
+                else:
+                    fetcher.close()
+                # 回到主執行緒重新啟用提交與匯入按鈕
                 self.master.after(0, lambda: self.submit_btn.configure(state="normal"))
+                self.master.after(0, lambda: self.import_btn.configure(state="normal"))
 
         def ask_cancel():
-            print(self.playlist_thread)
-            if self.playlist_thread.is_alive():
+            # 已有項目陸續加入表格時不需要詢問
+            if self.playlist_thread.is_alive() and not first_batch.is_set():
                 result = messagebox.askyesno(
                     LANGUAGES[self.master.current_language]["page2"]["timeout_title"],
                     LANGUAGES[self.master.current_language]["page2"]["timeout_message"]
@@ -1259,65 +1448,86 @@ class Page2(ctk.CTkFrame):
                 if result:
                     self.playlist_stop_event.set()
                     self.submit_btn.configure(state="normal")
+                    self.import_btn.configure(state="normal")
 
-        self.playlist_thread = threading.Thread(target=task)
+        self.playlist_thread = threading.Thread(target=task, daemon=True)
         self.playlist_thread.start()
         # 10秒後詢問是否終止
         self.master.after(10000, ask_cancel)
 
+    def append_playlist_items(self, items, skip_existing=False):
+        """
+        在主執行緒中將一批解析到的影片加入佇列、內部清單與表格。
+        skip_existing: 略過表格中已有（相同 URL 與格式）的影片，例如同步模式下上次尚未下載完的項目、
+        或批次匯入時已在佇列中的影片
+        """
+        if skip_existing:
+            existing = {(item["url"], item["format"]) for item in self.playlist_items}
+            items = [item for item in items if (item["url"], item["format"]) not in existing]
+            if not items:
+                return
+        self.download_queue.add(items)
+        self.playlist_items.extend(items)
+        self.table.refresh()
+        self.update_total_label()
+
+    def on_playlist_detail(self, item, metadata):
+        """PlaylistDetailFetcher 取得完整資料後呼叫（工作執行緒），標題有變更時更新該列"""
+        title = metadata.get("title")
+        if not title or title == item["title"]:
+            return
+        def update_ui():
+            item["title"] = title
+            if "queue_id" in item:
+                self.download_queue.update_title(item["queue_id"], title)
+            self.table.refresh()
+        self.master.after(0, update_ui)
 
-    def get_selected_rows(self):
-        selected_rows = []
-        for i in range(self.table.rows):
-            # 依照你的設計，這邊只要檢查每行的第 1 欄是否 == hover_color 即可
-            if self.table.frame[i, 1].cget("fg_color") == self.table.hover_color:
-                selected_rows.append(i)
-        return selected_rows
 
     def select_all_rows(self):
-        """ 遍歷表格中除第一列（表頭）以外的所有列，呼叫 select_row() 使其選取 """
-        selected_rows = self.get_selected_rows()
-        if len(selected_rows) == self.table.rows - 1:
-            # 如果所有列都已選取，則取消選取所有列
-            for row in range(1, self.table.rows):
-                self.table.deselect_row(row)
+        """全部已選取時取消全選，否則全選"""
+        self.playlist_items.toggle_all()
+        self.table.refresh()
+
+    def prioritize_selected_rows(self):
+        """下載中時，讓選取且尚未開始的影片排到佇列最前面"""
+        scheduler = self.playlist_scheduler
+        if scheduler is None:
+            return
+        self.next_priority += 1
+        for item in self.playlist_items.selected_items():
+            job = self.playlist_jobs.get(id(item))
+            if job is not None:
+                scheduler.set_priority(job, self.next_priority)
+
+    def toggle_pause(self):
+        scheduler = self.playlist_scheduler
+        if scheduler is None:
+            return
+        lang = self.master.current_language
+        if scheduler.paused:
+            scheduler.resume()
+            self.pause_btn.configure(text=LANGUAGES[lang]["page2"]["pause_button"])
         else:
-            # 假設 self.table.rows 回傳表格總列數，且第0列為表頭
-            for row in range(1, self.table.rows):
-                self.table.select_row(row)
-
-    def delete_selected_rows(self):
-        """刪除表格中選取的列，並從內部清單中移除"""
-        selected = self.get_selected_rows()  # 假設此方法回傳選取列索引列表
-        for index in sorted(selected, reverse=True):
-            self.table.delete_row(index)
-            del self.playlist_items[index-1]
-        self.update_total_label()
+            scheduler.pause()
+            self.pause_btn.configure(text=LANGUAGES[lang]["page2"]["resume_button"])
 
-    def on_cell_click(self, cell_data):
-        """
-        當使用者點擊儲存格時呼叫。
-        cell_data 格式：
-        {
-            "row": <列號>,
-            "column": <欄號>,
-            "value": <該儲存格文字內容>,
-            "args": <其他設定參數>
-        }
-        """
-        row_index = cell_data["row"]
-        if row_index == 0:
-            # 如果點擊的是表頭，則不做任何事
+    def cancel_playlist_download(self):
+        """取消尚未開始與下載中的影片；下載中的暫存檔保留，之後可接續"""
+        scheduler = self.playlist_scheduler
+        if scheduler is None:
             return
-        # 檢查該 row 是否已經被選取：只要比對第二欄的 fg_color 是不是 hover_color
-        is_selected = (self.table.frame[row_index, 1].cget("fg_color") == self.table.hover_color)
+        if scheduler.paused:
+            self.toggle_pause()
+        scheduler.cancel_all()
 
-        if is_selected:
-            # 如果已選取，則切換成「取消」
-            self.table.deselect_row(row_index)
-        else:
-            # 如果還沒被選取，就「選取」
-            self.table.select_row(row_index)
+    def delete_selected_rows(self):
+        """刪除表格中選取的列，並從內部清單與佇列中移除"""
+        self.download_queue.remove([item["queue_id"] for item in self.playlist_items.selected_items() if "queue_id" in item])
+        removed = self.playlist_items.delete_selected()
+        if removed:
+            self.table.refresh()
+            self.update_total_label()
 
     def change_download_path(self):
         """變更下載位置"""
@@ -1333,66 +1543,140 @@ class Page2(ctk.CTkFrame):
             self.download_path_textbox.configure(state="disabled")
 
     def update_progress(self, progress):
-        lang = self.master.current_language
+        """可在下載執行緒中呼叫；只發佈到 progress_bus，實際 UI 更新由 apply_progress 處理"""
+        self.master.progress_bus.publish("page2", progress=progress)
+
+    def update_workers(self, limit, reason):
+        """由 AdaptiveScheduler 在控制執行緒呼叫，回報並行下載數的調整"""
+        self.master.progress_bus.publish("page2", workers=limit, workers_reason=reason)
+
+    def apply_progress(self, fields):
+        """由 progress_bus 在主執行緒呼叫，fields 為合併後的最新進度"""
+        if "workers" in fields:
+            self.workers_label.configure(text=self.workers_text.format(fields["workers"], fields["workers_reason"]))
+        if "transfer" in fields:
+            # 依位元組計算的整體進度、總速度與 ETA；表格只重繪可見的列
+            transfer = fields["transfer"]
+            self.progress_bar.set(transfer["progress"])
+            self.progress_bar_label.configure(text=(
+                f"{self.processing_text} {int(transfer['progress'] * 100)}%  "
+                f"{format_bytes(transfer['speed'])}/s  ETA {format_eta(transfer['eta'])}"
+            ))
+            self.table.refresh()
+        if "progress" not in fields:
+            return
+        progress = fields["progress"]
+        self.progress_bar.set(progress)
         if progress != -1:
-            percent = int(progress * 100)
-            # 使用 after 確保 GUI 更新在主執行緒中執行
-            self.master.after(0, lambda: self.progress_bar.set(progress))
-            self.master.after(0, lambda: self.progress_bar_label.configure(text=f"{LANGUAGES[self.master.current_language]['page2']['Processing']} {percent}%", font=self.master.FONT_BODY))
+            self.progress_bar_label.configure(text=f"{self.processing_text} {int(progress * 100)}%")
         else:
-            self.master.after(100, lambda: self.progress_bar.set(progress))
-            self.master.after(0, lambda: self.progress_bar_label.configure(text=LANGUAGES[self.master.current_language]['page2']['Processing_completed'], font=self.master.FONT_BODY))
+            self.progress_bar_label.configure(text=self.processing_completed_text)
+            self.table.refresh()
     
     def download_playlist(self):
         """
-        使用 ThreadPoolExecutor 控制同時線程數來多線程下載播放清單中所有影片，
-        並根據已完成影片數更新進度條。整個流程放入獨立線程中以免阻塞主線程。
+        使用 AdaptiveScheduler 多線程下載播放清單中所有影片，同時下載數依下載速度、
+        錯誤 / 429 與 CPU 負載在設定的範圍內自動調整；ffmpeg 合併 / 轉檔另以 CPU 核心數為上限，
+        不佔用下載名額。進度條、速度與 ETA 依已下載的位元組計算。
+        整個流程放入獨立線程中以免阻塞主線程。
         """
         self.download_button.configure(state="disabled")
-        total = len(self.playlist_items)
+        # 下載期間使用者仍可編輯表格，因此先取得當下清單的副本；已完成的項目（例如上次執行時）不再下載
+        items = [item for item in self.playlist_items if item.get("state") != DONE]
+        total = len(items)
         if total == 0:
             self.download_button.configure(state="normal")
             return
 
-        def download_item(item, idx):
-            output_file = download_video_audio_playlist_with_retry(
-                item["url"],
-                item["resolution"],
-                self.master.download_path,
-                item["format"],
-                self.master.cookies_path
-            )
+        min_workers, max_workers = self.master.playlist_workers
+
+        queue = self.download_queue
+        tracker = TransferTracker(items)
+
+        def report_bytes(item, done, size):
+            queue.update_bytes(item["queue_id"], done, size)
+            # 最多每 0.5 秒通知一次 UI，進度條與表格的重繪頻率與 chunk 數量無關
+            if tracker.update(item, done, size):
+                self.master.progress_bus.publish("page2", transfer=tracker.snapshot())
+
+        def download_item(item, idx, scheduler, token):
+            queue_id = item["queue_id"]
+            item["state"] = RUNNING
+            queue.set_state(queue_id, RUNNING)
+            try:
+                output_file = download_video_audio_playlist_with_retry(
+                    item["url"],
+                    item["resolution"],
+                    self.master.download_path,
+                    item["format"],
+                    self.master.cookies_path,
+                    stats=scheduler,
+                    cancel_token=token,
+                    progress_callback=lambda done, size: report_bytes(item, done, size),
+                    pipeline=scheduler
+                )
+            except JobCancelled:
+                # 取消的項目回到 pending，下次下載時從暫存檔接續
+                item["state"] = PENDING
+                queue.set_state(queue_id, PENDING)
+                raise
+            except Exception as e:
+                item["state"] = FAILED
+                queue.set_state(queue_id, FAILED, error=str(e))
+                raise
+            finally:
+                tracker.finish(item)
+                self.master.progress_bus.publish("page2", transfer=tracker.snapshot())
+            item["state"] = DONE if output_file else FAILED
+            queue.set_state(queue_id, item["state"], output_path=output_file)
             return idx, output_file
 
+        def set_controls(running):
+            state = "normal" if running else "disabled"
+            self.pause_btn.configure(state=state, text=LANGUAGES[self.master.current_language]["page2"]["pause_button"])
+            self.cancel_btn.configure(state=state)
+            self.download_button.configure(state="disabled" if running else "normal")
+
         def thread_func():
             completed = 0
-            max_threads = 4  # 同時最多執行 4 個下載任務
-            self.master.after(0, lambda: self.update_progress(0))
-            with ThreadPoolExecutor(max_workers=max_threads) as executor:
-                futures = [executor.submit(download_item, item, idx)
-                        for idx, item in enumerate(self.playlist_items)]
+            cancelled = 0
+            self.update_progress(0)
+            # 從 4 個同時下載開始，之後依實際狀況增減
+            with AdaptiveScheduler(min_workers, max_workers, initial=4, on_change=self.update_workers) as scheduler:
+                futures = {}
+                for idx, item in enumerate(items):
+                    token = CancelToken()
+                    job = scheduler.submit(download_item, item, idx, scheduler, token, token=token)
+                    self.playlist_jobs[id(item)] = job
+                    futures[job.future] = idx
+                self.playlist_scheduler = scheduler
+                self.master.after(0, lambda: set_controls(True))
                 for future in as_completed(futures):
                     try:
                         idx, output_file = future.result()
+                    except (JobCancelled, CancelledError):
+                        cancelled += 1
+                        continue
                     except Exception as e:
                         log_and_show_error(f"Download failed: {e}", self.master)
                         continue
-                    completed += 1
-                    progress = completed / total
-                    # 更新進度條必須在主線程中執行
-                    self.master.after(0, lambda: self.update_progress(progress))
+                    if output_file:
+                        completed += 1
                     logger.info(f"Video {idx} downloaded: {output_file}")
+            self.playlist_scheduler = None
+            self.playlist_jobs = {}
             # 所有任務完成後，回到主線程中重新啟用按鈕與設定進度條
-            self.master.after(0, lambda: self.download_button.configure(state="normal"))
-            self.master.after(0, lambda: self.update_progress(-1))
+            self.master.after(0, lambda: set_controls(False))
+            self.update_progress(-1)
             self.master.after(0, lambda: messagebox.showinfo(
                 LANGUAGES[self.master.current_language]['page2']["completed"],  # 標題
                 f"{LANGUAGES[self.master.current_language]['page2']['completed']}: {completed}\n"
-                f"{LANGUAGES[self.master.current_language]['page2']['failed']}: {total - completed}"
+                f"{LANGUAGES[self.master.current_language]['page2']['failed']}: {total - completed - cancelled}\n"
+                f"{LANGUAGES[self.master.current_language]['page2']['cancelled']}: {cancelled}"
             ))
             logger.info("All videos downloaded")
 
-        # 將整個 ThreadPoolExecutor 流程放到獨立線程中執行，避免阻塞主線程
+        # 將整個下載流程放到獨立線程中執行，避免阻塞主線程
         threading.Thread(target=thread_func).start()
 
     def update_bg_image(self):
@@ -1433,11 +1717,19 @@ class Page2(ctk.CTkFrame):
         # 左側表格
         self.select_all_btn.configure(text=LANGUAGES[lang]["page2"]["select_all"], font=self.master.FONT_BUTTON)
         self.delete_btn.configure(text=LANGUAGES[lang]["page2"]["delete_selected"], font=self.master.FONT_BUTTON)
+        self.prioritize_btn.configure(text=LANGUAGES[lang]["page2"]["prioritize_selected"], font=self.master.FONT_BUTTON)
+        pause_key = "resume_button" if self.playlist_scheduler is not None and self.playlist_scheduler.paused else "pause_button"
+        self.pause_btn.configure(text=LANGUAGES[lang]["page2"][pause_key], font=self.master.FONT_BUTTON)
+        self.cancel_btn.configure(text=LANGUAGES[lang]["page2"]["cancel_button"], font=self.master.FONT_BUTTON)
 
         # 右側 URL 輸入與下載位置
         self.url_entry.configure(placeholder_text=LANGUAGES[lang]["page2"]["playlist_url_label"], font=self.master.FONT_BODY)
         self.submit_btn.configure(text=LANGUAGES[lang]["page2"]["submit_button"], font=self.master.FONT_BUTTON)
         self.resolution_combobox.configure(font=self.master.FONT_BODY)
+        self.audio_radio.configure(text=LANGUAGES[lang]["page2"]["native_audio_radio"], font=self.master.FONT_BODY)
+        self.sync_checkbox.configure(text=LANGUAGES[lang]["page2"]["sync_checkbox"], font=self.master.FONT_BODY)
+        self.import_btn.configure(text=LANGUAGES[lang]["page2"]["import_button"], font=self.master.FONT_BUTTON)
+        self.table.set_font(self.master.FONT_BODY)
         self.download_path_textbox.configure(state="normal", font=self.master.FONT_BODY)
         self.download_path_textbox.delete("0.0", "end")
         self.download_path_textbox.insert("0.0", f"{LANGUAGES[lang]['page2']['download_path_label']} {self.download_path}")
@@ -1447,6 +1739,11 @@ class Page2(ctk.CTkFrame):
         # 底部
         self.progress_bar_label.configure(text=LANGUAGES[lang]["page2"]["progress_ready"], font=self.master.FONT_BODY)
         self.download_button.configure(text=LANGUAGES[lang]["page2"]["download_button"], font=self.master.FONT_BUTTON)
+        # 進度文字只在語言變更時查詢一次
+        self.processing_text = LANGUAGES[lang]["page2"]["Processing"]
+        self.processing_completed_text = LANGUAGES[lang]["page2"]["Processing_completed"]
+        self.workers_text = LANGUAGES[lang]["page2"]["workers_status"]
+        self.workers_label.configure(font=self.master.FONT_BODY)
 
     def update_frame_tranparency(self):
         # 根據主題設定物件透明度
@@ -1550,12 +1847,16 @@ class Page3(ctk.CTkFrame):
         self.file_label.grid(row=0, column=0, padx=5, pady=5, columnspan=2, sticky="w")
 
         self.selected_file = ctk.StringVar(value="")
+        self.selected_files = []  # 要轉換的檔案；選擇多個檔案或資料夾時為批次轉檔
         self.file_display = ctk.CTkEntry(self.frame_left, textvariable=self.selected_file, state="disabled")
         self.file_display.grid(row=1, column=0, padx=5, pady=5, columnspan=2, sticky="ew")
 
         self.file_button = ctk.CTkButton(self.frame_left, text="Browse", command=self.browse_file)
         self.file_button.grid(row=1, column=2, padx=5, pady=5, sticky="w")
 
+        self.folder_button = ctk.CTkButton(self.frame_left, command=self.browse_folder)
+        self.folder_button.grid(row=0, column=2, padx=5, pady=5, sticky="w")
+
         self.converted_file_label = ctk.CTkLabel(self.frame_left)
         self.converted_file_label.grid(row=2, column=0, padx=5, pady=5, columnspan=2, sticky="w")
 
@@ -1626,12 +1927,27 @@ class Page3(ctk.CTkFrame):
         )
         self.frame_right.grid(row=0, column=1, rowspan=2, sticky="nsew", padx=5, pady=5)
         self.frame_right.grid_propagate(False)  # 固定 frame 尺寸
-        self.frame_right.grid_rowconfigure(0, weight=1)
+        self.frame_right.grid_rowconfigure((0, 1), weight=1)
         self.frame_right.grid_columnconfigure(0, weight=1)
 
         self.ad_label = ctk.CTkLabel(self.frame_right, text='')
         self.ad_label.grid(row=0, column=0, sticky="nsew", padx=0, pady=0)
 
+        # 批次轉檔佇列：每個檔案的狀態、進度與轉換速度
+        self.conversion_jobs = PlaylistModel()
+        self.queue_table = VirtualTable(
+            self.frame_right,
+            model=self.conversion_jobs,
+            columns=["name", "status", "speed"],
+            widths=[260, 100, 70],
+            hover_color="skyblue",
+            font=self.master.FONT_BODY,
+            formatters={"status": self.job_status_text, "speed": lambda job: f"{job['speed']:.1f}x" if job.get("speed") else ""},
+            bg_color=("#FFFFFF", "#000001"),
+            fg_color=("#FFFFFF", "#000001"),
+        )
+        self.queue_table.grid(row=1, column=0, sticky="nsew", padx=5, pady=5)
+
         # ---------- 底部進度區 ----------
         self.frame_bottom = ctk.CTkFrame(
             self,
@@ -1654,15 +1970,54 @@ class Page3(ctk.CTkFrame):
         self.convert_button = ctk.CTkButton(self.frame_bottom, command=self.start_conversion)
         self.convert_button.grid(row=1, column=1, padx=5, pady=5)
 
+        # 取消轉檔：立即結束 ffmpeg 並刪除不完整的輸出檔
+        self.conversion_queue = None
+        self.cancel_button = ctk.CTkButton(self.frame_bottom, command=self.cancel_conversion, state="disabled")
+        self.cancel_button.grid(row=0, column=1, padx=5, pady=5)
+
+        self.master.progress_bus.subscribe("page3", self.apply_progress)
         self.update_all_objects()
 
     def browse_file(self):
-        file_path = filedialog.askopenfilename(
+        file_paths = filedialog.askopenfilenames(
             filetypes=[("Video Files", "*.mp4 *.webm *.mkv *.mov"), ("Audio Files", "*.mp3 *.wav *.flac *.ogg")]
         )
-        if file_path:
-            self.selected_file.set(file_path)
-            self.end_time_var.set(get_media_duration(file_path))
+        if file_paths:
+            self.set_selected_files(list(file_paths))
+
+    def browse_folder(self):
+        """選擇資料夾，轉換其中（含子資料夾）所有的影音檔"""
+        folder = filedialog.askdirectory()
+        if not folder:
+            return
+        file_paths = collect_media_files(folder)
+        if not file_paths:
+            log_and_show_error("No media files found in the selected folder!", self.master)
+            return
+        self.set_selected_files(file_paths)
+
+    def set_selected_files(self, file_paths):
+        self.selected_files = file_paths
+        self.show_jobs([])
+        if len(file_paths) == 1:
+            self.selected_file.set(file_paths[0])
+            self.end_time_var.set(get_media_duration(file_paths[0]))
+        else:
+            # 批次轉檔：結束時間留空表示轉到每個檔案的結尾（起始 / 結束時間套用到所有檔案）
+            self.selected_file.set(LANGUAGES[self.master.current_language]["page3"]["files_selected"].format(len(file_paths), file_paths[0]))
+            self.end_time_var.set("")
+
+    def show_jobs(self, jobs):
+        """以新的轉檔工作取代佇列表格的內容"""
+        self.conversion_jobs = self.queue_table.model = PlaylistModel()
+        self.conversion_jobs.extend(jobs)
+        self.queue_table.refresh()
+
+    def job_status_text(self, job):
+        page = LANGUAGES[self.master.current_language]["page3"]
+        if job["state"] == "running":
+            return f"{int(job['progress'] * 100)}%"
+        return page[f"job_{job['state']}"]
     
     def open_converted_file(self):
         file_path = self.converted_file_display.get()
@@ -1738,20 +2093,37 @@ class Page3(ctk.CTkFrame):
             self.param_combobox.set("128kbps")
 
     def update_progress(self, progress):
-        lang= self.master.current_language 
+        """可在轉檔執行緒中呼叫；只發佈到 progress_bus，實際 UI 更新由 apply_progress 處理"""
+        self.master.progress_bus.publish("page3", progress=progress)
+
+    def update_queue(self, snapshot):
+        """由 ConversionQueue 在工作執行緒呼叫（已限制頻率），經 progress_bus 回到主執行緒"""
+        self.master.progress_bus.publish("page3", queue=snapshot)
+
+    def apply_progress(self, fields):
+        """由 progress_bus 在主執行緒呼叫，fields 為合併後的最新進度"""
+        if "queue" in fields:
+            # 整體進度以媒體長度加權，速度為每秒處理的媒體秒數
+            queue = fields["queue"]
+            self.progress_bar.set(queue["progress"])
+            self.progress_label.configure(text=(
+                f"{self.converting_text}: {int(queue['progress'] * 100)}%  "
+                f"({queue['finished']}/{queue['total']})  {queue['throughput']:.1f}x"
+            ))
+            self.queue_table.refresh()
+        if "progress" not in fields:
+            return
+        progress = fields["progress"]
+        self.progress_bar.set(progress)
         if progress != -1:
-            percent = int(progress * 100)
-            # 使用 after 確保 GUI 更新在主執行緒中執行
-            self.master.after(0, lambda: self.progress_bar.set(progress))
-            self.master.after(0, lambda: self.progress_label.configure(text=f"{LANGUAGES[lang]['page3']['converting']}: {percent}%", font=self.master.FONT_BODY))
+            self.progress_label.configure(text=f"{self.converting_text}: {int(progress * 100)}%")
         else:
-            self.master.after(100, lambda: self.progress_bar.set(progress))
-            self.master.after(0, lambda: self.progress_label.configure(text=f"{LANGUAGES[lang]['page3']['converting_completed']}", font=self.master.FONT_BODY))
+            self.progress_label.configure(text=self.converting_completed_text)
 
     def start_conversion(self):
         lang= self.master.current_language 
-        file_path = self.selected_file.get()
-        if not file_path:
+        file_paths = list(self.selected_files)
+        if not file_paths:
             log_and_show_error("No file selected!", self.master)
             return
         conv_type = self.converter_type.get()
@@ -1759,36 +2131,76 @@ class Page3(ctk.CTkFrame):
         target_format = self.target_format_combobox.get()
         start_time = self.start_time_var.get()
         end_time = self.end_time_var.get()
+        video_transcoder = self.video_transcoder_combobox.get()
+        audio_transcoder = self.audio_transcoder_combobox.get()
         self.convert_button.configure(state="disabled")
         self.progress_label.configure(text=LANGUAGES[self.master.current_language]["page3"]["converting"], font=self.master.FONT_BODY)
+        self.cancel_button.configure(state="normal")
+
+        # 同時執行的 ffmpeg 數依核心數與編碼器的執行緒用量決定；
+        # 單一檔案時不限制執行緒，長影片改為分段並行編碼
+        workers, threads = conversion_workers(conv_type)
+        segments = None
+        if len(file_paths) == 1:
+            threads = None
+            segments = workers
+        jobs = [{"path": path, "name": os.path.basename(path)} for path in file_paths]
+
+        def measure(job):
+            # 檢查起訖時間是否在檔案範圍內；ffprobe 結果有快取，每個檔案只分析一次
+            return conversion_range(job["path"], start_time, end_time)[1]
+
+        def convert(job, progress_callback, cancel_token):
+            file_path = job["path"]
+            conversion_duration = job["duration"] = measure(job)
+            if conv_type == "video":
+                # 不縮放、不指定編碼器時不重新編碼整段影片（stream copy 或 smart cut）
+                trim_mode = select_trim_mode(
+                    file_path, param, target_format, video_transcoder, audio_transcoder, start_time, conversion_duration,
+                    precise=self.master.config.get("smart_cut", True)
+                )
+                return convert_video(
+                    file_path, param, target_format, start_time, conversion_duration,
+                    video_transcoder, audio_transcoder, progress_callback, cancel_token=cancel_token, threads=threads, trim_mode=trim_mode,
+                    segments=segments
+                )
+            return convert_audio(file_path, param, target_format, start_time, conversion_duration, progress_callback, cancel_token=cancel_token)
 
-        def conversion_task():
-            if end_time and end_time.strip():
-                    start_sec = time_to_seconds(start_time) if start_time and start_time != "00:00:00" else 0
-                    end_sec = time_to_seconds(end_time)
-                    conversion_duration = end_sec - start_sec if end_sec > start_sec else 0
-            else:
-                duration_str = get_media_duration(file_path)
-                conversion_duration = time_to_seconds(duration_str) if duration_str else 0
+        queue = self.conversion_queue = ConversionQueue(jobs, convert, min(workers, len(jobs)), on_update=self.update_queue, measure=measure)
+        self.show_jobs(jobs)
 
-            if conv_type == "video":
-                video_transcoder = self.video_transcoder_combobox.get()
-                audio_transcoder = self.audio_transcoder_combobox.get()
-                output = convert_video(
-                file_path, param, target_format, start_time, conversion_duration,
-                video_transcoder, audio_transcoder, self.update_progress
-            )
+        def conversion_task():
+            try:
+                queue.run()
+            finally:
+                self.master.after(0, lambda: self.cancel_button.configure(state="disabled"))
+                self.master.after(0, lambda: self.convert_button.configure(state="normal"))
+            done = [job for job in jobs if job["state"] == "done"]
+            cancelled = [job for job in jobs if job["state"] == "cancelled"]
+            failed = len(jobs) - len(done) - len(cancelled)
+            logger.info(f"Conversion finished: {len(done)} done, {failed} failed, {len(cancelled)} cancelled of {len(jobs)}")
+            if len(jobs) > 1:
+                # 批次轉檔一律顯示摘要（包含全部失敗的情況），與播放清單下載相同
+                self.master.after(0, lambda: messagebox.showinfo(
+                    LANGUAGES[lang]["page3"]["batch_summary_title"],
+                    LANGUAGES[lang]["page3"]["batch_summary"].format(len(done), failed, len(cancelled))
+                ))
+            if cancelled:
+                logger.info("Conversion cancelled by user")
+                self.master.after(0, lambda: self.progress_label.configure(text=LANGUAGES[lang]["page3"]["cancelled"]))
             else:
-                output = convert_audio(file_path, param, target_format, start_time, conversion_duration, self.update_progress)
-           
+                self.master.after(0, lambda: self.progress_label.configure(text=LANGUAGES[self.master.current_language]["page3"]["converting_completed"]))
+            if not done:
+                if len(jobs) == 1 and jobs[0]["state"] == "failed":
+                    log_and_show_error(f"Conversion failed: {jobs[0].get('error')}", self.master)
+                return
+            output = done[-1]["output"]
             # 使用 after 確保 GUI 更新在主執行緒中執行 
             self.master.after(0, lambda: self.converted_file_display.configure(state="normal"))
             self.master.after(0, lambda: self.converted_file_display.delete(0, "end"))
             self.master.after(0, lambda: self.converted_file_display.insert(0, output))
             self.master.after(0, lambda: self.converted_file_display.configure(state="disabled"))
-            self.master.after(0, lambda: self.convert_button.configure(state="normal"))
-            self.master.after(0, lambda: self.progress_label.configure(text=LANGUAGES[self.master.current_language]["page3"]["converting_completed"]))
-            if output:
+            if len(jobs) == 1:
                 self.master.after(0, lambda: messagebox.showinfo(
                     LANGUAGES[lang]["page3"]["convert_success_title"],
                     LANGUAGES[lang]["page3"]["convert_success_message"].format(output)
@@ -1798,6 +2210,10 @@ class Page3(ctk.CTkFrame):
         # 重製進度條
         self.progress_bar.set(0.0)
 
+    def cancel_conversion(self):
+        if self.conversion_queue is not None:
+            self.conversion_queue.cancel()
+
     def update_bg_image(self):
         bg_image_path = self.master.bg_image_path 
         if bg_image_path and os.path.exists(bg_image_path):
@@ -1841,7 +2257,20 @@ class Page3(ctk.CTkFrame):
         self.video_transcoder_label.configure(text=LANGUAGES[lang]["page3"]["video_transcoder_label"], font=self.master.FONT_BODY)
         self.audio_transcoder_label.configure(text=LANGUAGES[lang]["page3"]["audio_transcoder_label"], font=self.master.FONT_BODY)
         self.convert_button.configure(text=LANGUAGES[lang]["page3"]["convert_button"], font=self.master.FONT_BUTTON)
+        self.cancel_button.configure(text=LANGUAGES[lang]["page3"]["cancel_button"], font=self.master.FONT_BUTTON)
+        self.folder_button.configure(text=LANGUAGES[lang]["page3"]["folder_button"], font=self.master.FONT_BUTTON)
+        header_color = "gray90" if self.master.config.get("theme", "Dark") == "Light" else "gray25"
+        self.queue_table.set_header([
+            LANGUAGES[lang]["page3"]["file_column"],
+            LANGUAGES[lang]["page3"]["status_column"],
+            LANGUAGES[lang]["page3"]["speed_column"],
+        ], header_color)
+        self.queue_table.set_font(self.master.FONT_BODY)
+        self.queue_table.refresh()
         self.progress_label.configure(text=LANGUAGES[lang]["page3"]["progress_ready"], font=self.master.FONT_BODY)
+        # 進度文字只在語言變更時查詢一次
+        self.converting_text = LANGUAGES[lang]["page3"]["converting"]
+        self.converting_completed_text = LANGUAGES[lang]["page3"]["converting_completed"]
 
         self.param_combobox.configure(font=self.master.FONT_BODY)
         self.target_format_combobox.configure(font=self.master.FONT_BODY)
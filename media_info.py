@@ -0,0 +1,184 @@
+'''
+本機影音檔的資訊（ffprobe）。
+每個檔案只執行一次 ffprobe（JSON 輸出），解析成精簡的 MediaInfo：長度、容器、位元率與各串流的編碼，
+並以「路徑 + 檔案大小 + 修改時間」為 key 快取在記憶體中，檔案被覆寫後自動重新分析。
+時間長度欄位、剪輯範圍檢查、編碼相容性判斷與批次轉檔的排程都共用同一份資料。
+關鍵影格位置只在需要時才讀取（只讀封包旗標、不解碼），讀過的範圍記錄在同一個 MediaInfo 中重複使用。
+'''
+import os
+import json
+import bisect
+import shutil
+import threading
+import subprocess
+from collections import OrderedDict
+from logging_config import setup_logger
+
+# ------------------------------
+# 初始化 Logger
+# ------------------------------
+logger = setup_logger(__name__)
+
+def find_ffmpeg_tool(name):
+    """使用隨附的 ffmpeg/bin/<name>.exe；若不存在（例如非 Windows 的批次機器）則從 PATH 尋找"""
+    bundled = os.path.join(os.path.dirname(__file__), 'ffmpeg', 'bin', f'{name}.exe')
+    if os.path.exists(bundled):
+        return bundled
+    return shutil.which(name) or bundled
+
+FFPROBE_PATH = find_ffmpeg_tool("ffprobe")
+CACHE_SIZE = 512  # 記憶體中最多保留的檔案數
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+def _frame_rate(value):
+    """'30000/1001' -> 29.97"""
+    try:
+        num, _, den = str(value).partition("/")
+        return float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+class MediaInfo:
+    """
+    ffprobe 結果的精簡版本。
+    video: 第一個視訊串流 {"codec", "width", "height", "pix_fmt", "fps", "bit_rate"}，沒有視訊（或只有封面圖）時為 None；
+           另有 smart cut 重新編碼頭尾時要沿用的 "profile", "level", "color_range", "color_space", "color_transfer",
+           "color_primaries", "field_order", "time_base" 與 "r_fps"（ffprobe 沒有回報的欄位為 None 或 0）
+    audio: 每個音訊串流 {"codec", "channels", "sample_rate", "bit_rate"}
+    """
+    def __init__(self, path, size, mtime, data):
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        fmt = data.get("format", {})
+        self.duration = _to_float(fmt.get("duration"))
+        self.format_name = fmt.get("format_name", "")
+        self.bit_rate = _to_int(fmt.get("bit_rate"))
+        self.video = None
+        self.audio = []
+        for stream in data.get("streams", []):
+            codec_type = stream.get("codec_type")
+            if codec_type == "video" and self.video is None and not stream.get("disposition", {}).get("attached_pic"):
+                self.video = {
+                    "codec": stream.get("codec_name"),
+                    "width": _to_int(stream.get("width")),
+                    "height": _to_int(stream.get("height")),
+                    "pix_fmt": stream.get("pix_fmt"),
+                    "fps": _frame_rate(stream.get("avg_frame_rate")),
+                    "bit_rate": _to_int(stream.get("bit_rate")),
+                    "profile": stream.get("profile"),
+                    "level": _to_int(stream.get("level")),
+                    "color_range": stream.get("color_range"),
+                    "color_space": stream.get("color_space"),
+                    "color_transfer": stream.get("color_transfer"),
+                    "color_primaries": stream.get("color_primaries"),
+                    "field_order": stream.get("field_order"),
+                    "time_base": stream.get("time_base"),
+                    "r_fps": _frame_rate(stream.get("r_frame_rate")),
+                }
+            elif codec_type == "audio":
+                self.audio.append({
+                    "codec": stream.get("codec_name"),
+                    "channels": _to_int(stream.get("channels")),
+                    "sample_rate": _to_int(stream.get("sample_rate")),
+                    "bit_rate": _to_int(stream.get("bit_rate")),
+                })
+        self._keyframe_scans = []  # 已讀取過的關鍵影格 [(起點, 終點, 時間清單)]，需要時才讀取
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"MediaInfo({os.path.basename(self.path)}, {self.duration:.1f}s, video={self.video_codec}, audio={self.audio_codecs})"
+
+    @property
+    def video_codec(self):
+        return self.video["codec"] if self.video else None
+
+    @property
+    def audio_codecs(self):
+        return [stream["codec"] for stream in self.audio]
+
+    @property
+    def duration_text(self):
+        """'HH:MM:SS'，供 Page3 的結束時間欄位使用"""
+        seconds = int(self.duration)
+        return f"{seconds // 3600:02}:{seconds % 3600 // 60:02}:{seconds % 60:02}"
+
+    def keyframes(self, start=0.0, end=None):
+        """
+        回傳 [start, end] 內第一個視訊串流的關鍵影格時間（秒，已排序）。
+        只讀取該範圍的封包旗標、不解碼；讀過的範圍記錄在此 MediaInfo 中，
+        之後落在同一範圍內的查詢（例如 smart cut 與分段編碼）直接切片，不再執行 ffprobe。
+        """
+        end = self.duration if end is None else end
+        with self._lock:
+            for scan_start, scan_end, index in self._keyframe_scans:
+                if scan_start <= start and end <= scan_end:
+                    return index[bisect.bisect_left(index, start):bisect.bisect_right(index, end)]
+        index = _probe_keyframes(self.path, start, end)
+        with self._lock:
+            self._keyframe_scans.append((start, end, index))
+        return [t for t in index if start <= t <= end]
+
+def _probe_keyframes(path, start, end):
+    # read_intervals 會從 start 之前的關鍵影格開始讀取
+    command = [FFPROBE_PATH, "-v", "error", "-select_streams", "v:0", "-read_intervals", f"{max(0.0, start):.6f}%{end:.6f}"]
+    command.extend(["-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", path])
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, encoding="utf-8", check=True)
+    keyframes = []
+    for line in result.stdout.splitlines():
+        pts_time, _, flags = line.partition(",")
+        if flags.startswith("K"):
+            try:
+                keyframes.append(float(pts_time))
+            except ValueError:
+                pass  # pts_time=N/A
+    return sorted(keyframes)
+
+_cache = OrderedDict()  # (path, size, mtime_ns) -> MediaInfo
+_cache_lock = threading.Lock()
+
+def probe_media(path):
+    """
+    取得檔案的 MediaInfo；同一個檔案（路徑、大小與修改時間相同）只執行一次 ffprobe。
+    檔案不存在時拋出 OSError，ffprobe 失敗時拋出 RuntimeError。
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    with _cache_lock:
+        info = _cache.get(key)
+        if info is not None:
+            _cache.move_to_end(key)
+            return info
+
+    result = subprocess.run(
+        [FFPROBE_PATH, "-v", "error", "-show_format", "-show_streams", "-of", "json", path],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        encoding="utf-8"
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe failed for {path}: {result.stderr.strip()}")
+    info = MediaInfo(path, stat.st_size, stat.st_mtime_ns, json.loads(result.stdout or "{}"))
+    logger.debug(f"Probed {info}")
+
+    with _cache_lock:
+        # 同一路徑的舊版本（檔案已被覆寫）不再需要
+        for old_key in [k for k in _cache if k[0] == path]:
+            del _cache[old_key]
+        _cache[key] = info
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return info
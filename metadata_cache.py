@@ -0,0 +1,212 @@
+'''
+影片資訊的磁碟快取（SQLite）。
+以標準化的影片 ID 為 key，儲存標題、封面 URL、格式表與字幕語言清單，
+讓重複查詢與 mp4/mp3 切換不必再次執行 yt_dlp 的 extract_info。
+'''
+import os
+import re
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from contextlib import closing
+from urllib.parse import urlparse, parse_qs
+from config_manager import CACHE_DIR, load_config
+from logging_config import setup_logger
+
+# ------------------------------
+# 初始化 Logger
+# ------------------------------
+logger = setup_logger(__name__)
+
+DB_FILE = os.path.join(CACHE_DIR, "metadata.db")
+DEFAULT_TTL = 24 * 3600  # 預設保存一天（秒）
+
+_YOUTUBE_ID_RE = re.compile(r'^[A-Za-z0-9_-]{11}$')
+_YOUTUBE_HOSTS = ("youtube.com", "youtube-nocookie.com")
+
+def canonical_video_id(url):
+    """
+    將影片 URL 轉成標準化的 ID。
+    YouTube 的 watch?v=、youtu.be、shorts/、embed/、live/ 皆轉為 "youtube:<11 碼 ID>"；
+    其他平台則以去除 fragment 後的 URL 作為 ID（"url:<URL>"）。
+    """
+    parsed = urlparse(url.strip())
+    host = (parsed.hostname or "").lower()
+    for prefix in ("www.", "m.", "music."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+
+    video_id = None
+    if host == "youtu.be":
+        video_id = parsed.path.lstrip("/").split("/")[0]
+    elif host in _YOUTUBE_HOSTS:
+        query = parse_qs(parsed.query)
+        if "v" in query:
+            video_id = query["v"][0]
+        else:
+            parts = parsed.path.strip("/").split("/")
+            if len(parts) >= 2 and parts[0] in ("shorts", "embed", "live", "v"):
+                video_id = parts[1]
+    if video_id and _YOUTUBE_ID_RE.match(video_id):
+        return f"youtube:{video_id}"
+    return "url:" + parsed._replace(fragment="").geturl()
+
+def canonical_video_url(url):
+    """同一部影片的各種 URL 轉成同一個網址：YouTube 為 watch?v=<ID>，其他平台為去除 fragment 後的 URL"""
+    key = canonical_video_id(url)
+    if key.startswith("youtube:"):
+        return f"https://www.youtube.com/watch?v={key[len('youtube:'):]}"
+    return key[len("url:"):]
+
+def compact_video_info(info):
+    """
+    將 yt_dlp 的 info dict 整理成可存入快取的精簡資料：
+    標題、封面圖 URL、格式表與字幕語言清單。
+    """
+    formats = [
+        {
+            'format_id': f.get('format_id'),
+            'ext': f.get('ext'),
+            'resolution': f.get('resolution'),
+            'width': f.get('width'),
+            'height': f.get('height'),
+            'fps': f.get('fps'),
+            'vcodec': f.get('vcodec'),
+            'acodec': f.get('acodec'),
+            'abr': f.get('abr'),
+            'tbr': f.get('tbr'),
+            'filesize': f.get('filesize') or f.get('filesize_approx'),
+        }
+        for f in info.get('formats') or []
+    ]
+    return {
+        'id': info.get('id'),
+        'title': info.get('title', 'Unknown Title'),
+        'thumbnail': info.get('thumbnail'),
+        'formats': formats,
+        'subtitles': list((info.get('subtitles') or {}).keys()),
+        'automatic_captions': list((info.get('automatic_captions') or {}).keys()),
+    }
+
+class MetadataCache:
+    """
+    以 SQLite 儲存的影片資訊快取。
+    每次操作都開新的連線，因此可以同時被多個執行緒使用。
+    """
+    def __init__(self, db_file=DB_FILE, ttl=DEFAULT_TTL):
+        self.db_file = db_file
+        self.ttl = ttl
+        os.makedirs(os.path.dirname(db_file) or ".", exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS video_info ("
+                " key TEXT PRIMARY KEY,"
+                " data TEXT NOT NULL,"
+                " fetched_at REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.db_file, timeout=10)
+
+    def get(self, key, allow_stale=False):
+        """取得快取資料；若不存在或已超過 TTL（且 allow_stale 為 False）則回傳 None"""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT data, fetched_at FROM video_info WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        data, fetched_at = row
+        if not allow_stale and time.time() - fetched_at > self.ttl:
+            return None
+        return json.loads(data)
+
+    def put(self, key, data):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO video_info (key, data, fetched_at) VALUES (?, ?, ?)",
+                (key, json.dumps(data, ensure_ascii=False), time.time())
+            )
+
+    def purge_expired(self):
+        """刪除所有超過 TTL 的資料，回傳刪除筆數"""
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.execute("DELETE FROM video_info WHERE fetched_at < ?", (time.time() - self.ttl,))
+            return cursor.rowcount
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_metadata_cache():
+    """取得全域共用的快取，TTL 由設定檔的 metadata_cache_ttl（秒）決定"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            ttl = load_config().get("metadata_cache_ttl", DEFAULT_TTL)
+            _cache = MetadataCache(ttl=float(ttl))
+            # 啟動時清除過期資料，避免 metadata.db 無限增長
+            try:
+                purged = _cache.purge_expired()
+                if purged:
+                    logger.info("Purged %d expired video info entries", purged)
+            except sqlite3.Error as e:
+                logger.warning("Failed to purge expired video info: %s", e)
+        return _cache
+
+def _extract_video_metadata(url, cookiefile=''):
+    """執行 yt_dlp 的 extract_info，並整理成可存入快取的精簡資料"""
+    # 延遲載入，只需要 canonical_video_id 的模組不必載入 yt_dlp
+    from ydl_pool import get_ydl_pool
+    ydl_opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'skip_download': True,
+        # 讓 yt_dlp 下載字幕資訊
+        'writesubtitles': True,
+        'writeautomaticsub': True,
+        'subtitlesformat': 'srt',
+        'noplaylist': True,
+    }
+    # 若有指定cookies檔案，則加入 cookies 選項
+    if cookiefile != '':
+        # 使用 cookies 來處理年齡限制或地區限制的影片
+        # cookiesfrombrowser無法使用, ERROR: _parse_browser_specification() takes from 1 to 4 positional arguments but 6 were given
+        # cookies會過期
+        ydl_opts['cookiefile'] = cookiefile # 只有這能用，需先匯出cookies.txt
+    with get_ydl_pool().lease(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+    return compact_video_info(info)
+
+def _cache_key(url, cookiefile=''):
+    """
+    快取的 key：標準化影片 ID 加上 cookies 設定。
+    未登入時年齡限制等影片只會拿到不完整的格式表，不能提供給使用 cookies 的查詢（反之亦然）。
+    """
+    key = canonical_video_id(url)
+    if cookiefile:
+        key += "|cookies:" + hashlib.sha1(os.path.abspath(cookiefile).encode("utf-8")).hexdigest()[:12]
+    return key
+
+def get_video_metadata(url, cookiefile='', refresh=False):
+    """
+    取得影片的精簡資料，優先使用磁碟快取（依 cookies 設定分開快取）。
+    快取過期時重新解析；若重新解析失敗但仍有舊資料，則退回使用舊資料。
+    refresh=True 時略過快取強制重新解析。
+    """
+    cache = get_metadata_cache()
+    key = _cache_key(url, cookiefile)
+    metadata = None if refresh else cache.get(key)
+    if metadata is not None:
+        logger.info("Video info cache hit: %s", key)
+        return metadata
+    try:
+        metadata = _extract_video_metadata(url, cookiefile)
+    except Exception as e:
+        metadata = cache.get(key, allow_stale=True)
+        if metadata is None:
+            raise
+        logger.warning("Failed to refresh video info, using stale cache for %s: %s", key, e)
+        return metadata
+    cache.put(key, metadata)
+    return metadata
@@ -0,0 +1,210 @@
+'''
+Page2 播放清單的資料模型與虛擬化表格。
+PlaylistModel 保存完整的播放清單與選取狀態（以 set 記錄），不建立任何元件；
+VirtualTable 只為畫面上看得到的列建立元件，捲動時重複使用同一批列並換上對應的資料，
+因此新增、刪除、全選上千筆時，實際更新的元件數只與可見列數有關。
+'''
+import itertools
+import customtkinter as ctk
+
+class PlaylistModel:
+    """
+    播放清單的資料模型，每筆為影片資料字典（"title", "resolution", "format", "url"）。
+    每筆資料配有一個遞增的 key，選取狀態以 key 的 set 記錄，刪除其他列時不受索引位移影響。
+    """
+    def __init__(self):
+        self._items = []
+        self._keys = []
+        self._selected = set()
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def extend(self, items):
+        for item in items:
+            self._items.append(item)
+            self._keys.append(next(self._counter))
+
+    def is_selected(self, index):
+        return self._keys[index] in self._selected
+
+    def toggle(self, index):
+        key = self._keys[index]
+        if key in self._selected:
+            self._selected.discard(key)
+        else:
+            self._selected.add(key)
+
+    def selected_items(self):
+        return [item for key, item in zip(self._keys, self._items) if key in self._selected]
+
+    def select_all(self):
+        self._selected = set(self._keys)
+
+    def clear_selection(self):
+        self._selected.clear()
+
+    def toggle_all(self):
+        """全部已選取時取消全選，否則全選"""
+        if self._items and len(self._selected) == len(self._items):
+            self.clear_selection()
+        else:
+            self.select_all()
+
+    def delete_selected(self):
+        """刪除選取的列，回傳刪除的筆數"""
+        if not self._selected:
+            return 0
+        kept = [(key, item) for key, item in zip(self._keys, self._items) if key not in self._selected]
+        removed = len(self._items) - len(kept)
+        self._keys = [key for key, _ in kept]
+        self._items = [item for _, item in kept]
+        self._selected.clear()
+        return removed
+
+class VirtualTable(ctk.CTkFrame):
+    """
+    model: PlaylistModel
+    columns: 每欄對應的資料欄位名稱，例如 ["title", "resolution", "format", "url"]
+    widths: 每欄寬度（像素）
+    formatters: 選用，欄位名稱 -> func(item)，該欄顯示 func 的回傳值而非資料字典中的欄位
+    點擊任一列會切換該列的選取狀態。
+    """
+    def __init__(self, master, model, columns, widths, row_height=28, hover_color="skyblue", font=None, formatters=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.model = model
+        self.columns = columns
+        self.widths = widths
+        self.formatters = formatters or {}
+        self.row_height = row_height
+        self.hover_color = hover_color
+        self.font = font
+        self.first = 0           # 第一個可見列在 model 中的索引
+        self.rows = []           # 可見列的元件，每列為一組 CTkLabel
+
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+
+        self.header_frame = ctk.CTkFrame(self, fg_color="transparent", corner_radius=0)
+        self.header_frame.grid(row=0, column=0, sticky="ew")
+        self.header_labels = []
+        for col, width in enumerate(widths):
+            label = ctk.CTkLabel(self.header_frame, text="", width=width, height=row_height, anchor="w", corner_radius=0, font=font)
+            label.grid(row=0, column=col, sticky="ew", padx=1, pady=1)
+            self.header_labels.append(label)
+
+        self.body = ctk.CTkFrame(self, fg_color="transparent", corner_radius=0)
+        self.body.grid(row=1, column=0, sticky="nsew")
+        self.body.grid_propagate(False)
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.grid(row=1, column=1, sticky="ns")
+
+        self.body.bind("<Configure>", self._on_resize)
+        self._bind_wheel(self.body)
+
+    # ------------------------------
+    # 外觀
+    # ------------------------------
+    def set_header(self, texts, fg_color):
+        for label, text in zip(self.header_labels, texts):
+            label.configure(text=text, fg_color=fg_color)
+
+    def set_font(self, font):
+        self.font = font
+        for label in self.header_labels:
+            label.configure(font=font)
+        for row in self.rows:
+            for label in row:
+                label.configure(font=font)
+
+    # ------------------------------
+    # 可見列的建立與重繪
+    # ------------------------------
+    def _visible_count(self):
+        height = self.body.winfo_height()
+        return max(1, height // (self.row_height + 2))
+
+    def _on_resize(self, event=None):
+        needed = self._visible_count()
+        while len(self.rows) < needed:
+            self._add_row_widgets(len(self.rows))
+        while len(self.rows) > needed:
+            for label in self.rows.pop():
+                label.destroy()
+        self.refresh()
+
+    def _add_row_widgets(self, slot):
+        row = []
+        for col, width in enumerate(self.widths):
+            label = ctk.CTkLabel(self.body, text="", width=width, height=self.row_height, anchor="w", corner_radius=0, font=self.font)
+            label.grid(row=slot, column=col, sticky="ew", padx=1, pady=1)
+            label.bind("<Button-1>", lambda event, slot=slot: self._on_click(slot))
+            self._bind_wheel(label)
+            row.append(label)
+        self.rows.append(row)
+
+    def _clip(self, text, width):
+        """依欄寬截斷文字，避免長標題撐開欄位"""
+        text = str(text)
+        max_chars = max(4, width // 8)
+        return text if len(text) <= max_chars else text[:max_chars - 1] + "…"
+
+    def refresh(self):
+        """依 model 重新填入可見列；成本只與可見列數有關"""
+        total = len(self.model)
+        visible = len(self.rows)
+        self.first = max(0, min(self.first, total - visible))
+        for slot, row in enumerate(self.rows):
+            index = self.first + slot
+            if index < total:
+                item = self.model[index]
+                color = self.hover_color if self.model.is_selected(index) else "transparent"
+                for label, key, width in zip(row, self.columns, self.widths):
+                    text = self.formatters[key](item) if key in self.formatters else item.get(key, "")
+                    label.configure(text=self._clip(text, width), fg_color=color)
+            else:
+                for label in row:
+                    label.configure(text="", fg_color="transparent")
+        if total <= visible:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self.first / total, (self.first + visible) / total)
+
+    # ------------------------------
+    # 互動
+    # ------------------------------
+    def _on_click(self, slot):
+        index = self.first + slot
+        if index >= len(self.model):
+            return
+        self.model.toggle(index)
+        self.refresh()
+
+    def scroll_to(self, first):
+        self.first = int(first)
+        self.refresh()
+
+    def _on_scrollbar(self, *args):
+        total = len(self.model)
+        visible = len(self.rows)
+        if args[0] == "moveto":
+            self.scroll_to(float(args[1]) * total)
+        elif args[0] == "scroll":
+            step = visible if args[2] == "pages" else 1
+            self.scroll_to(self.first + int(args[1]) * step)
+
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self._on_wheel)      # Windows / macOS
+        widget.bind("<Button-4>", lambda e: self.scroll_to(self.first - 3))  # Linux
+        widget.bind("<Button-5>", lambda e: self.scroll_to(self.first + 3))
+
+    def _on_wheel(self, event):
+        steps = -int(event.delta / 120) if abs(event.delta) >= 120 else -event.delta
+        self.scroll_to(self.first + steps * 3)
@@ -0,0 +1,64 @@
+'''
+工作執行緒與 Tk 主迴圈之間的進度事件匯流排。
+工作執行緒呼叫 publish() 只是在鎖內更新一個 dict，不會碰到 Tk；
+主迴圈以固定頻率（預設 20 Hz）呼叫一次 drain，將同一主題在這段期間內的所有更新
+合併成一筆後交給訂閱者，避免每個 chunk 都排入 after(0, ...) 塞爆事件佇列。
+'''
+import threading
+from logging_config import setup_logger
+
+# ------------------------------
+# 初始化 Logger
+# ------------------------------
+logger = setup_logger(__name__)
+
+class ProgressBus:
+    """
+    master: 任何提供 after(ms, func) 的物件（通常是 MainApp）
+    fps: 每秒最多分派幾次更新
+    """
+    def __init__(self, master, fps=20):
+        self.master = master
+        self.interval = max(1, int(1000 / fps))
+        self._lock = threading.Lock()
+        self._pending = {}      # topic -> 合併後的欄位 dict
+        self._handlers = {}     # topic -> handler(fields)
+        self._running = False
+
+    def subscribe(self, topic, handler):
+        """註冊主題的處理函式；handler 會在主執行緒中收到合併後的欄位 dict"""
+        self._handlers[topic] = handler
+
+    def unsubscribe(self, topic):
+        self._handlers.pop(topic, None)
+
+    def publish(self, topic, **fields):
+        """可在任何執行緒呼叫；同一主題的欄位會被較新的值覆蓋"""
+        with self._lock:
+            pending = self._pending.get(topic)
+            if pending is None:
+                self._pending[topic] = fields
+            else:
+                pending.update(fields)
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            self.master.after(self.interval, self._drain)
+
+    def stop(self):
+        self._running = False
+
+    def _drain(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for topic, fields in pending.items():
+            handler = self._handlers.get(topic)
+            if handler:
+                try:
+                    handler(fields)
+                except Exception as e:
+                    # 單一訂閱者出錯不影響其他主題與後續的分派
+                    logger.error(f"Progress handler for {topic} failed: {e}")
+        if self._running:
+            self.master.after(self.interval, self._drain)
@@ -0,0 +1,119 @@
+'''
+下載失敗的分類與重試等待。
+classify_error 將錯誤分為 permanent（影片不存在、私人影片等，重試無用）、rate_limited（HTTP 429 等）
+與 transient（網路中斷等暫時性錯誤）；HostBackoff 以主機為單位記錄失敗次數，
+所有下載執行緒共用同一份等待時間（指數成長並加上隨機抖動），避免多個執行緒同時重試造成連續的 429。
+'''
+import time
+import random
+import threading
+from urllib.parse import urlparse
+from logging_config import setup_logger
+
+# ------------------------------
+# 初始化 Logger
+# ------------------------------
+logger = setup_logger(__name__)
+
+PERMANENT = "permanent"
+TRANSIENT = "transient"
+RATE_LIMITED = "rate_limited"
+
+# yt_dlp 的錯誤訊息（小寫比對）
+_PERMANENT_PATTERNS = (
+    "video unavailable",
+    "private video",
+    "video is private",
+    "has been removed",
+    "not available in your country",
+    "account associated with this video has been terminated",
+    "copyright",
+    "members-only",
+    "join this channel",
+    "confirm your age",
+    "unsupported url",
+    "is not a valid url",
+    "http error 404",
+    "http error 410",
+    "requested format is not available",
+    "this live event will begin",
+    "premieres in",
+)
+_RATE_LIMITED_PATTERNS = (
+    "http error 429",
+    "too many requests",
+    "rate-limit",
+    "rate limit",
+    "not a bot",
+)
+
+BASE_DELAY = {TRANSIENT: 2.0, RATE_LIMITED: 10.0}  # 第一次失敗後的等待上限（秒），之後每次加倍
+MAX_DELAY = 300.0
+
+def classify_error(error):
+    """回傳 PERMANENT / RATE_LIMITED / TRANSIENT"""
+    if isinstance(error, ValueError):
+        return PERMANENT  # 例如解析度格式錯誤，重試結果相同
+    text = str(error).lower()
+    if any(pattern in text for pattern in _RATE_LIMITED_PATTERNS):
+        return RATE_LIMITED
+    if any(pattern in text for pattern in _PERMANENT_PATTERNS):
+        return PERMANENT
+    return TRANSIENT
+
+def host_key(url):
+    """'https://www.youtube.com/watch?v=...' -> 'youtube.com'"""
+    host = (urlparse(url).hostname or "").lower()
+    for prefix in ("www.", "m.", "music."):
+        if host.startswith(prefix):
+            return host[len(prefix):]
+    return host
+
+class HostBackoff:
+    """
+    各主機共用的重試等待時間。
+    failure() 記錄失敗並延後該主機的下一次請求時間，success() 清除紀錄；
+    下載前以 delay() 取得仍需等待的秒數。
+    """
+    def __init__(self, base_delay=None, max_delay=MAX_DELAY):
+        self.base_delay = base_delay or BASE_DELAY
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._hosts = {}  # host -> (連續失敗次數, 可再次請求的 monotonic 時間)
+
+    def failure(self, host, kind):
+        """記錄一次失敗，回傳該主機需等待的秒數"""
+        now = time.monotonic()
+        with self._lock:
+            failures, not_before = self._hosts.get(host, (0, 0.0))
+            if now >= not_before:
+                # 等待期間內的其他失敗多半來自同一波請求，不再加倍
+                failures += 1
+                cap = min(self.max_delay, self.base_delay.get(kind, self.base_delay[TRANSIENT]) * 2 ** (failures - 1))
+                not_before = now + random.uniform(cap / 2, cap)
+                self._hosts[host] = (failures, not_before)
+            return not_before - now
+
+    def success(self, host):
+        with self._lock:
+            self._hosts.pop(host, None)
+
+    def delay(self, host):
+        """仍需等待的秒數；另加最多一半的隨機延遲，讓同時等待的執行緒錯開重試時間"""
+        with self._lock:
+            _, not_before = self._hosts.get(host, (0, 0.0))
+        remaining = not_before - time.monotonic()
+        if remaining <= 0:
+            return 0.0
+        return remaining + random.uniform(0, remaining / 2)
+
+_backoff = None
+_backoff_lock = threading.Lock()
+
+def get_host_backoff():
+    """取得全域共用的 HostBackoff"""
+    global _backoff
+    with _backoff_lock:
+        if _backoff is None:
+            _backoff = HostBackoff()
+        return _backoff
@@ -0,0 +1,198 @@
+'''
+每個下載工作專屬的暫存資料夾。
+暫存資料夾位於下載位置底下的 .staging/<job key>，job key 由影片 ID 與下載選項決定，
+因此同一工作重試或程式重開後會回到同一個資料夾，yt_dlp 會從 .part 檔接續下載。
+資料夾內的 .lock 在工作期間持有檔案鎖，程式異常結束時由作業系統釋放，
+啟動時據此判斷哪些暫存資料夾已無人使用並加以清除。
+'''
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+from metadata_cache import canonical_video_id
+from logging_config import setup_logger
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+# ------------------------------
+# 初始化 Logger
+# ------------------------------
+logger = setup_logger(__name__)
+
+STAGING_DIRNAME = ".staging"
+LOCK_FILE = ".lock"
+STATE_FILE = "job.json"
+STALE_AFTER = 7 * 24 * 3600  # 超過 7 天未更新的暫存資料夾不再接續，直接清除
+LEGACY_STALE_AFTER = 3600    # 舊版 temp_download*.* 暫存檔，超過 1 小時視為遺留檔
+_LEGACY_TEMP_RE = re.compile(r'^temp_download(_[0-9a-f]{32})?\..+$')
+
+class StagingBusy(Exception):
+    """暫存資料夾正被其他工作使用"""
+
+def _try_lock(f):
+    try:
+        if os.name == "nt":
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+def _unlock(f):
+    try:
+        if os.name == "nt":
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    except OSError:
+        pass
+
+def staging_key(url, *options):
+    """依標準化影片 ID 與下載選項產生固定的 job key，相同工作會得到相同 key"""
+    raw = "|".join([canonical_video_id(url)] + [str(o) for o in options])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+class StagingArea:
+    """
+    使用方式：
+        with open_staging(download_path, url, file_format, resolution) as staging:
+            ... 下載到 staging.path ...
+            staging.commit(temp_file, final_path)
+    commit 成功後暫存資料夾會被刪除；失敗時保留，以便下次接續下載。
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock_file = None
+        self.committed = False
+
+    def acquire(self):
+        os.makedirs(self.path, exist_ok=True)
+        lock_file = open(os.path.join(self.path, LOCK_FILE), "a+")
+        if not _try_lock(lock_file):
+            lock_file.close()
+            raise StagingBusy(self.path)
+        self._lock_file = lock_file
+        return self
+
+    def release(self):
+        if self._lock_file is not None:
+            _unlock(self._lock_file)
+            self._lock_file.close()
+            self._lock_file = None
+        if self.committed:
+            shutil.rmtree(self.path, ignore_errors=True)
+
+    def load_state(self):
+        try:
+            with open(os.path.join(self.path, STATE_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_state(self, **state):
+        """更新 job.json（同時刷新資料夾的修改時間，避免被當成遺留檔清除）"""
+        data = self.load_state()
+        data.update(state)
+        data["updated_at"] = time.time()
+        tmp_path = os.path.join(self.path, STATE_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(self.path, STATE_FILE))
+
+    def commit(self, temp_filepath, final_filepath):
+        """
+        將完成的檔案移到最終位置；同一資料夾內的字幕檔（download.<lang>.srt 等）
+        一併以最終檔名改名後搬出。
+        """
+        os.replace(temp_filepath, final_filepath)
+        temp_base = os.path.splitext(os.path.basename(temp_filepath))[0]
+        final_base = os.path.splitext(final_filepath)[0]
+        for name in os.listdir(self.path):
+            if name.startswith(temp_base + ".") and name.endswith((".srt", ".vtt", ".ass")):
+                suffix = name[len(temp_base):]
+                os.replace(os.path.join(self.path, name), final_base + suffix)
+        self.committed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+def open_staging(download_path, url, *options):
+    """
+    取得並鎖定此工作的暫存資料夾。
+    若同一工作正在另一個執行緒 / 程式中執行，改用帶編號的資料夾，避免互相覆寫。
+    """
+    key = staging_key(url, *options)
+    root = os.path.join(download_path, STAGING_DIRNAME)
+    counter = 0
+    while True:
+        name = key if counter == 0 else f"{key}-{counter}"
+        try:
+            staging = StagingArea(os.path.join(root, name)).acquire()
+        except StagingBusy:
+            counter += 1
+            continue
+        if staging.load_state():
+            logger.info(f"Resuming download in staging area: {staging.path}")
+        staging.save_state(url=url, options=[str(o) for o in options], pid=os.getpid())
+        return staging
+
+def _last_modified(path):
+    latest = os.path.getmtime(path)
+    for name in os.listdir(path):
+        try:
+            latest = max(latest, os.path.getmtime(os.path.join(path, name)))
+        except OSError:
+            pass
+    return latest
+
+def cleanup_staging(download_path, max_age=STALE_AFTER):
+    """
+    啟動時清除遺留的暫存檔：
+    1. .staging 中沒有被鎖定、且超過 max_age 未更新的資料夾
+    2. 舊版直接寫在下載位置的 temp_download*.* 檔案
+    回傳刪除的項目數。
+    """
+    removed = 0
+    now = time.time()
+    root = os.path.join(download_path, STAGING_DIRNAME)
+    if os.path.isdir(root):
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            if not os.path.isdir(path):
+                continue
+            try:
+                staging = StagingArea(path).acquire()
+            except (StagingBusy, OSError):
+                continue  # 仍有工作在使用
+            stale = now - _last_modified(path) > max_age
+            # Windows 無法刪除仍開啟中的 .lock，因此先釋放再刪除
+            staging.release()
+            if stale:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        if not os.listdir(root):
+            os.rmdir(root)
+
+    if os.path.isdir(download_path):
+        for name in os.listdir(download_path):
+            path = os.path.join(download_path, name)
+            if _LEGACY_TEMP_RE.match(name) and os.path.isfile(path) and now - os.path.getmtime(path) > LEGACY_STALE_AFTER:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError as e:
+                    logger.warning(f"Failed to remove leftover temp file {path}: {e}")
+    if removed:
+        logger.info(f"Removed {removed} leftover staging item(s) from {download_path}")
+    return removed
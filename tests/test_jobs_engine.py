@@ -0,0 +1,43 @@
+import pytest
+
+pytest.importorskip("yt_dlp")
+
+import download_archive
+from download_archive import DownloadArchive
+from jobs.__main__ import main
+from jobs.engine import DONE, JobEngine
+
+URLS = [
+    "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+    "https://youtu.be/9bZkp7q5f0E",
+]
+
+
+@pytest.fixture
+def archived_url_file(tmp_path, monkeypatch):
+    """URL 清單檔中的影片都已在（暫存的）下載索引中"""
+    archive = DownloadArchive(db_file=str(tmp_path / "archive.db"))
+    for url in URLS:
+        archive.record(url, "mp4", str(tmp_path / "old.mp4"))
+    monkeypatch.setattr(download_archive, "_archive", archive)
+    url_file = tmp_path / "urls.txt"
+    url_file.write_text("\n".join(URLS) + "\n", encoding="utf-8")
+    return url_file
+
+
+def test_input_file_sync_up_to_date(tmp_path, archived_url_file):
+    """-i urls.txt --sync 沒有新影片時，工作成功並回傳空清單"""
+    engine = JobEngine()
+    job = engine.submit("playlist", {
+        "input_file": str(archived_url_file), "download_path": str(tmp_path), "file_format": "mp4", "sync": True,
+    })
+    engine.run()
+    assert job.status == DONE, job.error
+    assert job.result == []
+
+
+def test_cli_input_file_sync_up_to_date(tmp_path, archived_url_file, capsys, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # load_config() 會在目前目錄建立 config.json
+    code = main(["playlist", "-i", str(archived_url_file), "--sync", "-o", str(tmp_path)])
+    assert code == 0
+    assert capsys.readouterr().out.strip() == "DONE\tplaylist\t[]"
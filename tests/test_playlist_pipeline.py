@@ -0,0 +1,48 @@
+import threading
+import pytest
+
+postprocessor = pytest.importorskip("yt_dlp.postprocessor")
+
+from adaptive_pool import AdaptiveScheduler
+from cancellation import CancelToken
+from Page2 import make_postprocess_handoff
+
+
+@pytest.mark.parametrize("pp_class", [postprocessor.FFmpegMergerPP, postprocessor.FFmpegExtractAudioPP])
+def test_postprocessor_hook_releases_download_slot(pp_class):
+    """yt_dlp 回報的後處理名稱（pp_key()）應觸發交接，讓出唯一的下載名額給下一個工作"""
+    with AdaptiveScheduler(1, 1, initial=1) as scheduler:
+        in_postprocess = threading.Event()
+        release = threading.Event()
+        second_started = threading.Event()
+
+        def first(token):
+            hook, postprocessing = make_postprocess_handoff(scheduler, token)
+            hook({"status": "started", "postprocessor": pp_class.pp_key()})
+            assert postprocessing
+            in_postprocess.set()
+            release.wait(10)
+            scheduler.end_postprocess(token)
+
+        token = CancelToken()
+        scheduler.submit(first, token, token=token)
+        assert in_postprocess.wait(10)
+        scheduler.submit(second_started.set)
+        try:
+            # limit 為 1：只有在第一個工作讓出下載名額後，第二個工作才會開始
+            assert second_started.wait(10)
+        finally:
+            release.set()
+
+
+def test_other_postprocessors_keep_download_slot():
+    calls = []
+
+    class Pipeline:
+        def begin_postprocess(self, token):
+            calls.append(token)
+
+    hook, postprocessing = make_postprocess_handoff(Pipeline(), CancelToken())
+    hook({"status": "started", "postprocessor": postprocessor.MoveFilesAfterDownloadPP.pp_key()})
+    hook({"status": "finished", "postprocessor": postprocessor.FFmpegMergerPP.pp_key()})
+    assert not calls and not postprocessing
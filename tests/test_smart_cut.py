@@ -0,0 +1,82 @@
+import os
+import subprocess
+import pytest
+
+from media_info import find_ffmpeg_tool, probe_media
+from Page3 import TRIM_SMART, TRIM_COPY, convert_video, select_trim_mode, smart_cut_encoder_args
+
+FFMPEG = find_ffmpeg_tool("ffmpeg")
+FFPROBE = find_ffmpeg_tool("ffprobe")
+needs_ffmpeg = pytest.mark.skipif(not (os.path.exists(FFMPEG) and os.path.exists(FFPROBE)), reason="ffmpeg / ffprobe not available")
+
+H264_VIDEO = {
+    "codec": "h264", "pix_fmt": "yuv420p", "fps": 25.0, "r_fps": 25.0, "profile": "Main", "level": 31,
+    "color_range": "tv", "color_space": "bt709", "color_transfer": "bt709", "color_primaries": "bt709",
+    "field_order": "progressive", "time_base": "1/12800",
+}
+
+
+def test_encoder_args_follow_source_parameters():
+    args = smart_cut_encoder_args(H264_VIDEO)
+    assert args[args.index("-profile:v") + 1] == "main"
+    assert args[args.index("-level") + 1] == "3.1"
+    assert args[args.index("-colorspace") + 1] == "bt709"
+    assert args[args.index("-color_range") + 1] == "tv"
+
+
+@pytest.mark.parametrize("changes", [
+    {"codec": "hevc", "profile": "Main", "level": 123},  # open GOP 的 CRA 無法切開
+    {"profile": "Extended"},                              # libx264 沒有對應的 profile
+    {"level": 0},
+    {"field_order": "tt"},
+    {"fps": 29.4, "r_fps": 30.0},                         # 非固定影格率
+])
+def test_encoder_args_refuse_unmatched_sources(changes):
+    assert smart_cut_encoder_args(dict(H264_VIDEO, **changes)) is None
+
+
+@pytest.fixture
+def h264_clip(tmp_path):
+    """10 秒、每秒一個關鍵影格的 h264 Main@3.1（bt709）影片，與 libx264 預設的 High profile 不同"""
+    path = str(tmp_path / "source.mp4")
+    subprocess.run([
+        FFMPEG, "-v", "error", "-f", "lavfi", "-i", "testsrc2=size=640x360:rate=25", "-f", "lavfi", "-i", "sine=frequency=440",
+        "-t", "10", "-c:v", "libx264", "-profile:v", "main", "-level", "3.1", "-g", "25", "-pix_fmt", "yuv420p",
+        "-color_primaries", "bt709", "-color_trc", "bt709", "-colorspace", "bt709", "-c:a", "aac", path,
+    ], check=True)
+    return path
+
+
+@needs_ffmpeg
+def test_smart_cut_decodes_cleanly(h264_clip):
+    start, duration = "00:00:02.3", 5.4
+    mode = select_trim_mode(h264_clip, "Original resolution", "mp4", start_time=start, duration=duration)
+    assert mode == TRIM_SMART
+    output = convert_video(h264_clip, "Original resolution", "mp4", start, duration, trim_mode=mode)
+
+    decode = subprocess.run([FFMPEG, "-v", "error", "-i", output, "-f", "null", "-"], stderr=subprocess.PIPE, universal_newlines=True)
+    assert decode.returncode == 0
+    assert decode.stderr.strip() == ""
+
+    frames = subprocess.run(
+        [FFPROBE, "-v", "error", "-count_frames", "-select_streams", "v:0", "-show_entries", "stream=nb_read_frames", "-of", "csv=p=0", output],
+        stdout=subprocess.PIPE, universal_newlines=True, check=True,
+    )
+    assert int(frames.stdout.strip()) == round(duration * 25)
+
+    source, result = probe_media(h264_clip), probe_media(output)
+    assert result.duration == pytest.approx(duration, abs=0.05)
+    for key in ("profile", "level", "pix_fmt", "color_space", "color_primaries", "color_transfer", "time_base"):
+        assert result.video[key] == source.video[key], key
+
+
+@needs_ffmpeg
+def test_hevc_falls_back_to_stream_copy(tmp_path):
+    path = str(tmp_path / "source.mp4")
+    encode = subprocess.run([
+        FFMPEG, "-v", "error", "-f", "lavfi", "-i", "testsrc2=size=320x240:rate=25", "-t", "4",
+        "-c:v", "libx265", "-x265-params", "log-level=error:keyint=25", "-pix_fmt", "yuv420p", path,
+    ])
+    if encode.returncode != 0:
+        pytest.skip("ffmpeg built without libx265")
+    assert select_trim_mode(path, "Original resolution", "mp4", start_time="00:00:01.3", duration=2) == TRIM_COPY
@@ -0,0 +1,136 @@
+'''
+影片封面圖的下載與快取。
+下載、解碼與縮圖都在背景執行緒完成，結果存入記憶體 LRU 與磁碟快取（以 URL 為 key），
+再次查看同一部影片時可立即顯示，CDN 緩慢時也不會卡住 Tk 主執行緒。
+'''
+import os
+import io
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from config_manager import CACHE_DIR
+from http_session import get_session
+from logging_config import setup_logger
+
+# ------------------------------
+# 初始化 Logger
+# ------------------------------
+logger = setup_logger(__name__)
+
+THUMBNAIL_DIR = os.path.join(CACHE_DIR, "thumbnails")
+THUMBNAIL_SIZE = (400, 300)  # 與 Page1 封面圖顯示大小相同
+
+class ThumbnailCache:
+    """
+    max_disk_bytes: 磁碟快取上限，超過時刪除最久未使用的檔案
+    max_memory_items: 記憶體中保留的縮圖數
+    """
+    def __init__(self, cache_dir=THUMBNAIL_DIR, size=THUMBNAIL_SIZE, max_disk_bytes=100 * 1024 * 1024, max_memory_items=64, max_workers=2):
+        self.cache_dir = cache_dir
+        self.size = size
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_items = max_memory_items
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="thumbnail")
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _disk_path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".jpg")
+
+    def _remember(self, url, image):
+        with self._lock:
+            self._memory[url] = image
+            self._memory.move_to_end(url)
+            while len(self._memory) > self.max_memory_items:
+                self._memory.popitem(last=False)
+
+    def get_cached(self, url):
+        """只查詢快取（記憶體 → 磁碟），不連網；找不到回傳 None"""
+        with self._lock:
+            image = self._memory.get(url)
+            if image is not None:
+                self._memory.move_to_end(url)
+                return image
+        path = self._disk_path(url)
+        if not os.path.exists(path):
+            return None
+        try:
+            image = Image.open(path)
+            image.load()
+            os.utime(path)  # 更新修改時間，作為 LRU 的依據
+        except Exception as e:
+            logger.warning(f"Corrupted thumbnail cache {path}: {e}")
+            return None
+        self._remember(url, image)
+        return image
+
+    def fetch(self, url):
+        """取得縮圖；快取中沒有則下載、解碼、縮小並寫入快取（會阻塞，請在背景執行緒呼叫）"""
+        image = self.get_cached(url)
+        if image is not None:
+            return image
+        response = get_session().get(url)
+        response.raise_for_status()
+        image = Image.open(io.BytesIO(response.content)).convert("RGB")
+        image = image.resize(self.size, Image.LANCZOS)
+        try:
+            path = self._disk_path(url)
+            tmp_path = path + ".tmp"
+            image.save(tmp_path, "JPEG", quality=90)
+            os.replace(tmp_path, path)
+            self._enforce_disk_limit()
+        except OSError as e:
+            logger.warning(f"Failed to write thumbnail cache: {e}")
+        self._remember(url, image)
+        return image
+
+    def fetch_async(self, url, callback):
+        """
+        在背景執行緒取得縮圖，完成後以 callback(image) 通知；失敗時 callback(None)。
+        callback 在背景執行緒中被呼叫，更新 UI 前需自行切回主執行緒。
+        """
+        def task():
+            try:
+                image = self.fetch(url)
+            except Exception as e:
+                logger.error(f"Failed to load thumbnail {url}: {e}")
+                image = None
+            callback(image)
+        return self._executor.submit(task)
+
+    def _enforce_disk_limit(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        if total <= self.max_disk_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                continue
+            if total <= self.max_disk_bytes:
+                break
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_thumbnail_cache():
+    """取得全域共用的封面圖快取"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ThumbnailCache()
+        return _cache
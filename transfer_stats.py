@@ -0,0 +1,96 @@
+'''
+播放清單下載的位元組層級進度統計。
+下載執行緒透過 update() 回報每部影片的已下載 / 總位元組，TransferTracker 直接更新該影片的資料字典
+（bytes_done、total_bytes、speed，表格重繪時讀取），並計算整體進度、總下載速度與依剩餘位元組估算的 ETA。
+update() 回傳 True 時才需要通知 UI，讓 Tk 主迴圈的更新頻率與 chunk 數量無關。
+'''
+import time
+import threading
+
+PUBLISH_INTERVAL = 0.5   # 通知 UI 的最短間隔（秒）
+SAMPLE_INTERVAL = 0.5    # 計算單一影片速度的取樣間隔（秒）
+SPEED_SMOOTHING = 0.3    # 速度的指數移動平均係數，越大越反映最新速度
+
+def format_bytes(size):
+    """1536 -> '1.5 KB'"""
+    size = float(size or 0)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+def format_eta(seconds):
+    """3725 -> '1:02:05'；未知時回傳 '--:--'"""
+    if seconds is None:
+        return "--:--"
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+class TransferTracker:
+    """
+    items: 本次要下載的影片資料字典；已完成、失敗或取消的影片以 finish() 標記。
+    尚未開始下載（總大小未知）的影片以已知影片的平均大小估算。
+    """
+    def __init__(self, items, publish_interval=PUBLISH_INTERVAL):
+        self.items = list(items)
+        self.publish_interval = publish_interval
+        self._lock = threading.Lock()
+        self._samples = {}       # id(item) -> (時間, 位元組)
+        self._finished = set()   # id(item)
+        self._last_publish = 0.0
+        for item in self.items:
+            item["speed"] = 0
+
+    def update(self, item, bytes_done, total_bytes):
+        """回報單一影片的下載量；回傳 True 表示距離上次通知 UI 已超過 publish_interval"""
+        now = time.monotonic()
+        key = id(item)
+        with self._lock:
+            sample = self._samples.get(key)
+            if sample is None:
+                # 從 .part 檔接續時，第一次回報已包含先前的位元組，只作為速度的基準
+                self._samples[key] = (now, bytes_done)
+            elif now - sample[0] >= SAMPLE_INTERVAL:
+                current = max(0, bytes_done - sample[1]) / (now - sample[0])
+                previous = item.get("speed") or 0
+                item["speed"] = current if not previous else previous + (current - previous) * SPEED_SMOOTHING
+                self._samples[key] = (now, bytes_done)
+            item["bytes_done"] = bytes_done
+            if total_bytes:
+                item["total_bytes"] = total_bytes
+            if now - self._last_publish < self.publish_interval:
+                return False
+            self._last_publish = now
+            return True
+
+    def finish(self, item):
+        with self._lock:
+            self._finished.add(id(item))
+            self._samples.pop(id(item), None)
+            item["speed"] = 0
+
+    def snapshot(self):
+        """回傳 {"progress": 0~1, "speed": 位元組/秒, "eta": 秒或 None}"""
+        with self._lock:
+            known = [item["total_bytes"] for item in self.items if item.get("total_bytes")]
+            average = sum(known) / len(known) if known else None
+            done = total = speed = 0
+            for item in self.items:
+                bytes_done = item.get("bytes_done") or 0
+                if id(item) in self._finished:
+                    # 已結束（含失敗）的影片不再有剩餘位元組
+                    size = max(bytes_done, item.get("total_bytes") or 0)
+                    done += size
+                    total += size
+                    continue
+                done += bytes_done
+                total += max(bytes_done, item.get("total_bytes") or average or 0)
+                speed += item.get("speed") or 0
+            finished = len(self._finished)
+        if average is None or total <= 0:
+            # 還沒有任何影片回報大小，退回以影片數計算
+            return {"progress": finished / max(1, len(self.items)), "speed": speed, "eta": None}
+        eta = (total - done) / speed if speed > 0 else None
+        return {"progress": done / total, "speed": speed, "eta": eta}
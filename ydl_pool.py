@@ -0,0 +1,131 @@
+'''
+可重複使用的 yt_dlp.YoutubeDL 實例池。
+建立 YoutubeDL 需要註冊所有 extractor、解析選項與載入 cookies，成本不低；
+此模組依「選項組合」（cookies 檔、格式、後處理等）保留閒置的實例，
+借出給工作執行緒使用，用完歸還，讓播放清單下載只需建立少數幾個實例。
+'''
+import json
+import atexit
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+import yt_dlp
+from logging_config import setup_logger
+
+# ------------------------------
+# 初始化 Logger
+# ------------------------------
+logger = setup_logger(__name__)
+
+def _profile_key(opts):
+    """將選項轉為可比較的 key（不可序列化的值以 repr 代替）"""
+    return json.dumps(opts, sort_keys=True, default=repr)
+
+class _PooledYDL:
+    """包裝一個 YoutubeDL 實例，並提供可於每次借出時替換的 progress hook 與 postprocessor hook"""
+    def __init__(self, opts):
+        self.ydl = yt_dlp.YoutubeDL(opts)
+        self.progress_hook = None
+        self.postprocessor_hook = None
+        self.ydl.add_progress_hook(self._dispatch_progress)
+        self.ydl.add_postprocessor_hook(self._dispatch_postprocessor)
+
+    def _dispatch_progress(self, d):
+        if self.progress_hook:
+            self.progress_hook(d)
+
+    def _dispatch_postprocessor(self, d):
+        if self.postprocessor_hook:
+            self.postprocessor_hook(d)
+
+    def set_outtmpl(self, outtmpl):
+        # yt_dlp 在初始化時會把 outtmpl 轉成 dict，只需替換 default 範本
+        current = self.ydl.params.get('outtmpl')
+        if isinstance(current, dict):
+            current['default'] = outtmpl
+        else:
+            self.ydl.params['outtmpl'] = outtmpl
+
+    def close(self):
+        try:
+            self.ydl.close()
+        except Exception as e:
+            logger.warning(f"Failed to close YoutubeDL instance: {e}")
+
+class YoutubeDLPool:
+    """
+    max_idle: 每種選項組合最多保留的閒置實例數（通常等於同時下載的執行緒數）
+    max_profiles: 最多保留幾種選項組合，超過時關閉最久未使用的組合
+    """
+    def __init__(self, max_idle=4, max_profiles=16):
+        self.max_idle = max_idle
+        self.max_profiles = max_profiles
+        self._idle = OrderedDict()  # profile key -> [_PooledYDL, ...]
+        self._lock = threading.Lock()
+        self.created = 0
+
+    def _acquire(self, opts):
+        key = _profile_key(opts)
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self._idle.move_to_end(key)
+                return key, idle.pop()
+        # 在鎖外建立新實例，避免阻塞其他執行緒
+        entry = _PooledYDL(dict(opts))
+        with self._lock:
+            self.created += 1
+        logger.debug(f"Created YoutubeDL instance #{self.created}")
+        return key, entry
+
+    def _release(self, key, entry):
+        evicted = []
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            self._idle.move_to_end(key)
+            if len(idle) < self.max_idle:
+                idle.append(entry)
+                entry = None
+            while len(self._idle) > self.max_profiles:
+                _, old = self._idle.popitem(last=False)
+                evicted.extend(old)
+        if entry is not None:
+            evicted.append(entry)
+        for old in evicted:
+            old.close()
+
+    @contextmanager
+    def lease(self, opts, outtmpl=None, progress_hook=None, postprocessor_hook=None):
+        """
+        借出一個符合 opts 的 YoutubeDL。
+        outtmpl 與 hook 每次借出都可能不同（例如暫存檔名），因此不列入選項組合，
+        而是在借出時設定到實例上。若使用期間發生例外，該實例不歸還，改為關閉。
+        """
+        key, entry = self._acquire(opts)
+        if outtmpl is not None:
+            entry.set_outtmpl(outtmpl)
+        entry.progress_hook = progress_hook
+        entry.postprocessor_hook = postprocessor_hook
+        try:
+            yield entry.ydl
+        except BaseException:
+            entry.close()
+            raise
+        else:
+            entry.progress_hook = None
+            entry.postprocessor_hook = None
+            self._release(key, entry)
+
+    def close(self):
+        with self._lock:
+            entries = [entry for idle in self._idle.values() for entry in idle]
+            self._idle.clear()
+        for entry in entries:
+            entry.close()
+
+_pool = YoutubeDLPool()
+atexit.register(_pool.close)
+
+def get_ydl_pool():
+    """取得全域共用的 YoutubeDL 實例池"""
+    return _pool